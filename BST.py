@@ -1,4 +1,11 @@
-import pandas as pd
+import bisect
+import copy
+import heapq
+import itertools
+import threading
+
+from footprint import footprint
+from instrumentation import instrumented
 
 class Movie:
     def __init__(self, movie_id, title, genres, year=None, rating=None, 
@@ -16,120 +23,361 @@ class Movie:
     def __repr__(self):
         return f"Movie(ID={self.movie_id}, Title='{self.title}', Genres={self.genres}, Rating={self.rating})"
 
+    def copy(self):
+        movie = copy.copy(self)
+        movie.genres = set(self.genres)
+        movie.stars = list(self.stars)
+        return movie
+
 class MovieNode:
     def __init__(self, movie, depth=1):
         self.movie = movie
         self.title = self._normalize(movie.title)
         self.depth = depth
+        self.size = 1  # nodes in this subtree, used for k-th smallest lookups
         self.left = None
         self.right = None
     
     def _normalize(self, title):
         return title.strip().lower()
 
+def _year_key(movie):
+    try:
+        return int(str(movie.year).strip())
+    except (TypeError, ValueError):
+        return None  # e.g. 'PG' in the raw data; left out of the year index
+
+# Published snapshots are read from several threads, and reads merge buffered adds
+_merge_lock = threading.Lock()
+
+class SortedIndex:
+    """(key, normalized title) pairs kept sorted for O(log n + k) range scans.
+
+    Keys and titles are parallel lists, so there is no tuple per entry.
+    add() only buffers the pair; the next read or removal merges the buffer,
+    a few pairs by bisect insertion and a large batch (a bulk load) with one
+    sort, so loading n movies costs O(n log n) instead of n O(n) insorts.
+    """
+    def __init__(self):
+        self.keys = []
+        self.titles = []
+        self._pending_keys = []
+        self._pending_titles = []
+
+    def __len__(self):
+        return len(self.keys) + len(self._pending_keys)
+
+    def copy(self):
+        self._flush()
+        index = SortedIndex()
+        index.keys = list(self.keys)
+        index.titles = list(self.titles)
+        return index
+
+    def add(self, key, title):
+        if key is not None:
+            self._pending_titles.append(title)
+            self._pending_keys.append(key)
+
+    def _flush(self):
+        if not self._pending_keys:
+            return
+        with _merge_lock:
+            keys, titles = self._pending_keys, self._pending_titles
+            if len(keys) * 8 < len(self.keys):
+                for key, title in zip(keys, titles):
+                    i = self._position(key, title)
+                    self.keys.insert(i, key)
+                    self.titles.insert(i, title)
+            elif keys:
+                # Years and ratings take few distinct values: sort each key's titles on their
+                # own, without a tuple or a position per entry
+                groups = {}
+                for key, title in zip(itertools.chain(self.keys, keys), itertools.chain(self.titles, titles)):
+                    bucket = groups.get(key)
+                    if bucket is None:
+                        bucket = groups[key] = []
+                    bucket.append(title)
+                merged_keys, merged_titles = [], []
+                for key in sorted(groups):
+                    bucket = groups.pop(key)
+                    bucket.sort()
+                    merged_keys.extend(itertools.repeat(key, len(bucket)))
+                    merged_titles.extend(bucket)
+                self.keys, self.titles = merged_keys, merged_titles
+            self._pending_titles = []
+            self._pending_keys = []  # last, so readers that skip the lock see merged lists
+
+    def _position(self, key, title):
+        start = bisect.bisect_left(self.keys, key)
+        end = bisect.bisect_right(self.keys, key, start)
+        return bisect.bisect_left(self.titles, title, start, end)
+
+    def remove(self, key, title):
+        if key is None:
+            return
+        self._flush()
+        i = self._position(key, title)
+        if i < len(self.keys) and self.keys[i] == key and self.titles[i] == title:
+            del self.keys[i]
+            del self.titles[i]
+
+    def range(self, low=None, high=None, descending=False):
+        """Titles whose key lies in [low, high], in key order."""
+        self._flush()
+        start = 0 if low is None else bisect.bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else bisect.bisect_right(self.keys, high)
+        indices = range(end - 1, start - 1, -1) if descending else range(start, end)
+        for i in indices:
+            yield self.titles[i]
+
+class SortedTitles:
+    """Normalized titles kept sorted for bisect prefix lookups; adds are buffered like SortedIndex."""
+    def __init__(self):
+        self._titles = []
+        self._pending = []
+
+    def __len__(self):
+        return len(self._titles) + len(self._pending)
+
+    def copy(self):
+        titles = SortedTitles()
+        titles._titles = list(self.sorted())
+        return titles
+
+    def add(self, title):
+        self._pending.append(title)
+
+    def remove(self, title):
+        titles = self.sorted()
+        i = bisect.bisect_left(titles, title)
+        if i < len(titles) and titles[i] == title:
+            del titles[i]
+
+    def sorted(self):
+        """The titles as a sorted list (the index itself: don't modify it)."""
+        if self._pending:
+            with _merge_lock:
+                pending = self._pending
+                if len(pending) * 8 < len(self._titles):
+                    for title in pending:
+                        bisect.insort(self._titles, title)
+                elif pending:
+                    self._titles = sorted(self._titles + pending)
+                self._pending = []
+        return self._titles
+
 class MovieBST:
     def __init__(self):
         self.root = None
         self.size = 0
-        self.title_index = {}  
-        self.genre_index = {}  # Changed from defaultdict to regular dict
+        self.title_index = {}  # normalized title -> MovieNode
+        # genre -> {normalized title: movie}; dicts keep insertion order and remove in O(1)
+        self.genre_index = {}
+        # Secondary ordered indexes, overall and per genre
+        self.year_index = SortedIndex()
+        self.rating_index = SortedIndex()
+        self.genre_year_index = {}    # genre -> SortedIndex by year
+        self.genre_rating_index = {}  # genre -> SortedIndex by rating
+        # Normalized titles kept sorted for bisect prefix lookups
+        self.sorted_titles = SortedTitles()
+        self.genre_titles = {}  # genre -> SortedTitles
+        # Titles whose Movie objects are still shared with the tree this was copied from
+        self._shared_titles = set()
+
+    def copy(self):
+        """Independent tree for copy-on-write edits; Movie objects are copied on first update."""
+        tree = MovieBST()
+        tree.size = self.size
+        if self.root:
+            tree.root = copy.copy(self.root)
+            stack = [tree.root]
+            while stack:
+                node = stack.pop()
+                tree.title_index[node.title] = node
+                for side in ("left", "right"):
+                    child = getattr(node, side)
+                    if child is not None:
+                        child = copy.copy(child)
+                        setattr(node, side, child)
+                        stack.append(child)
+        tree.genre_index = {genre: dict(bucket) for genre, bucket in self.genre_index.items()}
+        tree.year_index = self.year_index.copy()
+        tree.rating_index = self.rating_index.copy()
+        tree.genre_year_index = {genre: index.copy() for genre, index in self.genre_year_index.items()}
+        tree.genre_rating_index = {genre: index.copy() for genre, index in self.genre_rating_index.items()}
+        tree.sorted_titles = self.sorted_titles.copy()
+        tree.genre_titles = {genre: titles.copy() for genre, titles in self.genre_titles.items()}
+        # Both trees copy a Movie before editing it, as the other tree indexes it too
+        self._shared_titles = set(self.title_index)
+        tree._shared_titles = set(tree.title_index)
+        return tree
+
+    def flush_indexes(self):
+        """Merge buffered index entries now, e.g. after a bulk load so the first query doesn't pay."""
+        for index in (self.year_index, self.rating_index, *self.genre_year_index.values(),
+                      *self.genre_rating_index.values()):
+            index._flush()
+        for titles in (self.sorted_titles, *self.genre_titles.values()):
+            titles.sorted()
+
+    def memory_report(self):
+        """Bytes per structure and per movie (see footprint.py); shared objects are counted once."""
+        self.flush_indexes()
+        movies = [node.movie for node in self.title_index.values()]
+        parts = [
+            ("movies", movies),
+            ("tree", [self.root]),
+            ("title_index", [self.title_index]),
+            ("genre_index", [self.genre_index]),
+            ("year_rating_indexes", [self.year_index, self.rating_index,
+                                     self.genre_year_index, self.genre_rating_index]),
+            ("sorted_titles", [self.sorted_titles, self.genre_titles]),
+        ]
+        return footprint(parts, len(movies))
         
     def _normalize(self, title):
         return title.strip().lower()
         
-    def _add_to_genre_index(self, movie):
+    def _add_to_genre_index(self, movie, norm_title):
         """Manually handle genre indexing without defaultdict"""
         for genre in movie.genres:
             if genre not in self.genre_index:
-                self.genre_index[genre] = []
-            self.genre_index[genre].append(movie)
+                self.genre_index[genre] = {}
+            self.genre_index[genre][norm_title] = movie
         
+    @instrumented()
     def insert(self, movie):
+        norm_title = self._normalize(movie.title)
+        existing = self.title_index.get(norm_title)
+        if existing:
+            # Same title: replace the stored movie, keeping the indexes in step
+            self._remove_from_indexes(existing.movie)
+            existing.movie = movie
+            self._add_to_indexes(movie)
+            return
         if not self.root:
             self.root = MovieNode(movie)
-            self.title_index[self._normalize(movie.title)] = self.root
-            self._add_to_genre_index(movie)  # Use manual genre indexing
-            self.size += 1
-            return
-        self._insert_recursive(self.root, movie)
+            self.title_index[self.root.title] = self.root
+        else:
+            self._insert_recursive(self.root, movie)
+        self._add_to_indexes(movie)
+        self.size += 1
     
     def _insert_recursive(self, node, movie, depth=1):
+        # A loop with the title normalized once: O(height) for every insert of a bulk load
         norm_title = self._normalize(movie.title)
-        
-        if norm_title == node.title:
-            node.movie = movie
-            return
-            
-        if norm_title < node.title:
-            if node.left is None:
-                node.left = MovieNode(movie, depth + 1)
-                self.title_index[norm_title] = node.left
-                self._add_to_genre_index(movie)
-                self.size += 1
-            else:
-                self._insert_recursive(node.left, movie, depth + 1)
-        else:
-            if node.right is None:
-                node.right = MovieNode(movie, depth + 1)
-                self.title_index[norm_title] = node.right
-                self._add_to_genre_index(movie)
-                self.size += 1
-            else:
-                self._insert_recursive(node.right, movie, depth + 1)
+        while True:
+            node.size += 1
+            depth += 1
+            side = "left" if norm_title < node.title else "right"
+            child = getattr(node, side)
+            if child is None:
+                child = MovieNode(movie, depth)
+                setattr(node, side, child)
+                self.title_index[child.title] = child  # key by the node's string: one copy per title
+                return
+            node = child
+
+    def _add_to_indexes(self, movie):
+        norm_title = self._normalize(movie.title)
+        node = self.title_index.get(norm_title)
+        if node is not None:
+            norm_title = node.title  # one string per movie, shared by every index
+        year = _year_key(movie)
+        self._add_to_genre_index(movie, norm_title)
+        self.year_index.add(year, norm_title)
+        self.rating_index.add(movie.rating, norm_title)
+        self.sorted_titles.add(norm_title)
+        for genre in movie.genres:
+            if genre not in self.genre_titles:
+                self.genre_titles[genre] = SortedTitles()
+                self.genre_year_index[genre] = SortedIndex()
+                self.genre_rating_index[genre] = SortedIndex()
+            self.genre_titles[genre].add(norm_title)
+            self.genre_year_index[genre].add(year, norm_title)
+            self.genre_rating_index[genre].add(movie.rating, norm_title)
+
+    def _remove_from_indexes(self, movie):
+        norm_title = self._normalize(movie.title)
+        for genre in movie.genres:
+            bucket = self.genre_index.get(genre)
+            if bucket is not None and bucket.get(norm_title) is movie:
+                del bucket[norm_title]
+                if not bucket:
+                    del self.genre_index[genre]
+            if genre in self.genre_year_index:
+                self.genre_year_index[genre].remove(_year_key(movie), norm_title)
+                self.genre_rating_index[genre].remove(movie.rating, norm_title)
+            if genre in self.genre_titles:
+                self.genre_titles[genre].remove(norm_title)
+        self.year_index.remove(_year_key(movie), norm_title)
+        self.rating_index.remove(movie.rating, norm_title)
+        self.sorted_titles.remove(norm_title)
     
+    @instrumented()
     def search(self, title):
         return self.title_index.get(self._normalize(title))
     
+    @instrumented()
     def get_movies_by_genre(self, genre):
-        return self.genre_index.get(genre, [])  # Returns empty list if genre doesn't exist
+        # Read-only live view, O(1): callers can't reorder or mutate the index.
+        # list() it before editing the tree while iterating.
+        return self.genre_index.get(genre, {}).values()
     
-    def update_movie(self, title, **kwargs):
-        movie = self.search(title)
-        if not movie:
+    @instrumented()
+    def update_movie(self, title, /, **kwargs):  # positional-only so title= can rename
+        node = self.search(title)
+        if not node:
             print(f"Movie '{title}' not found.")
             return False
+        movie = node.movie
+        self._remove_from_indexes(movie)
+        if node.title in self._shared_titles:
+            # Edit a private copy so older snapshots keep the original
+            self._shared_titles.discard(node.title)
+            movie = node.movie = movie.copy()
             
         if 'title' in kwargs:
             old_title = self._normalize(movie.title)
             new_title = self._normalize(kwargs['title'])
             if old_title != new_title:
+                if new_title in self.title_index:
+                    print(f"Movie '{kwargs['title']}' already exists.")
+                    self._add_to_indexes(movie)
+                    return False
+                # Re-position the node so in-order traversal stays sorted
                 del self.title_index[old_title]
+                self.root = self._delete_recursive(self.root, old_title)
+                movie.title = kwargs['title']
+                if not self.root:
+                    self.root = MovieNode(movie)
+                    self.title_index[self.root.title] = self.root
+                else:
+                    self._insert_recursive(self.root, movie)
+            else:
                 movie.title = kwargs['title']
-                self.title_index[new_title] = movie
     
         if 'genres' in kwargs:
-            for genre in movie.genres:
-                if genre in self.genre_index and movie in self.genre_index[genre]:
-                    self.genre_index[genre].remove(movie)
-            
-            
             movie.genres = set(kwargs['genres'])
-            
-           
-            for genre in movie.genres:
-                if genre not in self.genre_index:
-                    self.genre_index[genre] = []
-                self.genre_index[genre].append(movie)
                 
         for attr in ['year', 'rating', 'director', 'stars', 'runtime', 'description']:
             if attr in kwargs:
                 setattr(movie, attr, kwargs[attr])
-                
+
+        self._add_to_indexes(movie)
         return True
     
+    @instrumented()
     def delete(self, title):
         norm_title = self._normalize(title)
         if norm_title not in self.title_index:
             print(f"Movie '{title}' not found.")
             return False
             
-        movie = self.title_index[norm_title]
+        movie = self.title_index[norm_title].movie
         del self.title_index[norm_title]
-        
-        # Remove from genre index
-        for genre in movie.genres:
-            if genre in self.genre_index and movie in self.genre_index[genre]:
-                self.genre_index[genre].remove(movie)
+        self._remove_from_indexes(movie)
         
         # Update BST structure
         self.root = self._delete_recursive(self.root, norm_title)
@@ -153,10 +401,14 @@ class MovieBST:
             successor = self._find_min(node.right)
             node.movie = successor.movie
             node.title = successor.title
-            self.title_index[node.title] = node.movie
+            self.title_index[node.title] = node
             node.right = self._delete_recursive(node.right, successor.title)
                 
+        node.size = 1 + self._subtree_size(node.left) + self._subtree_size(node.right)
         return node
+
+    def _subtree_size(self, node):
+        return node.size if node else 0
         
     def _find_min(self, node):
         current = node
@@ -164,8 +416,119 @@ class MovieBST:
             current = current.left
         return current
 
+    # Ordered queries
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        """Movies in title order."""
+        for node in self._inorder(self.root):
+            yield node.movie
+
+    def _inorder(self, node, low=None, high=None):
+        """Nodes in title order, skipping subtrees outside [low, high]."""
+        stack = []
+        while stack or node:
+            if node:
+                if low is not None and node.title < low:
+                    node = node.right
+                    continue
+                stack.append(node)
+                node = node.left
+            else:
+                node = stack.pop()
+                if high is not None and node.title > high:
+                    return
+                yield node
+                node = node.right
+
+    def get_all_movies(self):
+        return list(self)
+
+    def titles_with_prefix(self, prefix, genre=None):
+        """Movies whose title starts with ``prefix``, in title order, in O(log n + k).
+
+        With a genre, only that genre's titles are searched; an empty prefix
+        lists the whole genre (or catalogue) already sorted.
+        """
+        index = self.sorted_titles if genre is None else self.genre_titles.get(genre, SortedTitles())
+        titles = index.sorted()
+        prefix = prefix.strip().lower()
+        start = bisect.bisect_left(titles, prefix)
+        end = bisect.bisect_left(titles, prefix + "\U0010ffff", start)
+        return [self.title_index[title].movie for title in titles[start:end]]
+
+    def titles_between(self, start, end):
+        """Movies with start <= title <= end (case-insensitive), in title order."""
+        return [node.movie for node in self._inorder(self.root, self._normalize(start), self._normalize(end))]
+
+    def next_title(self, title):
+        """The movie whose title follows ``title`` (which need not exist), or None."""
+        title = self._normalize(title)
+        node, best = self.root, None
+        while node:
+            if node.title > title:
+                best, node = node, node.left
+            else:
+                node = node.right
+        return best.movie if best else None
+
+    def previous_title(self, title):
+        """The movie whose title precedes ``title`` (which need not exist), or None."""
+        title = self._normalize(title)
+        node, best = self.root, None
+        while node:
+            if node.title < title:
+                best, node = node, node.right
+            else:
+                node = node.left
+        return best.movie if best else None
+
+    def kth_smallest(self, k):
+        """The k-th movie in title order (1-based), in O(height) via subtree sizes."""
+        if not 1 <= k <= self.size:
+            return None
+        node = self.root
+        while node:
+            left_size = self._subtree_size(node.left)
+            if k <= left_size:
+                node = node.left
+            elif k == left_size + 1:
+                return node.movie
+            else:
+                k -= left_size + 1
+                node = node.right
+        return None
+
+    def movies_by_year(self, start=None, end=None, genre=None):
+        """Movies released in [start, end], oldest first, optionally within one genre."""
+        index = self.year_index if genre is None else self.genre_year_index.get(genre, SortedIndex())
+        return [self.title_index[title].movie for title in index.range(start, end)]
+
+    def movies_by_rating(self, min_rating=None, max_rating=None, genre=None, limit=None):
+        """Movies rated in [min_rating, max_rating], best first, optionally within one genre."""
+        index = self.rating_index if genre is None else self.genre_rating_index.get(genre, SortedIndex())
+        movies = []
+        for title in index.range(min_rating, max_rating, descending=True):
+            if limit is not None and len(movies) >= limit:
+                break
+            movies.append(self.title_index[title].movie)
+        return movies
+
+    def top_rated(self, genre=None, start_year=None, end_year=None, k=10):
+        """Best-rated movies of a genre released in [start_year, end_year].
+
+        Slices the (genre, year) index and keeps the k best with a heap, so the
+        cost is O(log n + m log k) for m movies in the year range.
+        """
+        in_range = self.movies_by_year(start_year, end_year, genre)
+        return heapq.nlargest(k, (m for m in in_range if m.rating is not None),
+                              key=lambda m: m.rating)
+
+@instrumented()
 def load_from_dataframe(df):
     """Load movies from DataFrame with exact column matching"""
+    import pandas as pd  # only needed here; keeps `import BST` fast
     bst = MovieBST()
     
     for idx, row in df.iterrows():
@@ -181,5 +544,5 @@ def load_from_dataframe(df):
                  if f'Star{i}' in row and pd.notna(row[f'Star{i}'])]
         )
         bst.insert(movie)
-    
+    bst.flush_indexes()
     return bst
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""Offline batch recommendations.
+
+Reads movie titles or IDs (one per line) and writes the top-K similar movies
+for each of them to JSONL or Parquet, so recommendations can be precomputed
+nightly and served from a static store.
+
+    python batch_recommend.py queries.txt -o recs.jsonl -k 10
+    python batch_recommend.py --all -o recs.parquet --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+from movie_recommender import MovieRecommendationSystem
+
+CSV_FILE = "imdb_top_1000_cleaned.csv"
+
+_system = None  # one system per worker process (inherited from the parent when forked)
+
+
+def _init_worker(csv_file):
+    global _system
+    if _system is None:
+        _system = MovieRecommendationSystem(csv_file)
+
+
+def _recommend_chunk(args):
+    chunk, k = args
+    records = []
+    for query, movie_id in chunk:
+        if movie_id is None:
+            records.append({"query": query, "movie_id": None, "title": None,
+                            "recommendations": [], "error": "not found"})
+            continue
+        recs = _system.graph.get_similar_movies(movie_id)[:k]
+        records.append({
+            "query": query,
+            "movie_id": movie_id,
+            "title": _system.graph.movies[movie_id].title,
+            "recommendations": [
+                {"movie_id": sim_id, "title": _system.graph.movies[sim_id].title, "score": round(score, 6)}
+                for sim_id, score in recs
+            ],
+        })
+    return records
+
+
+def resolve_queries(system, queries):
+    """Map each title or ID to a movie_id (or None) with a single title lookup table.
+
+    Int queries are movie ids and are never looked up as titles.
+    """
+    by_title = {}
+    for movie in system.db.movies.values():
+        by_title.setdefault(movie.title.strip().lower(), movie.movie_id)
+    resolved = []
+    for query in queries:
+        if isinstance(query, int):
+            resolved.append((str(query), query if query in system.db.movies else None))
+            continue
+        key = query.strip()
+        movie_id = by_title.get(key.lower())
+        if movie_id is None and key.isdigit() and int(key) in system.db.movies:
+            movie_id = int(key)  # titles win, so "1917" still means the film
+        resolved.append((query, movie_id))
+    return resolved
+
+
+def read_queries(path):
+    with open(path, encoding="utf8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self.file = sys.stdout if path == "-" else open(path, "w", encoding="utf8")
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ParquetWriter:
+    """Writes each finished chunk as its own row group."""
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow), or use a .jsonl path.")
+        self.pa = pa
+        rec_type = pa.struct([("movie_id", pa.int64()), ("title", pa.string()), ("score", pa.float64())])
+        self.schema = pa.schema([
+            ("query", pa.string()),
+            ("movie_id", pa.int64()),
+            ("title", pa.string()),
+            ("recommendations", pa.list_(rec_type)),
+            ("error", pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, records):
+        rows = [{**{"error": None}, **record} for record in records]
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def run_batch(system, queries, output, k=10, workers=None, chunk_size=64, csv_file=CSV_FILE):
+    global _system
+    _system = system
+    resolved = resolve_queries(system, queries)
+    chunks = [(resolved[i:i + chunk_size], k) for i in range(0, len(resolved), chunk_size)]
+    writer = ParquetWriter(output) if output.endswith(".parquet") else JsonlWriter(output)
+    system.graph.to_csr()  # build the graph before forking, or every worker rebuilds it
+    written = 0
+    with ExitStack() as stack:
+        stack.callback(writer.close)
+        if workers == 1:
+            results = map(_recommend_chunk, chunks)
+        else:
+            executor = stack.enter_context(ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(csv_file,)))
+            results = executor.map(_recommend_chunk, chunks)
+        # Results arrive in input order and are written as soon as each chunk is done
+        for records in results:
+            writer.write(records)
+            written += len(records)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute top-K recommendations in bulk.")
+    parser.add_argument("input", nargs="?", help="file with one movie title or ID per line")
+    parser.add_argument("--all", action="store_true", help="recommend for every movie in the catalogue")
+    parser.add_argument("-o", "--output", default="-", help=".jsonl or .parquet path ('-' for stdout)")
+    parser.add_argument("-k", type=int, default=10, help="recommendations per movie")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (1 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--csv", default=CSV_FILE)
+    args = parser.parse_args(argv)
+
+    if not args.all and not args.input:
+        parser.error("give an input file or --all")
+
+    system = MovieRecommendationSystem(args.csv)
+    queries = list(system.db.movies) if args.all else read_queries(args.input)
+    written = run_batch(system, queries, args.output, args.k, args.workers, args.chunk_size, args.csv)
+    print(f"Wrote {written} recommendation rows to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
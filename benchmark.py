@@ -0,0 +1,338 @@
+"""Reproducible benchmark of the tree, trie and graph structures.
+
+Generates a synthetic catalogue in the cleaned CSV schema, then times and
+measures peak memory for building and querying MovieBST (BST.py),
+CatalogueBST, Trie, MovieDatabase.load_from_csv and the MovieGraph.
+
+    python benchmark.py --sizes 1000 10000 100000 -o results.json
+    python benchmark.py --baseline benchmark_baseline.json      # exit 1 on regression
+    python benchmark.py --save-baseline benchmark_baseline.json
+    python benchmark.py --sizes 1000 10000 --memory-report      # bytes per structure
+    python benchmark.py --genre-skew 1.5 --actor-skew 1.2 --actors-per-movie 2
+
+Every timing is the best of --repeat runs (5 by default), and --baseline
+times a size again (up to --retries times) before reporting it slower,
+so a noisy stretch doesn't read as a regression. The O(n^2) graph build is only
+run up to --graph-max movies. The seed, query count and catalogue shape
+are recorded in the JSON, and --baseline refuses a baseline recorded
+with different ones.
+"""
+import argparse
+import csv
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from BST import Movie as BSTMovie, MovieBST
+from cleaning import CLEAN_COLUMNS as COLUMNS
+from footprint import format_footprint
+from movie_recommender import CatalogueBST, MovieDatabase, MovieRecommendationSystem, Trie
+
+GENRES = ["Drama", "Crime", "Action", "Adventure", "Comedy", "Biography", "Animation", "Mystery",
+          "Thriller", "Romance", "Sci-Fi", "Fantasy", "Horror", "Family", "War", "History",
+          "Music", "Western", "Sport", "Musical", "Film-Noir"]
+WORDS = ["the", "dark", "last", "night", "love", "star", "city", "king", "man", "river", "lost",
+         "war", "game", "blue", "dream", "road", "house", "fire", "silent", "story", "return"]
+
+
+def zipf_cum_weights(n, skew):
+    return list(itertools.accumulate(1.0 / (rank + 1) ** skew for rank in range(n)))
+
+
+# generate_catalogue's defaults, also assumed for baselines recorded before they were saved
+CATALOGUE_DEFAULTS = {"genre_skew": 1.0, "actor_skew": 0.8, "actors_per_movie": 4}
+
+
+def generate_catalogue(n, seed=0, genre_skew=1.0, actor_skew=0.8, actors_per_movie=4,
+                       actor_pool=None, director_pool=None):
+    """Rows in the imdb_top_1000_cleaned.csv schema with Zipf-like genre and actor popularity."""
+    if not 0 <= actors_per_movie <= 4:
+        raise ValueError(f"actors_per_movie must be 0-4 (the schema has Star1-Star4), got {actors_per_movie}")
+    rng = random.Random(seed)
+    actor_pool = actor_pool or max(10, int(n * 0.8))
+    director_pool = director_pool or max(5, n // 4)
+    genre_weights = zipf_cum_weights(len(GENRES), genre_skew)
+    actor_weights = zipf_cum_weights(actor_pool, actor_skew)
+    director_weights = zipf_cum_weights(director_pool, actor_skew)
+    rows = []
+    for idx in range(n):
+        genres = set(rng.choices(GENRES, cum_weights=genre_weights, k=rng.randint(1, 3)))
+        genres = sorted(genres) + ["None"] * (3 - len(genres))
+        stars = set()
+        while len(stars) < min(actors_per_movie, actor_pool):
+            stars.add(rng.choices(range(actor_pool), cum_weights=actor_weights)[0])
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title()
+        rows.append({
+            "Series_Title": f"{title} {idx}",
+            "Released_Year": str(rng.randint(1920, 2023)),
+            "IMDB_Rating": f"{rng.uniform(7.5, 9.3):.1f}",
+            "Director": f"Director {rng.choices(range(director_pool), cum_weights=director_weights)[0]}",
+            **{f"Star{i + 1}": f"Actor {star}" if star is not None else ""
+               for i, star in enumerate(sorted(stars) + [None] * (4 - len(stars)))},
+            **{f"genre_{i + 1}": genre for i, genre in enumerate(genres)},
+        })
+    return rows
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline="", encoding="utf8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def measure(func, memory=True, repeat=1):
+    """(best seconds of ``repeat`` calls, peak traced bytes or None, result) for ``func``."""
+    seconds, result = float("inf"), None
+    for _ in range(repeat):
+        result = None  # don't hold the previous result while timing the next call
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        seconds = min(seconds, time.perf_counter() - start)
+    peak = None
+    if memory:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak, result
+
+
+def time_queries(func, queries, repeat=1):
+    """Best seconds of ``repeat`` passes over ``queries``."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def build_movie_bst(rows):
+    bst = MovieBST()
+    for idx, row in enumerate(rows):
+        bst.insert(BSTMovie(idx, row["Series_Title"],
+                            [row[f"genre_{i}"] for i in range(1, 4) if row[f"genre_{i}"] != "None"],
+                            year=row["Released_Year"], rating=float(row["IMDB_Rating"]),
+                            director=row["Director"],
+                            stars=[row[f"Star{i}"] for i in range(1, 5) if row[f"Star{i}"]]))
+    bst.flush_indexes()
+    return bst
+
+
+def build_catalogue_bst(movies):
+    root = CatalogueBST(movies[0])
+    for movie in movies[1:]:
+        root.insert(movie)
+    return root
+
+
+def build_trie(movies):
+    trie = Trie()
+    for movie in movies:
+        trie.insert(movie.title.lower(), movie)
+    return trie
+
+
+def run_size(n, seed, n_queries, graph_max, memory, results, footprints=None, catalogue=None, repeat=1):
+    """Benchmark one size; ``catalogue`` holds generate_catalogue options and
+    every timing is the best of ``repeat`` runs."""
+    rows = generate_catalogue(n, seed, **(catalogue or {}))
+    rng = random.Random(seed + 1)
+    query_titles = [rows[rng.randrange(n)]["Series_Title"] for _ in range(n_queries)]
+    prefixes = [title[:2].lower() for title in query_titles]
+
+    def record(structure, operation, seconds, peak=None, ops=1):
+        results.append({"size": n, "structure": structure, "operation": operation,
+                        "seconds": seconds, "per_op_us": seconds / ops * 1e6, "peak_bytes": peak})
+        print(f"{n:>9} {structure:<15} {operation:<20} {seconds:>10.4f}s"
+              + (f" {peak / 1e6:>9.1f} MB" if peak is not None else ""), file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalogue.csv")
+        write_csv(rows, path)
+
+        def load():
+            db = MovieDatabase()
+            db.load_from_csv(path)
+            return db
+        seconds, peak, db = measure(load, memory, repeat)
+        record("MovieDatabase", "load_from_csv", seconds, peak)
+
+        def load_and_index():
+            db = load()
+            db.build_indexes()
+            return db
+        seconds, peak, db = measure(load_and_index, memory, repeat)
+        record("MovieDatabase", "load_and_index", seconds, peak)
+    movies = list(db.movies.values())
+
+    seconds, peak, catalogue_bst = measure(lambda: build_catalogue_bst(movies), memory, repeat)
+    record("CatalogueBST", "build", seconds, peak)
+    record("CatalogueBST", "retrieve", time_queries(catalogue_bst.retrieve, query_titles, repeat),
+           ops=n_queries)
+
+    seconds, peak, trie = measure(lambda: build_trie(movies), memory, repeat)
+    record("Trie", "build", seconds, peak)
+    record("Trie", "search_prefix", time_queries(trie.search_prefix, prefixes, repeat), ops=n_queries)
+
+    seconds, peak, movie_bst = measure(lambda: build_movie_bst(rows), memory, repeat)
+    record("MovieBST", "build", seconds, peak)
+    record("MovieBST", "search", time_queries(movie_bst.search, query_titles, repeat), ops=n_queries)
+    genres = [rng.choice(GENRES) for _ in range(n_queries)]
+    record("MovieBST", "get_movies_by_genre",
+           time_queries(movie_bst.get_movies_by_genre, genres, repeat), ops=n_queries)
+
+    if n <= graph_max:
+        def build_graph():
+            system = MovieRecommendationSystem.from_database(db)
+            system.graph  # built lazily on first access
+            return system
+        seconds, peak, system = measure(build_graph, memory, repeat)
+        record("MovieGraph", "build", seconds, peak)
+        ids = [rng.randrange(n) for _ in range(n_queries)]
+        # Bypass the result cache so repeated ids measure the ranking itself
+        record("MovieGraph", "get_similar", time_queries(
+            lambda movie_id: system.graph._rank_neighbors(movie_id, None), ids, repeat), ops=n_queries)
+        results[-2]["edges"] = sum(len(v) for v in system.graph.adj_list.values()) // 2
+    else:
+        system = MovieRecommendationSystem.from_database(db)
+
+    if footprints is not None:
+        # Deep sizes of the built structures (the tracemalloc peaks above include temporaries)
+        footprints[n] = {"MovieRecommendationSystem": system.memory_report(),
+                         "MovieBST": movie_bst.memory_report()}
+        for name, report in footprints[n].items():
+            print(f"\n{name} at {n} movies\n{format_footprint(report)}\n", file=sys.stderr)
+
+
+def compare(results, baseline, tolerance, min_seconds=0.005):
+    """Rows whose time (or memory) grew by more than ``tolerance`` over the baseline.
+
+    Timings that moved by less than ``min_seconds`` are treated as noise.
+    """
+    previous = {(r["size"], r["structure"], r["operation"]): r for r in baseline["results"]}
+    regressions = []
+    for row in results:
+        before = previous.get((row["size"], row["structure"], row["operation"]))
+        if before is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            old, new = before.get(metric), row.get(metric)
+            if metric == "seconds" and old and new and new - old < min_seconds:
+                continue
+            if old and new and new > old * (1 + tolerance):
+                regressions.append({**{k: row[k] for k in ("size", "structure", "operation")},
+                                    "metric": metric, "baseline": old, "current": new,
+                                    "ratio": new / old})
+    return regressions
+
+
+def keep_faster(results, retimed):
+    """Lower each row's time to its re-timed value where that was faster."""
+    faster = {(r["size"], r["structure"], r["operation"]): r for r in retimed}
+    for row in results:
+        other = faster.get((row["size"], row["structure"], row["operation"]))
+        if other is not None and other["seconds"] < row["seconds"]:
+            row["seconds"], row["per_op_us"] = other["seconds"], other["per_op_us"]
+
+
+def settings(meta):
+    """What a run's timings depend on besides the machine, from its JSON meta."""
+    return {"seed": meta.get("seed"), "queries": meta.get("queries"),
+            **{name: meta.get("catalogue", {}).get(name, default) for name, default in CATALOGUE_DEFAULTS.items()}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tree, trie and graph structures.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--genre-skew", type=float, default=CATALOGUE_DEFAULTS["genre_skew"],
+                        help="Zipf exponent of genre popularity")
+    parser.add_argument("--actor-skew", type=float, default=CATALOGUE_DEFAULTS["actor_skew"],
+                        help="Zipf exponent of actor and director popularity")
+    parser.add_argument("--actors-per-movie", type=int, choices=range(5),
+                        default=CATALOGUE_DEFAULTS["actors_per_movie"],
+                        help="stars per movie (the schema has four star columns)")
+    parser.add_argument("--graph-max", type=int, default=2000, help="largest size for the O(n^2) graph build")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="time each operation this many times and keep the best, to filter out noise")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="with --baseline, re-time a size this many times while it looks slower")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("-o", "--output", help="write JSON results here (default stdout)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    parser.add_argument("--save-baseline", help="write these results as the new baseline")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="print the bytes used by each structure (also added to the JSON)")
+    args = parser.parse_args(argv)
+
+    catalogue = {"genre_skew": args.genre_skew, "actor_skew": args.actor_skew,
+                 "actors_per_movie": args.actors_per_movie}
+    meta = {"python": platform.python_version(), "platform": platform.platform(),
+            "seed": args.seed, "queries": args.queries, "sizes": args.sizes, "repeat": args.repeat,
+            "catalogue": catalogue}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf8") as f:
+            baseline = json.load(f)
+        # Checked before running: timings from another catalogue shape are not comparable
+        if settings(baseline["meta"]) != settings(meta):
+            parser.error(f"{args.baseline} was recorded with {settings(baseline['meta'])}, "
+                         f"not {settings(meta)}")
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    results = []
+    footprints = {} if args.memory_report else None
+    for n in args.sizes:
+        run_size(n, args.seed, args.queries, args.graph_max, not args.no_memory, results, footprints, catalogue,
+                 args.repeat)
+    report = {"meta": meta, "results": results}
+    if footprints is not None:
+        report["memory_report"] = footprints
+    exit_code = 0
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for _ in range(args.retries):
+            slow = sorted({r["size"] for r in regressions if r["metric"] == "seconds"})
+            if not slow:
+                break
+            # A slow stretch of the machine can outlast the repeats, so time those sizes again
+            retimed = []
+            for n in slow:
+                run_size(n, args.seed, args.queries, args.graph_max, False, retimed, None, catalogue, args.repeat)
+            keep_faster(results, retimed)
+            regressions = compare(results, baseline, args.tolerance)
+        report["regressions"] = regressions
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['size']} {r['structure']} {r['operation']} {r['metric']}: "
+                  f"{r['ratio']:.2f}x baseline", file=sys.stderr)
+        exit_code = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf8") as f:
+            f.write(text + "\n")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
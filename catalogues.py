@@ -0,0 +1,211 @@
+"""Several overlapping catalogues in one process, sharing movies and similarity work.
+
+    registry = CatalogueRegistry()
+    us = registry.load("us", "imdb_us.csv")
+    eu = registry.load("eu", "imdb_eu.csv")
+    us.db.search_page("the god")          # searches only the US catalogue
+    eu.similar_movies(42)                 # neighbours that exist in the EU catalogue
+    print(registry.stats())
+
+    python catalogues.py us=imdb_us.csv eu=imdb_eu.csv
+
+A movie whose record is identical in several catalogues is one Movie object
+with one movie_id, and all feature strings (genres, actors, directors) are
+interned, so the extra cost of a region that overlaps the others is its
+own id dict and search indexes. Similarity only depends on the two movies,
+so one similarity graph over the union of all catalogues serves every
+region: a view filters the shared neighbour lists to its own members, and
+each overlapping pair is scored once rather than once per region.
+
+The first catalogue keeps its CSV row numbers as movie ids; movies that
+later catalogues add get the next free ids. Views are read-only: edits
+to a shared Movie would leak into every region.
+"""
+import sys
+import time
+
+from communities import CommunityIndex
+from movie_recommender import (SIMILARITY_THRESHOLD, MovieDatabase, MovieRecommendationSystem,
+                               similarity_components, weighted_similarity)
+
+
+def movie_key(movie):
+    """Every field a Movie carries except its id: equal keys are the same record."""
+    return (movie.title, movie.year, movie.director, frozenset(movie.genres), frozenset(movie.actors),
+            movie.rating, movie.runtime, movie.description)
+
+
+class CatalogueRegistry:
+    def __init__(self):
+        union = MovieDatabase()
+        union._built.clear()  # never searched (views have their own indexes), so add_movie skips indexing
+        self.system = MovieRecommendationSystem.from_database(union)  # union of every catalogue
+        self.views = {}  # name -> CatalogueView
+        self.records = 0  # rows loaded across all catalogues, duplicates included
+        self._by_key = {}  # movie_key -> movie_id
+        self._strings = {}  # feature vocabulary shared by every catalogue
+
+    @property
+    def movies(self):
+        return self.system.db.movies
+
+    def _intern(self, value):
+        if not isinstance(value, str):
+            return value
+        return self._strings.setdefault(value, value)
+
+    def _shared_movie(self, movie, taken):
+        """The registry's Movie for this record, adding it to the union if it is new.
+
+        ``taken`` holds the ids already in the catalogue being loaded, so
+        duplicate rows within one CSV stay separate movies as they would in
+        a MovieDatabase of their own.
+        """
+        key = movie_key(movie)
+        movie_id = self._by_key.get(key)
+        if movie_id is not None and movie_id not in taken:
+            return self.movies[movie_id]
+        movie.movie_id = len(self.movies)
+        while movie.movie_id in self.movies:
+            movie.movie_id += 1
+        for attr in ("title", "year", "director", "rating", "runtime", "description"):
+            setattr(movie, attr, self._intern(getattr(movie, attr)))
+        movie.genres = {self._intern(genre) for genre in movie.genres}
+        movie.actors = {self._intern(actor) for actor in movie.actors}
+        self._by_key.setdefault(key, movie.movie_id)
+        self.system.add_movie(movie)  # scores it against the union if the graph is built
+        return movie
+
+    def load(self, name, csv_file):
+        """Load one catalogue CSV and return its CatalogueView."""
+        if name in self.views:
+            raise ValueError(f"Catalogue {name!r} is already loaded")
+        start = time.perf_counter()
+        parsed = MovieDatabase()
+        parsed.load_from_csv(csv_file)
+        taken = set()
+        movies = []
+        for movie_id in sorted(parsed.movies):
+            movie = self._shared_movie(parsed.movies[movie_id], taken)
+            taken.add(movie.movie_id)
+            movies.append(movie)
+        db = MovieDatabase()
+        db.bulk_load(movies)
+        db.build_times["csv_load"] = time.perf_counter() - start
+        self.records += len(movies)
+        view = self.views[name] = CatalogueView(self, name, db)
+        return view
+
+    def view(self, name):
+        return self.views[name]
+
+    def stats(self):
+        """Rows loaded versus movies kept, and pair scorings with and without sharing."""
+        sizes = {name: len(view.db.movies) for name, view in self.views.items()}
+        unique = len(self.movies)
+        return {
+            "catalogues": sizes,
+            "records": self.records,
+            "unique_movies": unique,
+            "shared_records": self.records - unique,
+            "vocabulary": len(self._strings),
+            "pairs_scored": unique * (unique - 1) // 2,
+            "pairs_if_separate": sum(n * (n - 1) // 2 for n in sizes.values()),
+        }
+
+
+class CatalogueView:
+    """Search and recommendations restricted to one catalogue of a registry.
+
+    Has the read side of MovieRecommendationSystem's interface (db,
+    similar_movies, communities, graph_ready, ...), so the Streamlit app can
+    use either.
+    """
+    def __init__(self, registry, name, db):
+        self.registry = registry
+        self.name = name
+        self.db = db  # this catalogue's movies (shared Movie objects) and search indexes
+        self._communities = None
+        self._communities_source = None  # the registry CommunityIndex ours was filtered from
+
+    def __repr__(self):
+        return f"CatalogueView({self.name!r}, movies={len(self.db.movies)})"
+
+    @property
+    def graph(self):
+        """The registry's shared similarity graph (covers every catalogue)."""
+        return self.registry.system.graph
+
+    @property
+    def graph_ready(self):
+        return self.registry.system.graph_ready
+
+    def graph_progress(self):
+        return self.registry.system.graph_progress()
+
+    def start_graph_build(self, block_size=64, background=True):
+        return self.registry.system.start_graph_build(block_size, background)
+
+    def _members_only(self, pairs):
+        return [(movie_id, score) for movie_id, score in pairs if movie_id in self.db.movies]
+
+    def similar_movies(self, movie_id, weights=None):
+        """MovieRecommendationSystem.similar_movies over this catalogue's movies only."""
+        if movie_id not in self.db.movies:
+            return []
+        return self._members_only(self.registry.system.similar_movies(movie_id, weights))
+
+    def recommend_for_history(self, movie_ids, k=10):
+        ranked = self.registry.system.recommend_for_history(movie_ids, k=len(self.registry.movies))
+        return self._members_only(ranked)[:k]
+
+    @property
+    def communities(self):
+        """The registry's communities restricted to this catalogue."""
+        shared = self.registry.system.communities
+        if self._communities is None or self._communities_source is not shared:
+            clusters = [[movie_id for movie_id in members if movie_id in self.db.movies]
+                        for members in shared.clusters]
+            clusters = sorted((members for members in clusters if members), key=len, reverse=True)
+            self._communities = CommunityIndex(clusters, self.db.movies)
+            self._communities_source = shared
+        return self._communities
+
+    def recommend_clustered(self, movie_id, k=10, n_clusters=3, weights=None):
+        movie = self.db.movies.get(movie_id)
+        if movie is None:
+            return []
+        return self.communities.recommend(
+            movie, lambda a, b: weighted_similarity(similarity_components(a, b), weights),
+            k, n_clusters, SIMILARITY_THRESHOLD, weights)
+
+    def explore_cluster(self, cluster_id):
+        movies = [self.db.movies[movie_id] for movie_id in self.communities.members(cluster_id)]
+        return sorted(movies, key=lambda movie: movie.rating or 0, reverse=True)
+
+    def startup_report(self):
+        report = self.registry.system.startup_report()
+        report["catalogue"] = self.name
+        report["movies"] = len(self.db.movies)
+        report["stages"] = {**report["stages"], **self.db.build_times}
+        return report
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python catalogues.py NAME=CSV [NAME=CSV ...]")
+        return
+    registry = CatalogueRegistry()
+    for spec in argv:
+        name, _, csv_file = spec.rpartition("=")
+        registry.load(name or csv_file, csv_file)
+    start = time.perf_counter()
+    registry.system.graph
+    print(f"shared graph built in {time.perf_counter() - start:.2f}s")
+    for name, value in registry.stats().items():
+        print(f"{name:<18} {value}")
+
+
+if __name__ == "__main__":
+    main()
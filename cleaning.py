@@ -0,0 +1,211 @@
+"""Streaming clean of the raw IMDB export into imdb_top_1000_cleaned.csv.
+
+    python cleaning.py                                   # imdb_top_1000.csv -> imdb_top_1000_cleaned.csv
+    python cleaning.py raw.csv cleaned.csv --chunk-size 5000 --force
+
+    report = clean_csv("imdb_top_1000.csv", "imdb_top_1000_cleaned.csv")
+
+The raw file is read and written ``chunk_size`` rows at a time, so memory
+does not grow with the file. Each row is normalized once, here, so loaders
+can trust the cleaned schema:
+
+    Series_Title, Director, Star1-4   stripped
+    IMDB_Rating                       a float ("9" -> "9.0")
+    Genre "Crime, Drama"              genre_1..genre_3, padded with "None"
+
+Rows without a title or with an unparseable rating are rejected and listed
+in the report; a raw header missing a required column raises SchemaError.
+
+Cleaned rows are cached in ``<output>.cache`` (SQLite) under a hash of the
+raw fields they are built from, so a refresh only re-cleans rows that
+changed. If the raw file and the output are both unchanged since the last
+run nothing is rewritten at all.
+"""
+import argparse
+import csv
+import hashlib
+import os
+import sqlite3
+import time
+
+CLEANER_VERSION = 1  # bump when the cleaning rules change, to invalidate cached rows
+RAW_COLUMNS = ["Series_Title", "Released_Year", "IMDB_Rating", "Director", "Star1", "Star2", "Star3",
+               "Star4", "Genre"]
+CLEAN_COLUMNS = ["Series_Title", "Released_Year", "IMDB_Rating", "Director", "Star1", "Star2", "Star3",
+                 "Star4", "genre_1", "genre_2", "genre_3"]
+MAX_GENRES = 3
+MISSING_GENRE = "None"
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def check_header(fieldnames, path):
+    missing = [column for column in RAW_COLUMNS if column not in (fieldnames or ())]
+    if missing:
+        raise SchemaError(f"{path} is missing required columns: {', '.join(missing)}")
+
+
+def clean_row(raw):
+    """Cleaned values (in CLEAN_COLUMNS order) for one raw row; raises SchemaError if unusable."""
+    values = {column: (raw.get(column) or "").strip() for column in RAW_COLUMNS}
+    if not values["Series_Title"]:
+        raise SchemaError("empty Series_Title")
+    try:
+        rating = str(float(values["IMDB_Rating"]))
+    except ValueError:
+        raise SchemaError(f"IMDB_Rating {values['IMDB_Rating']!r} is not a number") from None
+    genres = [genre.strip() for genre in values["Genre"].split(",") if genre.strip()][:MAX_GENRES]
+    genres += [MISSING_GENRE] * (MAX_GENRES - len(genres))
+    return [values["Series_Title"], values["Released_Year"], rating, values["Director"],
+            values["Star1"], values["Star2"], values["Star3"], values["Star4"], *genres]
+
+
+def row_hash(raw):
+    """Hash of only the raw fields clean_row reads, so unrelated columns don't invalidate it."""
+    digest = hashlib.blake2b(str(CLEANER_VERSION).encode(), digest_size=16)
+    for column in RAW_COLUMNS:
+        digest.update(b"\x1f" + (raw.get(column) or "").encode("utf8"))
+    return digest.hexdigest()
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.blake2b(str(CLEANER_VERSION).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RowCache:
+    """hash -> cleaned row, kept on disk so lookups don't need the whole file in memory."""
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS rows (hash TEXT PRIMARY KEY, cleaned TEXT, run INTEGER)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.run = int(self.get_meta("run") or 0) + 1
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def lookup(self, hashes):
+        """{hash: cleaned values} for the cached hashes; marks them as used by this run."""
+        found = {}
+        unique = list(set(hashes))
+        for start in range(0, len(unique), 500):  # stay under SQLite's variable limit
+            batch = unique[start:start + 500]
+            marks = ",".join("?" * len(batch))
+            for key, cleaned in self.conn.execute(f"SELECT hash, cleaned FROM rows WHERE hash IN ({marks})", batch):
+                found[key] = cleaned.split("\x1f")
+            self.conn.execute(f"UPDATE rows SET run = ? WHERE hash IN ({marks})", [self.run, *batch])
+        return found
+
+    def store(self, entries):
+        self.conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?)",
+                              [(key, "\x1f".join(values), self.run) for key, values in entries])
+
+    def finish(self):
+        """Drop rows no longer in the raw file and commit."""
+        self.conn.execute("DELETE FROM rows WHERE run != ?", (self.run,))
+        self.set_meta("run", str(self.run))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def _read_chunks(reader, chunk_size):
+    chunk = []
+    for raw in reader:
+        chunk.append((reader.line_num, raw))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_chunks(reader, writer, cache, chunk_size, report):
+    writer.writerow(CLEAN_COLUMNS)
+    for chunk in _read_chunks(reader, chunk_size):
+        hashes = [row_hash(raw) for _, raw in chunk]
+        cached = cache.lookup(hashes)
+        fresh = []
+        for (line, raw), key in zip(chunk, hashes):
+            report["rows"] += 1
+            values = cached.get(key)
+            if values is not None:
+                report["cached"] += 1
+            else:
+                try:
+                    values = clean_row(raw)
+                except SchemaError as e:
+                    report["rejected"].append((line, str(e)))
+                    continue
+                cached[key] = values
+                fresh.append((key, values))
+                report["cleaned"] += 1
+            writer.writerow(values)
+        cache.store(fresh)
+
+
+def clean_csv(raw_path="imdb_top_1000.csv", output_path="imdb_top_1000_cleaned.csv", chunk_size=1000,
+              cache_path=None, force=False):
+    """Clean ``raw_path`` into ``output_path``; returns a report of what was (re)processed."""
+    start = time.perf_counter()
+    cache = RowCache(cache_path or output_path + ".cache")
+    report = {"rows": 0, "cleaned": 0, "cached": 0, "rejected": [], "unchanged": False}
+    try:
+        raw_digest = file_hash(raw_path)
+        if (not force and os.path.exists(output_path) and cache.get_meta("raw") == raw_digest
+                and cache.get_meta("output") == file_hash(output_path)):
+            report["unchanged"] = True
+            report["seconds"] = time.perf_counter() - start
+            return report
+
+        tmp_path = output_path + ".tmp"
+        with open(raw_path, newline="", encoding="utf8") as src:
+            reader = csv.DictReader(src)
+            check_header(reader.fieldnames, raw_path)
+            try:
+                with open(tmp_path, "w", newline="", encoding="utf8") as dst:
+                    _write_chunks(reader, csv.writer(dst, lineterminator="\n"), cache, chunk_size, report)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, output_path)
+        cache.set_meta("raw", raw_digest)
+        cache.set_meta("output", file_hash(output_path))
+        cache.finish()
+    finally:
+        cache.close()
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean the raw IMDB CSV into the schema the loaders read.")
+    parser.add_argument("raw", nargs="?", default="imdb_top_1000.csv")
+    parser.add_argument("output", nargs="?", default="imdb_top_1000_cleaned.csv")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--cache", help="row cache path (default <output>.cache)")
+    parser.add_argument("--force", action="store_true", help="rewrite the output even if nothing changed")
+    args = parser.parse_args(argv)
+
+    report = clean_csv(args.raw, args.output, args.chunk_size, args.cache, args.force)
+    if report["unchanged"]:
+        print(f"{args.output} is up to date ({report['seconds']:.3f}s)")
+        return
+    print(f"{report['rows']} rows: {report['cleaned']} cleaned, {report['cached']} from cache, "
+          f"{len(report['rejected'])} rejected ({report['seconds']:.3f}s)")
+    for line, error in report["rejected"]:
+        print(f"  line {line}: {error}")
+
+
+if __name__ == "__main__":
+    main()
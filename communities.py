@@ -0,0 +1,187 @@
+"""Community index over the similarity graph for coarse-to-fine retrieval.
+
+    index = CommunityIndex.build(system.graph.to_csr(), system.db.movies)
+    recs = index.recommend(movie, score, k=10)   # rank only inside the best clusters
+    print(index.describe(index.cluster_of(movie.movie_id)))
+
+Communities come from weighted label propagation on a k-nearest-neighbour
+sparsification of the graph: at the 0.1 threshold almost every pair that
+shares a genre is an edge, and propagation over the full graph collapses
+into a few giant clusters. Clusters larger than ``max_cluster_size`` are
+split again, so a query scores at most ``n_clusters * max_cluster_size``
+movies whatever the catalogue size.
+
+Each cluster keeps a centroid: the fraction of its members carrying each
+genre, actor and director. A query picks its own cluster plus the clusters
+whose centroids best match the movie's features, then ranks their members.
+"""
+import heapq
+
+import numpy as np
+
+from movie_recommender import DEFAULT_WEIGHTS
+
+FEATURE_KINDS = ("genre", "actors", "director")  # same keys as the similarity weights
+
+
+def movie_features(movie):
+    """(kind, token) pairs describing a movie."""
+    features = [("genre", genre) for genre in movie.genres]
+    features += [("actors", actor) for actor in movie.actors]
+    if movie.director:
+        features.append(("director", movie.director))
+    return features
+
+
+def knn_edges(csr, k):
+    """Each row's k strongest edges, symmetrized: (rows, cols, weights) arrays."""
+    n = len(csr)
+    rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(csr.indptr))
+    cols = csr.indices.astype(np.int64)
+    order = np.lexsort((-csr.data, rows))
+    rows, cols, weights = rows[order], cols[order], csr.data[order]
+    rank = np.arange(len(rows)) - csr.indptr[rows]
+    keep = rank < k
+    rows, cols, weights = rows[keep], cols[keep], weights[keep]
+    rows, cols = np.concatenate([rows, cols]), np.concatenate([cols, rows])
+    weights = np.concatenate([weights, weights])
+    _, unique = np.unique(rows * n + cols, return_index=True)
+    return rows[unique], cols[unique], weights[unique]
+
+
+def label_propagation(n, rows, cols, weights, max_iter=30, seed=0):
+    """Weighted label propagation; returns one label per row.
+
+    Each round a random half of the rows adopts the label with the largest
+    total edge weight among its neighbours (ties to the smaller label), which
+    avoids the oscillation of fully synchronous updates.
+    """
+    rng = np.random.default_rng(seed)
+    labels = np.arange(n, dtype=np.int64)
+    if not len(rows):
+        return labels
+    for _ in range(max_iter):
+        keys, inverse = np.unique(rows * n + labels[cols], return_inverse=True)
+        sums = np.bincount(inverse, weights=weights)
+        key_rows, key_labels = keys // n, keys % n
+        order = np.lexsort((key_labels, -sums, key_rows))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = key_rows[order][1:] != key_rows[order][:-1]
+        best = labels.copy()
+        best[key_rows[order][first]] = key_labels[order][first]
+        update = rng.random(n) < 0.5
+        changed = np.count_nonzero(labels[update] != best[update])
+        labels[update] = best[update]
+        if not changed and np.array_equal(labels, best):
+            break
+    return labels
+
+
+class CommunityIndex:
+    def __init__(self, clusters, movies):
+        self.clusters = clusters  # cluster_id -> [movie_id], largest first
+        self.cluster_of_movie = {movie_id: cluster_id
+                                 for cluster_id, members in enumerate(clusters) for movie_id in members}
+        self.movies = movies
+        self.centroids = []  # cluster_id -> {(kind, token): fraction of members}
+        self.feature_clusters = {}  # (kind, token) -> [(cluster_id, fraction)]
+        for cluster_id, members in enumerate(clusters):
+            counts = {}
+            for movie_id in members:
+                for feature in movie_features(movies[movie_id]):
+                    counts[feature] = counts.get(feature, 0) + 1
+            centroid = {feature: count / len(members) for feature, count in counts.items()}
+            self.centroids.append(centroid)
+            for feature, fraction in centroid.items():
+                self.feature_clusters.setdefault(feature, []).append((cluster_id, fraction))
+
+    @classmethod
+    def build(cls, csr, movies, k=10, max_cluster_size=150, max_iter=30, seed=0):
+        """Detect communities on ``csr`` (a CSRGraph) and index them."""
+        n = len(csr)
+        rows, cols, weights = knn_edges(csr, k)
+        labels = label_propagation(n, rows, cols, weights, max_iter, seed)
+        groups = {}
+        for row, label in enumerate(labels.tolist()):
+            groups.setdefault(label, []).append(row)
+        parts = []
+        for members in groups.values():
+            parts.extend(_split(members, rows, cols, weights, max_cluster_size, max_iter, seed))
+        parts.sort(key=len, reverse=True)
+        return cls([[csr.ids[row] for row in part] for part in parts], movies)
+
+    def __len__(self):
+        return len(self.clusters)
+
+    def cluster_of(self, movie_id):
+        return self.cluster_of_movie.get(movie_id)
+
+    def members(self, cluster_id):
+        return self.clusters[cluster_id]
+
+    def describe(self, cluster_id, top=2):
+        """Short label from the most common genres, director and actor."""
+        by_kind = {kind: [] for kind in FEATURE_KINDS}
+        for (kind, token), fraction in self.centroids[cluster_id].items():
+            by_kind[kind].append((fraction, token))
+        parts = [" / ".join(token for _, token in sorted(by_kind["genre"], reverse=True)[:top])]
+        for kind in ("director", "actors"):
+            if by_kind[kind]:
+                fraction, token = max(by_kind[kind])
+                if fraction > 0.1:
+                    parts.append(token.title())
+        return " · ".join(part for part in parts if part)
+
+    def candidate_clusters(self, movie, n_clusters=3, weights=None):
+        """The movie's own cluster first, then the clusters whose centroids match it best."""
+        weights = weights or DEFAULT_WEIGHTS
+        features = movie_features(movie)
+        per_kind = {kind: sum(1 for k, _ in features if k == kind) for kind in FEATURE_KINDS}
+        affinity = {}
+        for feature in features:
+            share = weights[feature[0]] / per_kind[feature[0]]
+            for cluster_id, fraction in self.feature_clusters.get(feature, ()):
+                affinity[cluster_id] = affinity.get(cluster_id, 0.0) + share * fraction
+        own = self.cluster_of(movie.movie_id)
+        chosen = [own] if own is not None else []
+        for cluster_id in heapq.nlargest(n_clusters, affinity, key=affinity.get):
+            if len(chosen) == n_clusters:
+                break
+            if cluster_id not in chosen:
+                chosen.append(cluster_id)
+        return chosen
+
+    def recommend(self, movie, score, k=10, n_clusters=3, threshold=0.0, weights=None):
+        """Top-k (movie_id, score) among the members of the candidate clusters.
+
+        ``score(movie, other)`` is the similarity used for the final ranking.
+        """
+        scored = []
+        for cluster_id in self.candidate_clusters(movie, n_clusters, weights):
+            for movie_id in self.clusters[cluster_id]:
+                if movie_id == movie.movie_id:
+                    continue
+                sim = score(movie, self.movies[movie_id])
+                if sim > threshold:
+                    scored.append((movie_id, sim))
+        return heapq.nlargest(k, scored, key=lambda pair: pair[1])
+
+
+def _split(members, rows, cols, weights, max_size, max_iter, seed, depth=0):
+    """Re-run label propagation inside an oversized cluster; chunk it if that fails."""
+    if len(members) <= max_size:
+        return [members]
+    local = {row: i for i, row in enumerate(members)}
+    inside = np.isin(rows, members) & np.isin(cols, members)
+    sub_rows = np.array([local[row] for row in rows[inside].tolist()], dtype=np.int64)
+    sub_cols = np.array([local[col] for col in cols[inside].tolist()], dtype=np.int64)
+    labels = label_propagation(len(members), sub_rows, sub_cols, weights[inside], max_iter, seed + depth + 1)
+    groups = {}
+    for i, label in enumerate(labels.tolist()):
+        groups.setdefault(label, []).append(members[i])
+    if len(groups) == 1 or depth >= 3:
+        return [members[i:i + max_size] for i in range(0, len(members), max_size)]
+    parts = []
+    for group in groups.values():
+        parts.extend(_split(group, rows, cols, weights, max_size, max_iter, seed, depth + 1))
+    return parts
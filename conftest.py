@@ -0,0 +1,17 @@
+import pytest
+
+from benchmark import generate_catalogue, write_csv
+
+
+@pytest.fixture(scope="session")
+def catalogue_csv(tmp_path_factory):
+    """Write a synthetic catalogue (see benchmark.generate_catalogue) and return its path.
+
+    Session-scoped so module-scoped fixtures can use it too; every call
+    writes to a fresh directory.
+    """
+    def write(size, seed, actor_pool=None, director_pool=None):
+        path = str(tmp_path_factory.mktemp("catalogue") / "catalogue.csv")
+        write_csv(generate_catalogue(size, seed=seed, actor_pool=actor_pool, director_pool=director_pool), path)
+        return path
+    return write
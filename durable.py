@@ -0,0 +1,178 @@
+"""Write-ahead log and checkpoints for catalogue edits.
+
+    catalogue = DurableCatalogue("state", lambda: MovieRecommendationSystem(CSV_FILE))
+    catalogue.apply("update_movie", 12, rating=8.9)
+    catalogue.apply("graph.delete_similarity", 1, 2)
+    catalogue.close()
+
+Every edit is appended to ``wal.log`` before it is applied. Records are
+flushed to the OS immediately and fsynced in batches (every ``fsync_every``
+records or ``fsync_interval`` seconds, whichever comes first), so an OS
+crash can lose at most the last unsynced batch; a process crash loses
+nothing. Every ``checkpoint_every`` edits the whole object is pickled to
+``checkpoint.pkl`` and the log is truncated. On restart the checkpoint is
+loaded and only the log tail is replayed, so the CSV load and graph build
+happen once, on the very first start: lazy structures (the similarity
+graph and search indexes) are built before a checkpoint is written, so a
+replayed graph edit never triggers a full graph build.
+
+A logged edit that fails on replay failed the same way when it was first
+applied; it is skipped and listed in ``recovery["errors"]``.
+
+Works with any picklable object whose edits are method calls
+(MovieRecommendationSystem, MovieDatabase, MovieGraph, MovieBST).
+"""
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+HEADER = struct.Struct("<II")  # payload length, crc32 of the payload
+
+
+def read_log(path):
+    """(records, end of the last intact record). A torn or corrupt tail is ignored."""
+    records, good_end = [], 0
+    if not os.path.exists(path):
+        return records, good_end
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                break
+            length, crc = HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            records.append(pickle.loads(payload))
+            good_end = f.tell()
+    return records, good_end
+
+
+def _build_lazy(value):
+    """Build the lazy graph and indexes of a system or database, so checkpoints include them."""
+    if hasattr(type(value), "graph"):
+        value.graph
+    db = getattr(value, "db", value)
+    if hasattr(db, "build_indexes"):
+        db.build_indexes()
+
+
+def _fsync_directory(directory):
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class DurableCatalogue:
+    def __init__(self, directory, factory, fsync_every=64, fsync_interval=1.0, checkpoint_every=10000):
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.checkpoint_every = checkpoint_every
+        self.log_path = os.path.join(directory, "wal.log")
+        self.checkpoint_path = os.path.join(directory, "checkpoint.pkl")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        start = time.perf_counter()
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "rb") as f:
+                self.seq, self.value = pickle.load(f)
+            source = "checkpoint"
+        else:
+            self.seq, self.value = 0, factory()
+            source = "factory"
+        records, good_end = read_log(self.log_path)
+        replayed = 0
+        errors = []  # (seq, method, error) for edits that failed when first applied too
+        for seq, method, args, kwargs in records:
+            if seq <= self.seq:
+                continue  # already in the checkpoint (crash before the log was truncated)
+            try:
+                self._call(method, args, kwargs)
+            except Exception as e:
+                errors.append((seq, method, f"{type(e).__name__}: {e}"))
+            self.seq = seq
+            replayed += 1
+        self.recovery = {"source": source, "replayed": replayed, "errors": errors,
+                         "seconds": time.perf_counter() - start}
+
+        self._log = open(self.log_path, "ab")
+        if self._log.tell() != good_end:
+            self._log.truncate(good_end)  # drop the torn tail so new records follow intact ones
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._since_checkpoint = replayed
+        if source == "factory":
+            self.checkpoint()
+
+    def _call(self, method, args, kwargs):
+        target = self.value
+        *path, name = method.split(".")
+        for attr in path:
+            target = getattr(target, attr)
+        return getattr(target, name)(*args, **kwargs)
+
+    def apply(self, method, *args, **kwargs):
+        """Log, then run ``method`` (a dotted path such as "graph.update_similarity")."""
+        with self._lock:
+            payload = pickle.dumps((self.seq + 1, method, args, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+            self._log.write(HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._log.flush()
+            self.seq += 1
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+            result = self._call(method, args, kwargs)
+            self._since_checkpoint += 1
+            if self.checkpoint_every and self._since_checkpoint >= self.checkpoint_every:
+                self._checkpoint()
+            return result
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._unsynced:
+            os.fsync(self._log.fileno())
+            self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def checkpoint(self):
+        with self._lock:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        self._sync()
+        _build_lazy(self.value)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((self.seq, self.value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+        _fsync_directory(self.directory)
+        # Everything in the log is now in the checkpoint
+        self._log.truncate(0)
+        os.fsync(self._log.fileno())
+        self._since_checkpoint = 0
+
+    def close(self):
+        with self._lock:
+            if not self._log.closed:
+                self._sync()
+                self._log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,1041 @@
+"""Differential tests: the optimized engines against brute-force references.
+
+    python equivalence_harness.py                          # 20 catalogues x 300 operations, then the checks
+    python equivalence_harness.py --seeds 100 --ops 1000 --size 150
+    python equivalence_harness.py --backend system --backend movie_bst --first-seed 7 --seeds 1
+
+Each seed generates a random catalogue in the cleaned CSV schema, with
+small genre, actor and director pools so that shared features and tied
+scores are common. It then generates a random sequence of inserts,
+updates, deletes and queries. Every operation runs on ReferenceCatalogue
+(plain dicts, linear scans and combined_similarity) and on every backend
+that implements it, and the results must be equal. A mismatch prints the
+seed, step, operation and both results; rerun it with --first-seed SEED
+--seeds 1.
+
+Results are compared after a canonical ordering wherever the engines make
+no ordering promise (prefix and genre lookups, tied similarity scores).
+Every comparison is exact, re-weighted similarity and history scores
+included (the reference adds in the same order as the engine), except
+random_walk: the engine's personalized PageRank is an iterative solver
+that stops once an iteration moves the vector by less than 1e-6, so its
+scores are compared to an exact linear solve within PAGERANK_TOLERANCE.
+
+Some behaviour is not a sequence of operations, so it has its own checks
+(run after the operations, and by test_equivalence.py under pytest):
+check_sparsified (pruning policies against a brute-force pruning),
+check_catalogue_views (each CatalogueRegistry view against a reference of
+its own rows) and check_pair_cache (graphs built with a warm PairCache
+against full builds, neighbour order included).
+
+To check a new engine, write a backend class with the operation methods
+it supports (same names and arguments as ReferenceCatalogue, returning
+the same normalized values) and add it to BACKENDS. The timing table
+shows each backend's time per operation relative to the reference; it
+includes the backends' own consistency checks (paging, the snapshot
+probe, restarts), so edits through snapshots or the durable log look
+slower than they are.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark import GENRES, WORDS, generate_catalogue, write_csv
+from BST import Movie as BSTMovie, MovieBST
+from catalogues import CatalogueRegistry
+from durable import DurableCatalogue
+from movie_recommender import (SIMILARITY_THRESHOLD, Movie, MovieRecommendationSystem,
+                               combined_similarity)
+from query_planner import SORT_KEYS
+from snapshots import SnapshotStore
+from sparsify import SparsificationPolicy
+
+# The engine stops once an iteration moves the scores by less than tol=1e-6 (L1). Each
+# step contracts by 1 - restart = 0.85, so it is then within 0.85 / 0.15 * 1e-6 of the solution
+PAGERANK_TOLERANCE = 1e-5
+EDITS = ("insert", "update", "delete")
+
+
+def _norm(title):
+    return title.strip().lower()
+
+
+def _year_key(movie):
+    try:
+        return int(str(movie.year).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _ranked(pairs):
+    """(id, score) pairs with ties in id order; also checks scores never increase."""
+    pairs = [(movie_id, float(score)) for movie_id, score in pairs]
+    scores = [score for _, score in pairs]
+    if any(a < b for a, b in zip(scores, scores[1:])):
+        raise AssertionError(f"results are not sorted by score: {pairs}")
+    return sorted(pairs, key=lambda pair: (-pair[1], pair[0]))
+
+
+def movie_fields(row, movie_id):
+    """Keyword arguments of a movie_recommender.Movie for one cleaned CSV row."""
+    try:
+        rating = float(row["IMDB_Rating"])
+    except ValueError:
+        rating = 0.0
+    return {
+        "movie_id": movie_id,
+        "title": row["Series_Title"].strip(),
+        "genres": [row[f"genre_{i}"] for i in range(1, 4) if row[f"genre_{i}"] not in ("", "None")],
+        "director": row["Director"].strip(),
+        "actors": [row[f"Star{i}"].strip() for i in range(1, 5) if row[f"Star{i}"].strip()],
+        "year": row["Released_Year"].strip(),
+        "rating": rating,
+    }
+
+
+class ReferenceCatalogue:
+    """The specification: every answer computed from scratch with a linear scan."""
+    name = "reference"
+
+    def __init__(self, rows, workdir):
+        self.fields = {}  # movie_id -> Movie keyword arguments
+        self.movies = {}
+        for movie_id, row in enumerate(rows):
+            self.insert(movie_fields(row, movie_id))
+
+    # Edits
+    def insert(self, fields):
+        """False, changing nothing, if the id is already in use."""
+        if fields["movie_id"] in self.movies:
+            return False
+        self._store(fields)
+        return True
+
+    def _store(self, fields):
+        self.fields[fields["movie_id"]] = dict(fields)
+        self.movies[fields["movie_id"]] = Movie(runtime="", **fields)
+
+    def update(self, movie_id, changes):
+        if movie_id not in self.movies:
+            return False
+        self._store({**self.fields[movie_id], **changes})
+        return True
+
+    def delete(self, movie_id):
+        if movie_id not in self.movies:
+            return False
+        del self.movies[movie_id]
+        del self.fields[movie_id]
+        return True
+
+    # MovieRecommendationSystem queries
+    def similar(self, movie_id, weights):
+        movie = self.movies.get(movie_id)
+        if movie is None:
+            return []
+        pairs = [(other.movie_id, combined_similarity(movie, other, weights))
+                 for other in self.movies.values() if other.movie_id != movie_id]
+        return sorted(((i, s) for i, s in pairs if s > SIMILARITY_THRESHOLD), key=lambda p: (-p[1], p[0]))
+
+    def history(self, movie_ids, k):
+        """The full ranking; backends check that their top k is its prefix."""
+        seen = set(movie_ids)
+        scores = {}
+        for movie_id in seen:  # the engine's order, so every sum rounds the same way
+            for other, score in self.similar(movie_id, None):
+                if other not in seen:
+                    scores[other] = scores.get(other, 0.0) + score
+        return sorted(scores.items(), key=lambda p: (-p[1], p[0]))
+
+    def random_walk(self, seed_sets, k, restart=0.15):
+        """{movie_id: score} of every reachable non-seed movie, per seed set.
+
+        Solves the walk's stationary equation directly: a step follows an
+        edge with probability proportional to its score, or restarts at a
+        seed with probability ``restart`` (always, from a movie without
+        edges).
+        """
+        ids = sorted(self.movies)
+        row_of = {movie_id: row for row, movie_id in enumerate(ids)}
+        adjacency = np.zeros((len(ids), len(ids)))
+        for movie_id in ids:
+            for other, score in self.similar(movie_id, None):
+                adjacency[row_of[other], row_of[movie_id]] = score
+        degrees = adjacency.sum(axis=0)
+        dangling = degrees == 0
+        walk = (1 - restart) * adjacency / np.where(dangling, 1.0, degrees)
+        results = []
+        for seeds in seed_sets:
+            rows = [row_of[movie_id] for movie_id in set(seeds) if movie_id in row_of]
+            if not rows:
+                results.append({})
+                continue
+            restart_vector = np.zeros(len(ids))
+            restart_vector[rows] = 1.0 / len(rows)
+            transition = walk + (1 - restart) * np.outer(restart_vector, dangling)
+            scores = np.linalg.solve(np.eye(len(ids)) - transition, restart * restart_vector)
+            reached, frontier = set(rows), list(rows)
+            while frontier:
+                row = frontier.pop()
+                for other in np.flatnonzero(adjacency[:, row]):
+                    if other not in reached:
+                        reached.add(other)
+                        frontier.append(other)
+            results.append({ids[row]: float(scores[row]) for row in reached if ids[row] not in seeds})
+        return results
+
+    def prefix(self, prefix):
+        return sorted(i for i, m in self.movies.items() if m.title.lower().startswith(prefix.lower()))
+
+    def genre(self, genre, prefix):
+        return sorted(i for i, m in self.movies.items()
+                      if genre in m.genres and m.title.lower().startswith(prefix.lower()))
+
+    def title(self, title):
+        matches = [i for i, m in self.movies.items() if m.title.lower() == _norm(title)]
+        return matches[0] if matches else None
+
+    def stored_title(self, movie_id):
+        movie = self.movies.get(movie_id)
+        return movie.title.strip() if movie else None
+
+    def preference(self, director, actor):
+        director, actor = _norm(director), _norm(actor)
+        scored = []
+        for movie_id, movie in self.movies.items():
+            score = (2 if director and movie.director == director else 0) + (1 if actor and actor in movie.actors else 0)
+            if score:
+                scored.append((score, movie_id))
+        return sorted(scored, key=lambda pair: (-pair[0], pair[1]))
+
+    def query(self, filters):
+        def keep(movie):
+            year = _year_key(movie)
+            return (all(genre in movie.genres for genre in filters.get("genres") or ())
+                    and (not filters.get("actor") or _norm(filters["actor"]) in movie.actors)
+                    and (not filters.get("director") or _norm(filters["director"]) == movie.director)
+                    and (filters.get("min_rating") is None or movie.rating >= filters["min_rating"])
+                    and (filters.get("max_rating") is None or movie.rating <= filters["max_rating"])
+                    and (filters.get("min_year") is None or (year is not None and year >= filters["min_year"]))
+                    and (filters.get("max_year") is None or (year is not None and year <= filters["max_year"])))
+        movies = [self.movies[i] for i in sorted(self.movies) if keep(self.movies[i])]
+        movies = sorted(movies, key=SORT_KEYS[filters["sort_by"]], reverse=filters["descending"])
+        return [movie.movie_id for movie in movies[:filters["limit"]]]
+
+    # SparsificationPolicy on a full build
+    def edges(self):
+        """{(i, j): score} for i < j, every pair above the threshold."""
+        ids = sorted(self.movies)
+        edges = {}
+        for n, i in enumerate(ids):
+            for j in ids[n + 1:]:
+                score = combined_similarity(self.movies[i], self.movies[j])
+                if score > SIMILARITY_THRESHOLD:
+                    edges[(i, j)] = score
+        return edges
+
+    def sparsified(self, top_k=None, mutual=False, genre_quantile=None, quantize=False, thresholds=None):
+        """The edges a full apply of SparsificationPolicy keeps, and its genre thresholds.
+
+        ``thresholds`` replaces the genre thresholds a full apply would learn.
+        """
+        edges = self.edges()
+        if thresholds is None:
+            thresholds = {}
+        if genre_quantile is not None and not thresholds:
+            by_genre = {}
+            for (i, j), score in edges.items():
+                for genre in self.movies[i].genres & self.movies[j].genres:
+                    by_genre.setdefault(genre, []).append(score)
+            thresholds = {genre: max(SIMILARITY_THRESHOLD, float(np.quantile(scores, genre_quantile)))
+                          for genre, scores in by_genre.items()}
+        kept = {(i, j): score for (i, j), score in edges.items()
+                if score > self.genre_threshold(thresholds, i, j)}
+        if top_k:
+            neighbours = {movie_id: [] for movie_id in self.movies}
+            for (i, j), score in kept.items():
+                neighbours[i].append((j, score))
+                neighbours[j].append((i, score))
+            top = {movie_id: {j for j, _ in sorted(pairs, key=lambda p: (-p[1], p[0]))[:top_k]}
+                   for movie_id, pairs in neighbours.items()}
+            kept = {(i, j): score for (i, j), score in kept.items()
+                    if ((j in top[i]) and (i in top[j]) if mutual else (j in top[i]) or (i in top[j]))}
+        if quantize:
+            kept = {pair: float(np.float16(score)) for pair, score in kept.items()}
+        return kept, thresholds
+
+    def genre_threshold(self, thresholds, i, j):
+        shared = self.movies[i].genres & self.movies[j].genres
+        return min((thresholds.get(genre, SIMILARITY_THRESHOLD) for genre in shared), default=SIMILARITY_THRESHOLD)
+
+    # MovieBST queries
+    def _by_title(self, movies=None):
+        movies = self.movies.values() if movies is None else movies
+        return sorted(movies, key=lambda m: _norm(m.title))
+
+    def title_order(self):
+        return [m.movie_id for m in self._by_title()]
+
+    def titles_with_prefix(self, prefix, genre):
+        return [m.movie_id for m in self._by_title()
+                if _norm(m.title).startswith(prefix.strip().lower()) and (genre is None or genre in m.genres)]
+
+    def kth(self, k):
+        ordered = self.title_order()
+        return ordered[k - 1] if 1 <= k <= len(ordered) else None
+
+    def neighbours(self, probe):
+        probe = _norm(probe)
+        ordered = self._by_title()
+        after = [m.movie_id for m in ordered if _norm(m.title) > probe]
+        before = [m.movie_id for m in ordered if _norm(m.title) < probe]
+        return (after[0] if after else None, before[-1] if before else None)
+
+    def by_year(self, start, end, genre):
+        movies = [m for m in self.movies.values() if _year_key(m) is not None
+                  and (start is None or _year_key(m) >= start) and (end is None or _year_key(m) <= end)
+                  and (genre is None or genre in m.genres)]
+        return [m.movie_id for m in sorted(movies, key=lambda m: (_year_key(m), _norm(m.title)))]
+
+    def by_rating(self, low, high, genre, limit):
+        movies = [m for m in self.movies.values() if m.rating is not None
+                  and (low is None or m.rating >= low) and (high is None or m.rating <= high)
+                  and (genre is None or genre in m.genres)]
+        movies.sort(key=lambda m: (m.rating, _norm(m.title)), reverse=True)
+        return [m.movie_id for m in movies[:limit]]
+
+    def top_rated(self, genre, start, end, k):
+        in_range = [self.movies[i] for i in self.by_year(start, end, genre)]
+        best = sorted((m for m in in_range if m.rating is not None), key=lambda m: m.rating, reverse=True)
+        return [m.movie_id for m in best[:k]]
+
+
+class SystemBackend:
+    """MovieRecommendationSystem with every index and the graph built up front."""
+    name = "system"
+
+    def __init__(self, rows, workdir):
+        self.system = self.make_system(rows, workdir)
+
+    def make_system(self, rows, workdir):
+        system = MovieRecommendationSystem(os.path.join(workdir, "catalogue.csv"))
+        system.db.build_indexes()
+        system.graph
+        return system
+
+    def current(self):
+        return self.system
+
+    def edit(self, method, *args, **kwargs):
+        return getattr(self.system, method)(*args, **kwargs)
+
+    def insert(self, fields):
+        return self.edit("add_movie", Movie(runtime="", **fields))
+
+    def update(self, movie_id, changes):
+        return self.edit("update_movie", movie_id, **changes)
+
+    def delete(self, movie_id):
+        return self.edit("delete_movie", movie_id)
+
+    def similar(self, movie_id, weights):
+        return _ranked(self.current().similar_movies(movie_id, weights))
+
+    def history(self, movie_ids, k):
+        system = self.current()
+        ranked = system.recommend_for_history(movie_ids, k=len(system.db.movies))
+        if system.recommend_for_history(movie_ids, k) != ranked[:k]:
+            raise AssertionError("the top k is not a prefix of the full ranking")
+        return _ranked(ranked)
+
+    def random_walk(self, seed_sets, k):
+        return self.current().recommend_random_walk(seed_sets, k)
+
+    def prefix(self, prefix):
+        db = self.current().db
+        full = db.search_prefix(prefix)
+        paged, page = [], 1
+        while True:
+            movies, total = db.search_page(prefix, page, 7)
+            if total != len(full):
+                raise AssertionError(f"search_page total {total} != {len(full)} matches")
+            if not movies:
+                break
+            paged.extend(movies)
+            page += 1
+        if paged != full:
+            raise AssertionError("search_page pages do not concatenate to search_prefix")
+        return sorted(movie.movie_id for movie in full)
+
+    def genre(self, genre, prefix):
+        db = self.current().db
+        movies, total = db.genre_page(genre, prefix, 1, 10 ** 6)
+        if total != len(movies) or movies != db.genre_movies(genre, prefix):
+            raise AssertionError("genre_page disagrees with genre_movies")
+        return sorted(movie.movie_id for movie in movies)
+
+    def title(self, title):
+        movie = self.current().db.get_movie(title)
+        return movie.movie_id if movie else None
+
+    def stored_title(self, movie_id):
+        system = self.current()
+        movie = system.db.movies.get(movie_id)
+        if movie is not None and system.graph_ready and system.graph.movies[movie_id].title != movie.title:
+            raise AssertionError("the graph and the database disagree on the title")
+        return movie.title if movie else None
+
+    def preference(self, director, actor):
+        scored = self.current().db.search_by_preference(director, actor)
+        return sorted(((score, movie.movie_id) for score, movie in scored), key=lambda p: (-p[0], p[1]))
+
+    def query(self, filters):
+        return [movie.movie_id for movie in self.current().db.query(**filters)]
+
+
+class LazySystemBackend(SystemBackend):
+    """Nothing built up front: lazy indexes, and similarity scored on demand."""
+    name = "lazy_system"
+
+    def make_system(self, rows, workdir):
+        return MovieRecommendationSystem(os.path.join(workdir, "catalogue.csv"))
+
+
+class SnapshotBackend(SystemBackend):
+    """Edits through SnapshotStore copies; also checks the replaced version never changes."""
+    name = "snapshots"
+
+    def __init__(self, rows, workdir):
+        super().__init__(rows, workdir)
+        self.store = SnapshotStore(self.system)
+        self.probe_id = 0
+
+    def current(self):
+        return self.store.snapshot()
+
+    def _probe(self, system):
+        # Straight from the structures, past the result caches, as the versions share most of them
+        db, graph = system.db, system._graph
+        return (system.similar_movies(self.probe_id),
+                [(m.movie_id, m.title, sorted(m.genres), m.director, sorted(m.actors), m.rating)
+                 for m in db.movies.values()],
+                [m.movie_id for m in db.title_trie.search_prefix("")],
+                {genre: [m.movie_id for m in trie.search_prefix("")] for genre, trie in db.genre_tries.items()},
+                [db.get_movie(m.title).movie_id for m in db.movies.values()],
+                None if graph is None else {i: list(row.items()) for i, row in graph.adj_list.items()},
+                None if graph is None else {i: row.tolist() for i, row in graph.components.items()},
+                None if graph is None else {key: sorted(ids) for key, ids in graph.genre_postings.items()})
+
+    def edit(self, method, *args, **kwargs):
+        old = self.store.snapshot()
+        if self.probe_id not in old.db.movies and old.db.movies:
+            self.probe_id = next(iter(old.db.movies))
+        before = self._probe(old)
+        with self.store.edit() as draft:
+            result = getattr(draft, method)(*args, **kwargs)
+        if self._probe(old) != before:
+            raise AssertionError(f"{method} changed the previous snapshot")
+        return result
+
+
+def warm_pair_cache(rows, workdir):
+    """Path of a PairCache built on a different version of the catalogue."""
+    rng = random.Random(len(rows))
+    warm_rows = [dict(row) for row in rows if rng.random() > 0.1]
+    for row in rng.sample(warm_rows, len(warm_rows) // 10):
+        row["Star1"] = f"Actor {rng.randrange(10 ** 6)}"
+    write_csv(warm_rows, os.path.join(workdir, "warm.csv"))
+    cache_path = os.path.join(workdir, "pairs.pkl")
+    MovieRecommendationSystem(os.path.join(workdir, "warm.csv"), pair_cache=cache_path).graph
+    return cache_path
+
+
+def build_with_cache(system):
+    system.graph
+    if not system.pair_cache.stats["pairs_reused"]:
+        raise AssertionError("the pair cache was not used")
+    return system
+
+
+class PairCacheBackend(SystemBackend):
+    """Graph built from a PairCache warmed on a different version of the catalogue."""
+    name = "pair_cache"
+
+    def make_system(self, rows, workdir):
+        cache_path = warm_pair_cache(rows, workdir)
+        return build_with_cache(MovieRecommendationSystem(os.path.join(workdir, "catalogue.csv"),
+                                                          pair_cache=cache_path))
+
+
+class DurableBackend(SystemBackend):
+    """Edits through a DurableCatalogue, restarted every few edits from its checkpoint and log."""
+    name = "durable"
+    restart_every = 7
+
+    def __init__(self, rows, workdir):
+        self.csv_file = os.path.join(workdir, "catalogue.csv")
+        self.directory = os.path.join(workdir, "durable")
+        self.edits = 0
+        self.catalogue = self._open()
+
+    def _open(self):
+        catalogue = DurableCatalogue(self.directory, lambda: MovieRecommendationSystem(self.csv_file),
+                                     checkpoint_every=5)
+        if catalogue.recovery["errors"]:
+            raise AssertionError(f"replay failed: {catalogue.recovery['errors']}")
+        return catalogue
+
+    def current(self):
+        return self.catalogue.value
+
+    def edit(self, method, *args, **kwargs):
+        result = self.catalogue.apply(method, *args, **kwargs)
+        self.edits += 1
+        if self.edits % self.restart_every == 0:
+            # Restarts land at every distance from the last checkpoint
+            self.catalogue.close()
+            self.catalogue = self._open()
+        return result
+
+    def close(self):
+        self.catalogue.close()
+
+
+class SparsifiedBackend(SystemBackend):
+    """A graph pruned by a SparsificationPolicy (not in BACKENDS: pruning changes results)."""
+    name = "sparsified"
+
+    def __init__(self, rows, workdir, policy):
+        self.policy = policy
+        super().__init__(rows, workdir)
+
+    def make_system(self, rows, workdir):
+        system = MovieRecommendationSystem(os.path.join(workdir, "catalogue.csv"), policy=self.policy)
+        system.graph
+        return system
+
+    def edges(self):
+        adj = self.system.graph.adj_list
+        return {(i, j): score for i, neighbors in adj.items() for j, score in neighbors.items() if i < j}
+
+
+class MovieBSTBackend:
+    """BST.MovieBST, keyed by title; the harness keeps titles unique."""
+    name = "movie_bst"
+
+    def __init__(self, rows, workdir):
+        self.bst = MovieBST()
+        self.titles = {}  # movie_id -> current title
+        for movie_id, row in enumerate(rows):
+            self.insert(movie_fields(row, movie_id))
+
+    def _id(self, movie):
+        return movie.movie_id if movie is not None else None
+
+    def insert(self, fields):
+        if fields["movie_id"] in self.titles:
+            return False  # MovieBST has no ids; this is the harness's own bookkeeping
+        self.titles[fields["movie_id"]] = fields["title"]
+        self.bst.insert(BSTMovie(fields["movie_id"], fields["title"], fields["genres"], fields["year"],
+                                 fields["rating"], fields["director"], list(fields["actors"])))
+        return True
+
+    def update(self, movie_id, changes):
+        if movie_id not in self.titles:
+            return self.bst.update_movie(f"missing {movie_id}")
+        changes = dict(changes)
+        if "actors" in changes:
+            changes["stars"] = changes.pop("actors")
+        result = self.bst.update_movie(self.titles[movie_id], **changes)
+        if result and "title" in changes:
+            self.titles[movie_id] = changes["title"]
+        return result
+
+    def delete(self, movie_id):
+        if movie_id not in self.titles:
+            return self.bst.delete(f"missing {movie_id}")
+        return self.bst.delete(self.titles.pop(movie_id))
+
+    def title(self, title):
+        node = self.bst.search(title)
+        return node.movie.movie_id if node else None
+
+    def stored_title(self, movie_id):
+        node = self.bst.search(self.titles[movie_id]) if movie_id in self.titles else None
+        return node.movie.title if node else None
+
+    def genre(self, genre, prefix):
+        return sorted(m.movie_id for m in self.bst.get_movies_by_genre(genre)
+                      if m.title.lower().startswith(prefix.lower()))
+
+    def title_order(self):
+        ids = [m.movie_id for m in self.bst]
+        if len(ids) != len(self.bst):
+            raise AssertionError(f"size {len(self.bst)} but {len(ids)} movies in order")
+        return ids
+
+    def titles_with_prefix(self, prefix, genre):
+        return [m.movie_id for m in self.bst.titles_with_prefix(prefix, genre)]
+
+    def kth(self, k):
+        return self._id(self.bst.kth_smallest(k))
+
+    def neighbours(self, probe):
+        return (self._id(self.bst.next_title(probe)), self._id(self.bst.previous_title(probe)))
+
+    def by_year(self, start, end, genre):
+        return [m.movie_id for m in self.bst.movies_by_year(start, end, genre)]
+
+    def by_rating(self, low, high, genre, limit):
+        return [m.movie_id for m in self.bst.movies_by_rating(low, high, genre, limit)]
+
+    def top_rated(self, genre, start, end, k):
+        return [m.movie_id for m in self.bst.top_rated(genre, start, end, k)]
+
+
+BACKENDS = {backend.name: backend for backend in
+            (SystemBackend, LazySystemBackend, SnapshotBackend, PairCacheBackend, DurableBackend,
+             MovieBSTBackend)}
+
+
+class OperationGenerator:
+    """Random operations whose arguments are drawn from the reference's current state."""
+    def __init__(self, rng, reference, genres):
+        self.rng = rng
+        self.reference = reference
+        self.genres = genres
+        self.next_id = max(reference.movies, default=-1) + 1
+        self.next_title = 0
+        self.queued = []  # operations to run next, whatever the draw
+
+    def _movie_id(self):
+        if not self.reference.movies or self.rng.random() < 0.05:
+            return self.next_id + 1000  # never exists
+        return self.rng.choice(list(self.reference.movies))
+
+    def _existing(self, attr):
+        movie = self.reference.movies.get(self._movie_id())
+        if movie is None:
+            return "nobody"
+        value = getattr(movie, attr)
+        return self.rng.choice(sorted(value)) if isinstance(value, set) and value else (value or "nobody")
+
+    def _new_title(self):
+        self.next_title += 1
+        words = " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(1, 2)))
+        return f"{words.title()} N{self.next_title}"
+
+    def _prefix(self):
+        movie = self.reference.movies.get(self._movie_id())
+        if movie is None or self.rng.random() < 0.1:
+            return self.rng.choice(["", "zz", "the", "q"])
+        title = movie.title.rstrip()
+        prefix = title[:self.rng.randint(1, min(6, len(title)))].rstrip()
+        return prefix.upper() if self.rng.random() < 0.2 else prefix
+
+    def _fields(self, movie_id):
+        rng = self.rng
+        return {
+            "movie_id": movie_id,
+            "title": self._new_title(),
+            "genres": rng.sample(self.genres, rng.randint(1, 3)),
+            "director": self._existing("director") if rng.random() < 0.7 else f"Director X{rng.randrange(50)}",
+            "actors": [self._existing("actors") if rng.random() < 0.7 else f"Actor X{rng.randrange(50)}"
+                       for _ in range(rng.randint(1, 4))],
+            "year": str(rng.randint(1920, 2023)) if rng.random() > 0.05 else "PG",
+            "rating": round(rng.uniform(7.5, 9.3), 1),
+        }
+
+    def _year(self):
+        return self.rng.choice([None, self.rng.randint(1920, 2023)])
+
+    def _rating(self):
+        return self.rng.choice([None, round(self.rng.uniform(7.5, 9.3), 1)])
+
+    def _genre(self):
+        return self.rng.choice([None] + self.genres)
+
+    def _isolated(self, movie_id):
+        """A movie sharing no feature with any other, so it becomes a CSR row without edges."""
+        return {**self._fields(movie_id), "genres": [f"Genre X{movie_id}"], "director": f"Director Y{movie_id}",
+                "actors": [f"Actor Y{movie_id}"]}
+
+    def next(self):
+        if self.queued:
+            return self.queued.pop(0)
+        rng = self.rng
+        kind = rng.choices(
+            ["insert", "update", "delete", "similar", "history", "random_walk", "prefix", "genre", "title",
+             "preference", "query", "title_order", "titles_with_prefix", "kth", "neighbours", "by_year",
+             "by_rating", "top_rated", "stored_title"],
+            weights=[6, 10, 5, 12, 4, 2, 6, 4, 5, 3, 6, 1, 3, 3, 3, 3, 3, 3, 2])[0]
+        if kind == "insert":
+            if self.reference.movies and rng.random() < 0.05:
+                # An id already in use: rejected, and the stored movie must be left untouched
+                movie_id = rng.choice(list(self.reference.movies))
+                fields = self._fields(movie_id)
+                self.queued = [("prefix", (fields["title"][:4],)), ("similar", (movie_id, None)),
+                               ("title", (self.reference.movies[movie_id].title,))]
+                return kind, (fields,)
+            self.next_id += 1
+            if rng.random() < 0.1:
+                # The new movie is the graph's last row; walk from it and from elsewhere straight away
+                movie_id = self.next_id - 1
+                self.queued = [("random_walk", ([[movie_id], [self._movie_id()]], rng.randint(1, 10))),
+                               ("history", ([movie_id, self._movie_id()], rng.randint(1, 10)))]
+                return kind, (self._isolated(movie_id),)
+            return kind, (self._fields(self.next_id - 1),)
+        if kind == "update":
+            fields = self._fields(None)
+            keys = rng.sample(["title", "genres", "director", "actors", "year", "rating"], rng.randint(1, 3))
+            movie_id = self._movie_id()
+            movie = self.reference.movies.get(movie_id)
+            if movie is not None and rng.random() < 0.1:
+                # Same title in another case: indexed under the same key, but still a rename
+                fields["title"] = movie.title.swapcase()
+                keys.append("title")
+                self.queued = [("stored_title", (movie_id,)), ("title", (movie.title,))]
+            return kind, (movie_id, {key: fields[key] for key in keys})
+        if kind == "delete":
+            return kind, (self._movie_id(),)
+        if kind == "similar":
+            weights = None
+            if rng.random() < 0.3:
+                raw = [rng.random() for _ in range(3)]
+                weights = dict(zip(("genre", "actors", "director"), (w / sum(raw) for w in raw)))
+            return kind, (self._movie_id(), weights)
+        if kind == "history":
+            return kind, ([self._movie_id() for _ in range(rng.randint(1, 4))], rng.randint(1, 10))
+        if kind == "random_walk":
+            seed_sets = [[self._movie_id() for _ in range(rng.randint(1, 3))] for _ in range(rng.randint(1, 3))]
+            return kind, (seed_sets, rng.randint(1, 10))
+        if kind == "prefix":
+            return kind, (self._prefix(),)
+        if kind == "genre":
+            return kind, (rng.choice(self.genres), self._prefix() if rng.random() < 0.5 else "")
+        if kind == "title":
+            movie = self.reference.movies.get(self._movie_id())
+            title = movie.title if movie else "No Such Movie"
+            return kind, (rng.choice([title, title.upper(), f"  {title} "]),)
+        if kind == "preference":
+            return kind, (rng.choice(["", self._existing("director")]), rng.choice(["", self._existing("actors")]))
+        if kind == "query":
+            filters = {"sort_by": rng.choice(sorted(SORT_KEYS)), "descending": rng.random() < 0.7,
+                       "limit": rng.choice([None, 1, 5, 10])}
+            if rng.random() < 0.6:
+                filters["genres"] = rng.sample(self.genres, rng.randint(1, 2))
+            if rng.random() < 0.3:
+                filters["actor"] = self._existing("actors")
+            if rng.random() < 0.2:
+                filters["director"] = self._existing("director")
+            if rng.random() < 0.5:
+                filters["min_rating"], filters["max_rating"] = self._rating(), self._rating()
+            if rng.random() < 0.5:
+                filters["min_year"], filters["max_year"] = self._year(), self._year()
+            return kind, (filters,)
+        if kind == "stored_title":
+            return kind, (self._movie_id(),)
+        if kind == "title_order":
+            return kind, ()
+        if kind == "titles_with_prefix":
+            return kind, (self._prefix(), self._genre())
+        if kind == "kth":
+            return kind, (rng.randint(0, len(self.reference.movies) + 1),)
+        if kind == "neighbours":
+            return kind, (self._prefix(),)
+        if kind == "by_year":
+            return kind, (self._year(), self._year(), self._genre())
+        if kind == "by_rating":
+            return kind, (self._rating(), self._rating(), self._genre(), rng.choice([None, 3, 10]))
+        return kind, (self._genre(), self._year(), self._year(), rng.randint(1, 10))
+
+
+def walk_matches(expected, got, k):
+    """Each ranking's scores are within PAGERANK_TOLERANCE, and no movie left out clearly beats the last one in."""
+    if not isinstance(got, list) or len(got) != len(expected):
+        return False
+    for scores, ranked in zip(expected, got):
+        ids = [movie_id for movie_id, _ in ranked]
+        values = [score for _, score in ranked]
+        if len(set(ids)) != len(ids) or len(ids) > k or any(a < b for a, b in zip(values, values[1:])):
+            return False
+        # Unreachable movies score 0; a warm start can leave them residue within the tolerance
+        if any(abs(scores.get(movie_id, 0.0) - score) > PAGERANK_TOLERANCE for movie_id, score in ranked):
+            return False
+        last = values[-1] if len(ranked) == k else 0.0
+        if any(score > last + 2 * PAGERANK_TOLERANCE for movie_id, score in scores.items() if movie_id not in ids):
+            return False
+    return True
+
+
+def results_match(kind, args, expected, got):
+    if kind == "random_walk":
+        return walk_matches(expected, got, args[1])
+    return expected == got
+
+
+GENRE_POOL = GENRES[:8]
+
+
+def catalogue_rows(rng, seed, size):
+    """A generated catalogue with only GENRE_POOL genres, so movies share genres often."""
+    rows = generate_catalogue(size, seed, actor_pool=max(10, size // 3), director_pool=max(5, size // 8))
+    for row in rows:
+        for i in range(1, 4):
+            if row[f"genre_{i}"] not in GENRE_POOL:
+                row[f"genre_{i}"] = "None"
+        if not any(row[f"genre_{i}"] != "None" for i in range(1, 4)):
+            row["genre_1"] = rng.choice(GENRE_POOL)
+    return rows
+
+
+def random_edits(generator, n):
+    """``n`` random inserts, updates and deletes, each applied to the generator's reference."""
+    made = 0
+    while made < n:
+        kind, args = generator.next()
+        if kind in EDITS:
+            getattr(generator.reference, kind)(*args)
+            made += 1
+            yield kind, args
+
+
+def run_seed(seed, size, n_ops, backend_names, timings):
+    """Replay one random catalogue and operation sequence; returns the failures."""
+    rng = random.Random(seed)
+    rows = catalogue_rows(rng, seed, size)
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        write_csv(rows, os.path.join(workdir, "catalogue.csv"))
+        with contextlib.redirect_stdout(io.StringIO()):  # engines print on missing movies
+            reference = ReferenceCatalogue(rows, workdir)
+            backends = [BACKENDS[name](rows, workdir) for name in backend_names]
+        generator = OperationGenerator(rng, reference, GENRE_POOL)
+        for step in range(n_ops):
+            kind, args = generator.next()
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                expected = getattr(reference, kind)(*args)
+                timings.setdefault((kind, "reference"), []).append(time.perf_counter() - start)
+                for backend in backends:
+                    method = getattr(backend, kind, None)
+                    if method is None:
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        got = method(*args)
+                    except Exception as e:
+                        got = f"{type(e).__name__}: {e}"
+                    timings.setdefault((kind, backend.name), []).append(time.perf_counter() - start)
+                    if not results_match(kind, args, expected, got):
+                        failures.append((seed, step, backend.name, kind, args, expected, got))
+            if failures:
+                break  # later steps would only repeat the divergence
+        for backend in backends:
+            if hasattr(backend, "close"):
+                backend.close()
+    return failures
+
+
+SPARSIFICATION_POLICIES = (
+    {"top_k": 5},
+    {"top_k": 4, "mutual": True},
+    {"genre_quantile": 0.7},
+    {"genre_quantile": 0.6, "top_k": 4, "mutual": True, "quantize": True},
+)
+CHECK_WEIGHTS = {"genre": 0.2, "actors": 0.5, "director": 0.3}
+
+
+def check_sparsified(seed, size, n_edits=30):
+    """Pruned graphs against ReferenceCatalogue.sparsified, on a full build and after edits.
+
+    After edits the graph must be what a full apply with the genre
+    thresholds learned on the full build keeps; mutual kNN must still cap
+    degrees and re-weighting must rank kept edges only.
+    """
+    failures = []
+    for options in SPARSIFICATION_POLICIES:
+        rng = random.Random(seed)
+        rows = catalogue_rows(rng, seed, size)
+        with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+            write_csv(rows, os.path.join(workdir, "catalogue.csv"))
+            reference = ReferenceCatalogue(rows, workdir)
+            backend = SparsifiedBackend(rows, workdir, SparsificationPolicy(**options))
+            label = f"seed={seed} {backend.policy!r}"
+            expected, thresholds = reference.sparsified(**options)
+            got = backend.edges()
+            if got != expected:
+                wrong = sum(got[pair] != score for pair, score in expected.items() if pair in got)
+                failures.append(f"{label}: full build has {len(got.keys() - expected.keys())} extra, "
+                                f"{len(expected.keys() - got.keys())} missing and {wrong} wrongly scored edges")
+                continue
+            if backend.policy.genre_thresholds != thresholds:
+                failures.append(f"{label}: learned {backend.policy.genre_thresholds}, expected {thresholds}")
+                continue
+            for kind, args in random_edits(OperationGenerator(rng, reference, GENRE_POOL), n_edits):
+                getattr(backend, kind)(*args)
+            expected, _ = reference.sparsified(**options, thresholds=thresholds)
+            got = backend.edges()
+            if got != expected:
+                wrong = sum(got[pair] != score for pair, score in expected.items() if pair in got)
+                failures.append(f"{label}: after {n_edits} edits {len(got.keys() - expected.keys())} extra, "
+                                f"{len(expected.keys() - got.keys())} missing and {wrong} wrongly scored edges")
+            failures += sparsified_invariants(label, backend, reference, options, thresholds)
+    return failures
+
+
+def sparsified_invariants(label, backend, reference, options, thresholds):
+    adj = backend.system.graph.adj_list
+    if sorted(adj) != sorted(reference.movies):
+        return [f"{label}: the graph has movies {sorted(adj.keys() ^ reference.movies.keys())} wrong"]
+    failures = []
+    for (i, j), score in backend.edges().items():
+        exact = combined_similarity(reference.movies[i], reference.movies[j])
+        stored = float(np.float16(exact)) if options.get("quantize") else exact
+        if score != stored or exact <= reference.genre_threshold(thresholds, i, j):
+            failures.append(f"{label}: edge {(i, j)} has score {score}, exact score {exact}")
+    if options.get("mutual") and max(map(len, adj.values()), default=0) > options["top_k"]:
+        failures.append(f"{label}: a movie has more than {options['top_k']} mutual neighbours")
+    if not options.get("quantize"):  # float16 components re-weight to different scores
+        for movie_id, movie in reference.movies.items():
+            scores = [(j, combined_similarity(movie, reference.movies[j], CHECK_WEIGHTS)) for j in adj[movie_id]]
+            expected = sorted(((j, s) for j, s in scores if s > SIMILARITY_THRESHOLD), key=lambda p: (-p[1], p[0]))
+            if backend.similar(movie_id, CHECK_WEIGHTS) != expected:
+                failures.append(f"{label}: re-weighted neighbours of {movie_id} differ")
+    return failures
+
+
+def check_catalogue_views(seed, size):
+    """Each CatalogueRegistry view against a reference built from that catalogue's rows alone."""
+    rng = random.Random(seed)
+    rows = catalogue_rows(rng, seed, size)
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        registry = CatalogueRegistry()
+        regions = {}
+        for name in ("eu", "us", "apac"):
+            region = [dict(row) for row in rows if rng.random() < 0.7]
+            for row in rng.sample(region, len(region) // 10):
+                row["IMDB_Rating"] = f"{rng.uniform(7.5, 9.3):.1f}"  # the same title, a different record
+            write_csv(region, os.path.join(workdir, f"{name}.csv"))
+            if name == "apac":
+                registry.system.graph  # the last catalogue joins an already built graph
+            regions[name] = (region, registry.load(name, os.path.join(workdir, f"{name}.csv")))
+
+        for name, (region, view) in regions.items():
+            label = f"seed={seed} view={name}"
+            view_ids = {_norm(movie.title): movie_id for movie_id, movie in view.db.movies.items()}
+            reference = ReferenceCatalogue([], workdir)
+            for row in region:
+                reference.insert(movie_fields(row, view_ids.get(_norm(row["Series_Title"]))))
+            if set(view.db.movies) != set(reference.movies):
+                failures.append(f"{label}: the view does not hold the catalogue's movies")
+                continue
+            for movie_id in reference.movies:
+                for weights in (None, CHECK_WEIGHTS):
+                    if _ranked(view.similar_movies(movie_id, weights)) != reference.similar(movie_id, weights):
+                        failures.append(f"{label}: similar_movies({movie_id}, {weights}) differs")
+            for _ in range(10):
+                history, k = rng.sample(sorted(reference.movies), rng.randint(1, 4)), rng.randint(1, 10)
+                ranked = view.recommend_for_history(history, k=len(view.db.movies))
+                if view.recommend_for_history(history, k) != ranked[:k] or _ranked(ranked) != reference.history(history, k):
+                    failures.append(f"{label}: recommend_for_history({history}, {k}) differs")
+            for prefix in ["", "the", "zz"] + [_norm(m.title)[:2] for m in rng.sample(list(reference.movies.values()), 5)]:
+                if sorted(movie.movie_id for movie in view.db.search_prefix(prefix)) != reference.prefix(prefix):
+                    failures.append(f"{label}: search_prefix({prefix!r}) differs")
+            for genre in GENRE_POOL:
+                if sorted(movie.movie_id for movie in view.db.genre_movies(genre, "")) != reference.genre(genre, ""):
+                    failures.append(f"{label}: genre_movies({genre!r}) differs")
+    return failures
+
+
+def graph_differences(label, got, expected):
+    """Where two MovieGraphs differ: movies, neighbour order, scores or stored components."""
+    if list(got.adj_list) != list(expected.adj_list):
+        return [f"{label}: the graphs hold different movies, or in a different order"]
+    failures = []
+    for movie_id, neighbors in expected.adj_list.items():
+        if list(got.adj_list[movie_id].items()) != list(neighbors.items()):
+            failures.append(f"{label}: neighbours of {movie_id} differ")
+        if got.components[movie_id].tolist() != expected.components[movie_id].tolist():
+            failures.append(f"{label}: components of {movie_id} differ")
+    return failures
+
+
+def check_pair_cache(seed, size, n_edits=30):
+    """Graphs built with a warm PairCache against full builds, before and after edits."""
+    rng = random.Random(seed)
+    rows = catalogue_rows(rng, seed, size)
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        write_csv(rows, os.path.join(workdir, "catalogue.csv"))
+        full, cached = SystemBackend(rows, workdir), PairCacheBackend(rows, workdir)
+        failures = graph_differences(f"seed={seed} cached build", cached.system.graph, full.system.graph)
+        for kind, args in random_edits(OperationGenerator(rng, ReferenceCatalogue(rows, workdir), GENRE_POOL),
+                                       n_edits):
+            getattr(full, kind)(*args)
+            getattr(cached, kind)(*args)
+        failures += graph_differences(f"seed={seed} after edits", cached.system.graph, full.system.graph)
+        # Rebuilding the edited catalogue reuses the cache the first build saved
+        rebuilt = build_with_cache(MovieRecommendationSystem.from_database(
+            cached.system.db.copy(), pair_cache=cached.system.pair_cache.path))
+        fresh = MovieRecommendationSystem.from_database(full.system.db.copy())
+        failures += graph_differences(f"seed={seed} cached rebuild after edits", rebuilt.graph, fresh.graph)
+    return failures
+
+
+CHECKS = (check_sparsified, check_catalogue_views, check_pair_cache)
+
+
+def format_timings(timings, backend_names):
+    kinds = sorted({kind for kind, _ in timings})
+    lines = [f"{'operation':<20}{'calls':>7}{'reference us':>14}" + "".join(f"{name:>14}" for name in backend_names)]
+    for kind in kinds:
+        reference = timings[(kind, "reference")]
+        mean = sum(reference) / len(reference)
+        cells = []
+        for name in backend_names:
+            times = timings.get((kind, name))
+            cells.append(f"{sum(times) / len(times) / mean:>13.2f}x" if times and mean else f"{'-':>14}")
+        lines.append(f"{kind:<20}{len(reference):>7}{mean * 1e6:>14.1f}" + "".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check optimized engines against brute-force references.")
+    parser.add_argument("--seeds", type=int, default=20, help="random catalogues to run")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=120, help="movies per generated catalogue")
+    parser.add_argument("--ops", type=int, default=300, help="operations per catalogue")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS),
+                        help="backends to check (default all); repeat for several")
+    args = parser.parse_args(argv)
+
+    backend_names = args.backend or list(BACKENDS)
+    timings = {}
+    failures = []
+    start = time.perf_counter()
+    checks = []
+    for seed in range(args.first_seed, args.first_seed + args.seeds):
+        failures += run_seed(seed, args.size, args.ops, backend_names, timings)
+        for check in CHECKS:
+            checks += check(seed, args.size)
+    print(f"{args.seeds} catalogues x {args.ops} operations in {time.perf_counter() - start:.1f}s\n")
+    print(format_timings(timings, backend_names))
+    for seed, step, backend, kind, op_args, expected, got in failures:
+        print(f"\nMISMATCH seed={seed} step={step} backend={backend}: {kind}{op_args}\n"
+              f"  expected: {expected!r}\n  got:      {got!r}")
+    for failure in checks:
+        print(f"\nCHECK FAILED {failure}")
+    print(f"\n{len(failures)} mismatches, {len(checks)} failed checks")
+    return 1 if failures or checks else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
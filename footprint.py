@@ -0,0 +1,117 @@
+"""Deep memory footprint of the catalogue structures, for capacity planning.
+
+    print(format_footprint(system.memory_report()))
+    print(format_footprint(movie_bst.memory_report()))
+
+    python footprint.py                                     # imdb_top_1000_cleaned.csv
+    python footprint.py catalogue.csv --no-graph
+    python benchmark.py --sizes 1000 10000 --memory-report    # synthetic catalogues
+
+``deep_sizeof`` walks containers and object attributes and counts every
+object once per report. Structures are walked in order, starting with the
+Movie records, so each later line is the structure's own overhead: a trie
+that points at already counted movies and title strings is charged only
+for its nodes, dicts and lists. Code objects (classes, functions, modules)
+are not counted.
+"""
+import argparse
+import csv
+import sys
+import types
+
+_NOT_COUNTED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_sizeof(obj, seen=None):
+    """Bytes reachable from ``obj`` that are not already in ``seen`` (updated in place)."""
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _NOT_COUNTED):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, int, float, bool, complex)) or obj is None:
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif type(obj).__name__ == "ndarray":
+            if obj.base is not None:
+                stack.append(obj.base)  # a view: the data belongs to its base array
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for name in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, name):
+                    stack.append(getattr(obj, name))
+    return total
+
+
+def footprint(parts, movies, edges=None):
+    """Report for ``parts``: (name, list of objects, or None if not built) walked in order."""
+    seen = set()
+    structures = {}
+    not_built = []
+    for name, objects in parts:
+        if objects is None:
+            not_built.append(name)
+            continue
+        size = sum(deep_sizeof(obj, seen) for obj in objects)
+        structures[name] = {
+            "bytes": size,
+            "per_movie": size / movies if movies else None,
+            "per_edge": size / edges if edges else None,
+        }
+    return {
+        "movies": movies,
+        "edges": edges,
+        "structures": structures,
+        "total_bytes": sum(part["bytes"] for part in structures.values()),
+        "not_built": not_built,
+    }
+
+
+def format_footprint(report):
+    lines = [f"{'structure':<24}{'bytes':>14}{'per movie':>12}{'per edge':>11}"]
+    for name, part in report["structures"].items():
+        per_edge = f"{part['per_edge']:>11.1f}" if part["per_edge"] is not None else f"{'-':>11}"
+        per_movie = f"{part['per_movie']:>12.1f}" if part["per_movie"] is not None else f"{'-':>12}"
+        lines.append(f"{name:<24}{part['bytes']:>14,}{per_movie}{per_edge}")
+    movies = report["movies"]
+    lines.append(f"{'total':<24}{report['total_bytes']:>14,}"
+                 + (f"{report['total_bytes'] / movies:>12.1f}" if movies else ""))
+    edges = f", {report['edges']:,} edges" if report["edges"] is not None else ""
+    lines.append(f"{movies:,} movies{edges}")
+    if report["not_built"]:
+        lines.append(f"not built: {', '.join(report['not_built'])}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bytes per structure for a catalogue CSV.")
+    parser.add_argument("csv", nargs="?", default="imdb_top_1000_cleaned.csv",
+                        help="catalogue in the cleaned CSV schema")
+    parser.add_argument("--no-graph", action="store_true", help="skip the O(n^2) similarity graph")
+    args = parser.parse_args(argv)
+
+    from benchmark import build_movie_bst
+    from movie_recommender import MovieRecommendationSystem
+
+    system = MovieRecommendationSystem(args.csv)
+    system.db.build_indexes()
+    system.db.query(limit=1)  # builds the query index
+    if not args.no_graph:
+        system.graph.to_csr()
+    print(f"MovieRecommendationSystem ({args.csv})\n{format_footprint(system.memory_report())}\n")
+    with open(args.csv, encoding="utf8") as f:
+        movie_bst = build_movie_bst(list(csv.DictReader(f, skipinitialspace=True)))
+    print(f"MovieBST ({args.csv})\n{format_footprint(movie_bst.memory_report())}")
+
+
+if __name__ == "__main__":
+    main()
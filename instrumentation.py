@@ -0,0 +1,174 @@
+"""Lightweight timers, counters and histograms for the hot paths.
+
+Everything is controlled by environment variables read at import time:
+
+    MOVIE_METRICS=1                       record call timings and counters
+    MOVIE_PROFILE=cprofile[,tracemalloc]  also run cProfile and/or tracemalloc
+
+When MOVIE_METRICS is unset, ``instrumented`` returns the function unchanged
+and ``increment`` is a single flag check, so disabled instrumentation costs
+nothing on the hot paths.
+"""
+import bisect
+import functools
+import io
+import json
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("MOVIE_METRICS", "").strip().lower() in ("1", "true", "yes", "on")
+PROFILE_MODES = {mode.strip().lower() for mode in os.environ.get("MOVIE_PROFILE", "").split(",") if mode.strip()}
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Upper bucket bound containing the q-th quantile (approximate)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            running += count
+            if running >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.counters = {}    # name -> int
+        self.histograms = {}  # name -> Histogram of call durations in seconds
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "timers": {
+                    name: {
+                        "count": h.count,
+                        "total_seconds": h.sum,
+                        "mean_seconds": h.sum / h.count if h.count else 0.0,
+                        "p50_seconds": h.percentile(0.5),
+                        "p95_seconds": h.percentile(0.95),
+                        "max_seconds": h.max,
+                    }
+                    for name, h in self.histograms.items()
+                },
+            }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self):
+        lines = ["# TYPE movie_call_seconds histogram"]
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                running = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    running += count
+                    lines.append(f'movie_call_seconds_bucket{{function="{name}",le="{bound}"}} {running}')
+                lines.append(f'movie_call_seconds_bucket{{function="{name}",le="+Inf"}} {h.count}')
+                lines.append(f'movie_call_seconds_sum{{function="{name}"}} {h.sum}')
+                lines.append(f'movie_call_seconds_count{{function="{name}"}} {h.count}')
+            lines.append("# TYPE movie_events_total counter")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'movie_events_total{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def instrumented(name=None):
+    """Record the wall time of every call under ``name`` (default: the qualified name)."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        metric = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(metric, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def increment(name, value=1):
+    if ENABLED:
+        registry.increment(name, value)
+
+
+# The profilers are imported only when asked for, so plain imports of this module stay cheap
+_profiler = None
+if "cprofile" in PROFILE_MODES:
+    import cProfile
+
+    # cProfile only sees the thread that enabled it (the importing thread)
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+if "tracemalloc" in PROFILE_MODES:
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def profile_report(limit=30, sort="cumulative"):
+    if _profiler is None:
+        return "cProfile is off (set MOVIE_PROFILE=cprofile)."
+    import pstats
+
+    out = io.StringIO()
+    pstats.Stats(_profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def memory_report(limit=15):
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        return "tracemalloc is off (set MOVIE_PROFILE=tracemalloc)."
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [f"current={current / 1e6:.1f} MB peak={peak / 1e6:.1f} MB"]
+    for stat in tracemalloc.take_snapshot().statistics("lineno")[:limit]:
+        lines.append(str(stat))
+    return "\n".join(lines)
@@ -0,0 +1,106 @@
+"""Local load generator for recommendation_server.py.
+
+    python load_generator.py --port 8080 --connections 32 --requests 2000
+
+Each connection keeps a single HTTP/1.1 socket open and fires a random mix of
+search, genre, preference and recommendation requests, then latency
+percentiles and throughput are printed per endpoint.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import quote
+
+PREFIXES = ["the", "a", "s", "star", "god", "in", "l", "m", "b", "dark"]
+GENRES = ["Drama", "Crime", "Action", "Comedy", "Adventure", "Thriller", "Sci-Fi"]
+DIRECTORS = ["christopher nolan", "steven spielberg", "martin scorsese", "quentin tarantino"]
+
+
+def make_request(rng, n_movies):
+    kind = rng.choices(["search", "genre", "preferences", "similar", "history"],
+                       weights=[40, 15, 10, 25, 10])[0]
+    if kind == "search":
+        return kind, "GET", f"/search?prefix={quote(rng.choice(PREFIXES))}", None
+    if kind == "genre":
+        return kind, "GET", f"/genres/{quote(rng.choice(GENRES))}?page={rng.randint(1, 3)}", None
+    if kind == "preferences":
+        return kind, "GET", f"/preferences?director={quote(rng.choice(DIRECTORS))}", None
+    if kind == "similar":
+        return kind, "GET", f"/recommendations?movie_id={rng.randrange(n_movies)}", None
+    history = rng.sample(range(n_movies), rng.randint(5, 50))
+    return kind, "POST", "/recommendations/history", json.dumps({"movie_ids": history, "k": 10})
+
+
+async def send(reader, writer, method, path, body):
+    data = body.encode("utf8") if body else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n").encode("latin-1") + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def worker(host, port, count, seed, n_movies, latencies, errors):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            kind, method, path, body = make_request(rng, n_movies)
+            start = time.perf_counter()
+            status, _ = await send(reader, writer, method, path, body)
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+            if status != 200:
+                errors[kind] = errors.get(kind, 0) + 1
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run(host, port, connections, total_requests, seed):
+    reader, writer = await asyncio.open_connection(host, port)
+    _, health = await send(reader, writer, "GET", "/health", None)
+    writer.close()
+    n_movies = json.loads(health)["movies"]
+    latencies, errors = {}, {}
+    per_connection = max(1, total_requests // connections)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, per_connection, seed + i, n_movies, latencies, errors)
+                           for i in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    done = sum(len(values) for values in latencies.values())
+    print(f"{done} requests in {elapsed:.2f}s -> {done / elapsed:.0f} req/s over {connections} connections")
+    print(f"{'endpoint':<12}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        print(f"{kind:<12}{len(values):>7}{errors.get(kind, 0):>8}"
+              f"{percentile(values, 0.5) * 1000:>9.1f}{percentile(values, 0.95) * 1000:>9.1f}"
+              f"{percentile(values, 0.99) * 1000:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate load against recommendation_server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.host, args.port, args.connections, args.requests, args.seed))
+
+
+if __name__ == "__main__":
+    main()
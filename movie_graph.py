@@ -68,25 +68,9 @@ class MovieGraph:
         self.adj_list.get(id1, {}).pop(id2, None)
         self.adj_list.get(id2, {}).pop(id1, None)
 
-# Import Movie Dataset from CSV with Pandas   
-import pandas as pd
-
-df = pd.read_csv("imdb_top_1000_cleaned.csv")
-
 def get_genres(row):
     return list(set([row['genre_1'], row['genre_2'], row['genre_3']]))
 
-# Create Movie objects from DataFrame
-graph = MovieGraph()
-
-for idx, row in df.iterrows():
-    title = row['Series_Title']
-    genres = get_genres(row)
-    director = row["Director"]
-    actors = [row["Star1"], row["Star2"], row["Star3"], row["Star4"]]
-    movie = Movie(idx, title, genres, director, actors)
-    graph.add_movie(movie)
-
 def jaccard_similarity(set1, set2):
     intersection = set1.intersection(set2)
     union = set1.union(set2)
@@ -107,26 +91,48 @@ def combined_similarity(movie1, movie2, weights=None):
     )
     return combined
 
-titles = list(graph.movies.keys())
+# Loading and the O(n^2) build happen only when asked for, not at import
+def build_graph(csv_file="imdb_top_1000_cleaned.csv"):
+    # Import Movie Dataset from CSV with Pandas
+    import pandas as pd
+
+    df = pd.read_csv(csv_file)
+
+    # Create Movie objects from DataFrame
+    graph = MovieGraph()
+
+    for idx, row in df.iterrows():
+        title = row['Series_Title']
+        genres = get_genres(row)
+        director = row["Director"]
+        actors = [row["Star1"], row["Star2"], row["Star3"], row["Star4"]]
+        movie = Movie(idx, title, genres, director, actors)
+        graph.add_movie(movie)
+
+    titles = list(graph.movies.keys())
+
+    for i in range(len(titles)):
+        for j in range(i + 1, len(titles)):
+            id1 = titles[i]
+            id2 = titles[j]
 
-for i in range(len(titles)):
-    for j in range(i + 1, len(titles)):
-        id1 = titles[i]
-        id2 = titles[j]
+            movie1 = graph.movies[id1]
+            movie2 = graph.movies[id2]
+            sim = combined_similarity(movie1, movie2)
 
-        movie1 = graph.movies[id1]
-        movie2 = graph.movies[id2]
-        sim = combined_similarity(movie1, movie2)
+            if sim > 0.1:
+                graph.add_similarity(id1, id2, sim)
+    return graph
 
-        if sim > 0.1:
-            graph.add_similarity(id1, id2, sim)
+if __name__ == "__main__":
+    graph = build_graph()
 
-title = input("Enter the name of the movie you like: ").strip().lower()
-movie = graph.get_movie(title)
+    title = input("Enter the name of the movie you like: ").strip().lower()
+    movie = graph.get_movie(title)
 
-if movie:
-    print(f"Recommendations for:{movie}")
-    for similar_key, score in graph.get_similar_movies(movie.movie_id)[:10]:
-        print(f"  {graph.movies[similar_key].title} --> {score:.2f}")
-else:
-    print(f"Movie '{title}' not found in the graph.")
\ No newline at end of file
+    if movie:
+        print(f"Recommendations for:{movie}")
+        for similar_key, score in graph.get_similar_movies(movie.movie_id)[:10]:
+            print(f"  {graph.movies[similar_key].title} --> {score:.2f}")
+    else:
+        print(f"Movie '{title}' not found in the graph.")
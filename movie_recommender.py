@@ -1,5 +1,26 @@
+import copy
 import csv
-from collections import defaultdict
+import heapq
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np  # the graph, its edge components and CSR snapshots are numpy arrays
+
+from instrumentation import increment, instrumented
+
+_scipy_sparse = False  # imported on first use: scipy is optional and slow to import
+
+def _sparse():
+    global _scipy_sparse
+    if _scipy_sparse is False:
+        try:
+            import scipy.sparse
+            _scipy_sparse = scipy.sparse
+        except ImportError:  # CSRGraph falls back to pure numpy kernels
+            _scipy_sparse = None
+    return _scipy_sparse
 
 class Movie:
     def __init__(self, movie_id, title, genres, director, actors, year=None, rating=None, runtime=None, description=None):
@@ -16,34 +37,106 @@ class Movie:
     def __repr__(self):
         return f"Movie(ID={self.movie_id}, Title='{self.title}', Rating={self.rating})"
 
+    def copy(self):
+        movie = copy.copy(self)
+        movie.genres = set(self.genres)
+        movie.actors = set(self.actors)
+        return movie
+
 class TrieNode:
-    def __init__(self):
+    def __init__(self, owner=None):
         self.children = {}
         self.is_end = False
         self.movies = []
+        self.count = 0  # movies in this subtree, so pages can skip whole branches
+        self.owner = owner  # the Trie version that may change this node in place
 
 class Trie:
     def __init__(self):
-        self.root = TrieNode()
+        self._owner = object()
+        self.root = TrieNode(self._owner)
+
+    def copy(self):
+        """Independent trie sharing every node with this one.
+
+        Both tries get a new owner token, so each copies the nodes on a
+        word's path before changing them and the other never sees it.
+        """
+        trie = Trie.__new__(Trie)
+        trie._owner = object()
+        trie.root = self.root
+        self._owner = object()
+        return trie
+
+    def _own(self, node):
+        if node.owner is self._owner:
+            return node
+        clone = TrieNode(self._owner)
+        clone.children = dict(node.children)
+        clone.is_end = node.is_end
+        clone.movies = list(node.movies)
+        clone.count = node.count
+        return clone
     
     def insert(self, word, movie):
-        node = self.root
+        node = self.root = self._own(self.root)
+        node.count += 1
         for char in word:
-            if char not in node.children:
-                node.children[char] = TrieNode()
-            node = node.children[char]
+            child = node.children.get(char)
+            node.children[char] = child = TrieNode(self._owner) if child is None else self._own(child)
+            node = child
+            node.count += 1
         node.is_end = True
         node.movies.append(movie)
+
+    def remove(self, word, movie):
+        node = self._find(word)
+        if node is None or movie not in node.movies:
+            return False
+        node = self.root = self._own(self.root)
+        path = []
+        for char in word:
+            path.append((node, char))
+            node.children[char] = child = self._own(node.children[char])
+            node = child
+        node.movies.remove(movie)
+        if not node.movies:
+            node.is_end = False
+        self.root.count -= 1
+        for parent, char in path:
+            parent.children[char].count -= 1
+        # Prune branches that no longer lead to any movie
+        for parent, char in reversed(path):
+            child = parent.children[char]
+            if child.is_end or child.children:
+                break
+            del parent.children[char]
+        return True
     
-    def search_prefix(self, prefix):
+    def _find(self, prefix):
         node = self.root
         for char in prefix:
             if char not in node.children:
-                return []
+                return None
             node = node.children[char]
+        return node
+
+    @instrumented()
+    def search_prefix(self, prefix, offset=0, limit=None):
+        """Movies under ``prefix`` in trie order; ``offset``/``limit`` return one page."""
+        node = self._find(prefix)
+        if node is None:
+            return []
         movies = []
-        self._collect_movies(node, movies)
+        if offset == 0 and limit is None:
+            self._collect_movies(node, movies)
+        else:
+            self._collect_range(node, offset, node.count if limit is None else offset + limit, movies)
         return movies
+
+    def count_prefix(self, prefix):
+        node = self._find(prefix)
+        return node.count if node is not None else 0
     
     def _collect_movies(self, node, movies):
         if node.is_end:
@@ -51,25 +144,55 @@ class Trie:
         for child in node.children.values():
             self._collect_movies(child, movies)
 
+    def _collect_range(self, node, start, end, movies):
+        """Append the movies at positions [start, end) of this subtree."""
+        if node.is_end:
+            movies.extend(node.movies[start:max(start, end)])
+            start = max(0, start - len(node.movies))
+            end -= len(node.movies)
+        for child in node.children.values():
+            if end <= 0:
+                break
+            if start < child.count:
+                self._collect_range(child, start, min(end, child.count), movies)
+                start = 0
+            else:
+                start -= child.count
+            end -= child.count
+
 class CatalogueBST:
-    def __init__(self, movie, depth=1):
+    def __init__(self, movie, depth=1, owner=None):
         self.movie = movie
         self.title = movie.title.lower()
         self.depth = depth
         self.left = None
         self.right = None
+        self.owner = owner  # the MovieDatabase version that may change this node in place
+
+    def _own(self, owner):
+        if self.owner is owner:
+            return self
+        node = copy.copy(self)
+        node.owner = owner
+        return node
     
-    def insert(self, movie):
-        if movie.title.lower() < self.title:
-            if self.left is None:
-                self.left = CatalogueBST(movie, self.depth + 1)
-            else:
-                self.left.insert(movie)
-        else:
-            if self.right is None:
-                self.right = CatalogueBST(movie, self.depth + 1)
-            else:
-                self.right.insert(movie)
+    def insert(self, movie, owner=None):
+        """Add ``movie`` below this node and return the subtree root.
+
+        Nodes ``owner`` doesn't own are copied rather than changed, so other
+        versions sharing them are unaffected (see MovieDatabase.copy).
+        """
+        root = node = self._own(owner)
+        title = movie.title.lower()
+        while True:
+            side = "left" if title < node.title else "right"
+            child = getattr(node, side)
+            if child is None:
+                setattr(node, side, CatalogueBST(movie, node.depth + 1, owner))
+                return root
+            child = child._own(owner)
+            setattr(node, side, child)
+            node = child
     
     def retrieve(self, movie_name: str):
         if self.title == movie_name.lower():
@@ -81,21 +204,561 @@ class CatalogueBST:
         else:
             return None
 
+    def delete(self, movie, owner=None):
+        """Remove ``movie`` from this subtree and return the new subtree root
+        (copying the nodes ``owner`` doesn't own, as insert does)."""
+        title = movie.title.lower()
+        if title < self.title:
+            if self.left is None:
+                return self
+            node = self._own(owner)
+            node.left = self.left.delete(movie, owner)
+            return node
+        if title > self.title or self.movie is not movie:
+            # Equal titles are inserted to the right, so keep looking there
+            if self.right is None:
+                return self
+            node = self._own(owner)
+            node.right = self.right.delete(movie, owner)
+            return node
+        if self.left is None:
+            return self.right
+        if self.right is None:
+            return self.left
+        successor = self.right
+        while successor.left is not None:
+            successor = successor.left
+        node = self._own(owner)
+        node.movie = successor.movie
+        node.title = successor.title
+        node.right = self.right.delete(successor.movie, owner)
+        return node
+
+SIMILARITY_THRESHOLD = 0.1  # minimum combined similarity for an edge
+
+DEFAULT_WEIGHTS = {"genre": 0.5, "actors": 0.3, "director": 0.2}
+
+FEATURE_FIELDS = {"genres", "director", "actors"}  # fields that affect similarity
+
+class ResultCache:
+    """Bounded LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Cached results are shared between callers and must be treated as read-only.
+    """
+    def __init__(self, maxsize=1024, ttl=300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0  # bumped by clear(), so results computed across an edit aren't stored
+
+    def get_or_compute(self, key, compute):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self.generation
+        value = compute()
+        with self._lock:
+            if generation != self.generation:
+                return value  # may have read data the edit changed; the next caller recomputes
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def __getstate__(self):
+        # Checkpoints keep the settings but not the entries or the lock
+        state = self.__dict__.copy()
+        state["_entries"] = OrderedDict()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+def weighted_components(components, weights):
+    """Vectorized weighted_similarity over an (n, 3) array of edge components."""
+    values = components.astype(np.float64, copy=False)
+    # Same operation order as weighted_similarity, so scores match it bit for bit
+    return (weights["genre"] * values[:, 0] + weights["actors"] * values[:, 1]
+            + weights["director"] * values[:, 2])
+
+class CSRGraph:
+    """Read-only compressed sparse row snapshot of ``MovieGraph.adj_list``."""
+    def __init__(self, adj_list, dtype=np.float64):
+        self.ids = list(adj_list)                       # row -> movie_id
+        self.row_of = {movie_id: row for row, movie_id in enumerate(self.ids)}
+        degrees = np.fromiter((len(adj_list[movie_id]) for movie_id in self.ids),
+                              dtype=np.int64, count=len(self.ids))
+        self.indptr = np.zeros(len(self.ids) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=self.indptr[1:])
+        self.indices = np.empty(self.indptr[-1], dtype=np.int32)
+        self.data = np.empty(self.indptr[-1], dtype=dtype)
+        for row, movie_id in enumerate(self.ids):
+            start, end = self.indptr[row], self.indptr[row + 1]
+            neighbors = adj_list[movie_id]
+            self.indices[start:end] = [self.row_of[n] for n in neighbors]
+            self.data[start:end] = list(neighbors.values())
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_sum(self, rows, row_weights=None):
+        """Dense vector of sum_r w_r * A[r, :] -- i.e. A^T x for a sparse x."""
+        if len(rows) == 0:
+            return np.zeros(len(self.ids))
+        starts, ends = self.indptr[rows], self.indptr[np.asarray(rows) + 1]
+        lengths = ends - starts
+        # Positions of every non-zero of the selected rows, without a Python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = offsets + np.arange(lengths.sum())
+        values = self.data[positions]
+        if row_weights is not None:
+            values = values * np.repeat(row_weights, lengths)
+        return np.bincount(self.indices[positions], weights=values, minlength=len(self.ids))
+
+    def weighted_degrees(self):
+        # reduceat would reject the end offset of trailing rows without edges
+        n = len(self.ids)
+        return np.bincount(np.repeat(np.arange(n), np.diff(self.indptr)), weights=self.data, minlength=n)
+
+    def matmat(self, dense, max_block=1 << 22):
+        """A @ dense, processed in row blocks so the temporaries stay bounded."""
+        sparse = _sparse()
+        if sparse is not None:
+            if self._matrix is None:
+                # scipy.sparse has no float16 support
+                data = self.data.astype(np.float32) if self.data.dtype == np.float16 else self.data
+                self._matrix = sparse.csr_matrix((data, self.indices, self.indptr),
+                                                 shape=(len(self.ids), len(self.ids)))
+            return self._matrix @ dense
+        n = len(self.ids)
+        out = np.zeros((n, dense.shape[1]))
+        budget = max(1, max_block // max(1, dense.shape[1]))  # non-zeros per gathered block
+        dense_rows = max(1, max_block // max(1, n))           # rows per expanded block
+        row = 0
+        while row < n:
+            end = min(n, row + dense_rows)
+            start_nnz, end_nnz = self.indptr[row], self.indptr[end]
+            if 16 * (end_nnz - start_nnz) >= (end - row) * n:
+                # Dense enough that one BLAS product over the expanded rows beats
+                # gathering a row of ``dense`` per non-zero
+                block = np.zeros((end - row, n))
+                block[np.repeat(np.arange(end - row), np.diff(self.indptr[row:end + 1])),
+                      self.indices[start_nnz:end_nnz]] = self.data[start_nnz:end_nnz]
+                out[row:end] = block @ dense
+                row = end
+                continue
+            end = max(row + 1, int(np.searchsorted(self.indptr, self.indptr[row] + budget,
+                                                   side="right")) - 1)
+            end = min(end, n)
+            start_nnz, end_nnz = self.indptr[row], self.indptr[end]
+            if end_nnz > start_nnz:
+                contrib = self.data[start_nnz:end_nnz, None] * dense[self.indices[start_nnz:end_nnz]]
+                starts = self.indptr[row:end]
+                nonempty = np.diff(self.indptr[row:end + 1]) > 0
+                out[row:end][nonempty] = np.add.reduceat(contrib, starts[nonempty] - start_nnz)
+            row = end
+        return out
+
+class PersonalizedPageRank:
+    """Random walk with restart over the similarity graph.
+
+    Each column of the iterate is one user's seed set, so many users are
+    solved together with one sparse matrix-matrix product per iteration.
+    """
+    def __init__(self, graph, restart=0.15, tol=1e-6, max_iter=100, max_warm_starts=1024):
+        self.graph = graph
+        self.restart = restart
+        self.tol = tol
+        self.max_iter = max_iter
+        self.max_warm_starts = max_warm_starts
+        self._solutions = {}  # frozenset(seed ids) -> last stationary vector
+
+    @instrumented()
+    def run(self, seed_sets, initial=None):
+        """Return an (n_movies, n_seed_sets) matrix of visit probabilities."""
+        csr = self.graph.to_csr()
+        n, batch = len(csr), len(seed_sets)
+        restart_vectors = np.zeros((n, batch))
+        for col, seeds in enumerate(seed_sets):
+            rows = [csr.row_of[movie_id] for movie_id in set(seeds) if movie_id in csr.row_of]
+            if rows:
+                restart_vectors[rows, col] = 1.0 / len(rows)
+        degrees = csr.weighted_degrees()
+        dangling = degrees == 0
+        inv_degrees = np.where(dangling, 0.0, 1.0 / np.where(dangling, 1.0, degrees))
+
+        x = restart_vectors.copy() if initial is None else initial.copy()
+        active = np.ones(batch, dtype=bool)
+        for _ in range(self.max_iter):
+            cols = np.flatnonzero(active)
+            if len(cols) == 0:
+                break
+            current = x[:, cols]
+            walked = csr.matmat(current * inv_degrees[:, None])
+            # Mass sitting on dangling movies jumps back to the seeds
+            lost = current[dangling].sum(axis=0) if dangling.any() else 0.0
+            new = (1 - self.restart) * walked \
+                + (self.restart + (1 - self.restart) * lost) * restart_vectors[:, cols]
+            residuals = np.abs(new - current).sum(axis=0)
+            x[:, cols] = new
+            active[cols[residuals < self.tol]] = False
+        return x
+
+    def recommend(self, seed_sets, k=10):
+        """Top-k multi-hop recommendations for each seed set, excluding the seeds."""
+        csr = self.graph.to_csr()
+        keys = [frozenset(seeds) for seeds in seed_sets]
+        initial = None
+        if any(key in self._solutions for key in keys):
+            initial = np.stack([self._warm_start(key, len(csr)) for key in keys], axis=1)
+        scores = self.run(seed_sets, initial)
+        results = []
+        for col, key in enumerate(keys):
+            column = scores[:, col]
+            self._remember(key, column)
+            candidates = [row for row in np.flatnonzero(column) if csr.ids[row] not in key]
+            best = heapq.nlargest(k, candidates, key=lambda row: (column[row], -row))
+            results.append([(csr.ids[row], float(column[row])) for row in best])
+        return results
+
+    def _warm_start(self, key, n):
+        previous = self._solutions.get(key)
+        if previous is None or len(previous) != n:
+            # No usable solution (new seeds or the catalogue size changed)
+            csr = self.graph.to_csr()
+            previous = np.zeros(n)
+            rows = [csr.row_of[movie_id] for movie_id in key if movie_id in csr.row_of]
+            if rows:
+                previous[rows] = 1.0 / len(rows)
+        return previous
+
+    def _remember(self, key, column):
+        self._solutions.pop(key, None)
+        self._solutions[key] = column.copy()
+        if len(self._solutions) > self.max_warm_starts:
+            del self._solutions[next(iter(self._solutions))]
+
 class MovieGraph:
-    def __init__(self):
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, policy=None):
         self.movies = {}    # movie_id -> Movie
         self.adj_list = {}  # movie_id -> {neighbor_id: similarity_score}
+        self.threshold = threshold
+        self.policy = policy  # optional sparsify.SparsificationPolicy, re-applied around edits
+        self.score_dtype = np.float64  # dtype of the CSR snapshot scores and the edge components
+        # Inverted indexes so a single movie can be scored against only the
+        # movies it shares a genre, actor or director with.
+        self.genre_postings = defaultdict(set)     # genre -> {movie_id}
+        self.actor_postings = defaultdict(set)     # actor -> {movie_id}
+        self.director_postings = defaultdict(set)  # director -> {movie_id}
+        self._indexed_features = {}  # movie_id -> features currently in the postings
+        # The (genre, actors, director) similarities of every edge, so any weighting
+        # can be re-ranked at query time without a rebuild. Row k of a movie's
+        # array belongs to the k-th neighbour of its adj_list dict. Arrays are
+        # replaced rather than written to, so copies can share them.
+        self.components = {}  # movie_id -> (degree, 3) array
+        self.policy_top = {}  # movie_id -> the policy's top_k for it (see SparsificationPolicy.apply)
+        self._csr = None  # cached CSRGraph, dropped whenever the graph changes
+        self.cache = ResultCache()  # get_similar_movies results
+        self._shared_movie_ids = set()  # movies still shared with the graph this was copied from
+        # adj_list rows and postings sets this graph may change in place; None
+        # until the first copy(), as nothing is shared before it
+        self._owned_rows = None
+        self._owned_postings = None
+
+    def copy(self):
+        """Independent graph for copy-on-write edits.
+
+        Rows, postings sets, component arrays and Movie objects stay shared;
+        after the copy both graphs copy one before changing it (see
+        writable_row), so neither sees the other's edits.
+        """
+        graph = MovieGraph(self.threshold, self.policy)
+        graph.score_dtype = self.score_dtype
+        graph.movies = dict(self.movies)
+        graph.adj_list = dict(self.adj_list)
+        for name in ("genre_postings", "actor_postings", "director_postings"):
+            getattr(graph, name).update(getattr(self, name))
+        graph._indexed_features = dict(self._indexed_features)
+        graph.components = dict(self.components)
+        graph.policy_top = dict(self.policy_top)
+        graph._csr = self._csr
+        for shared in (self, graph):
+            shared._shared_movie_ids = set(self.movies)
+            shared._owned_rows = set()
+            shared._owned_postings = set()
+        return graph
+
+    def writable_row(self, movie_id):
+        """``movie_id``'s adj_list row, copied first if another graph shares it."""
+        neighbors = self.adj_list[movie_id]
+        if self._owned_rows is not None and movie_id not in self._owned_rows:
+            neighbors = self.adj_list[movie_id] = dict(neighbors)
+            self._owned_rows.add(movie_id)
+        return neighbors
+
+    def _posting(self, name, key):
+        postings = getattr(self, name)
+        ids = postings.get(key)
+        if self._owned_postings is not None and (name, key) not in self._owned_postings:
+            ids = postings[key] = set(ids or ())
+            self._owned_postings.add((name, key))
+        elif ids is None:
+            ids = postings[key] = set()
+        return ids
     
     def add_movie(self, movie):
+        if movie.movie_id in self.movies:
+            print(f"Movie ID {movie.movie_id} already exists")
+            return False
         self.movies[movie.movie_id] = movie
         self.adj_list[movie.movie_id] = {}
+        self.components[movie.movie_id] = np.zeros((0, 3), dtype=self.score_dtype)
+        self._index_features(movie)
+        self._changed()
+        return True
+
+    def _index_features(self, movie):
+        genres, actors, director = frozenset(movie.genres), frozenset(movie.actors), movie.director
+        for genre in genres:
+            self._posting("genre_postings", genre).add(movie.movie_id)
+        for actor in actors:
+            self._posting("actor_postings", actor).add(movie.movie_id)
+        self._posting("director_postings", director).add(movie.movie_id)
+        self._indexed_features[movie.movie_id] = (genres, actors, director)
+
+    def _unindex_features(self, movie_id):
+        genres, actors, director = self._indexed_features.pop(movie_id)
+        for name, keys in (("genre_postings", genres), ("actor_postings", actors),
+                           ("director_postings", (director,))):
+            for key in keys:
+                ids = self._posting(name, key)
+                ids.discard(movie_id)
+                if not ids:
+                    del getattr(self, name)[key]
+
+    def candidate_ids(self, movie):
+        """IDs of movies sharing at least one feature with ``movie``.
+
+        Any pair outside this set has a combined similarity of 0, so it can
+        never cross the edge threshold.
+        """
+        return self._candidates(movie.movie_id, movie.genres, movie.actors, movie.director)
+
+    def indexed_candidate_ids(self, movie_id):
+        """candidate_ids for the features ``movie_id`` was last indexed with."""
+        return self._candidates(movie_id, *self._indexed_features[movie_id])
+
+    def _candidates(self, movie_id, genres, actors, director):
+        candidates = set(self.director_postings.get(director, ()))
+        for genre in genres:
+            candidates.update(self.genre_postings.get(genre, ()))
+        for actor in actors:
+            candidates.update(self.actor_postings.get(actor, ()))
+        candidates.discard(movie_id)
+        return candidates
+
+    def extend_row(self, movie_id, neighbor_ids, scores, components):
+        """Append edges not yet in the graph to one direction of ``movie_id``'s row."""
+        self.writable_row(movie_id).update(zip(neighbor_ids, scores))
+        self.components[movie_id] = np.concatenate(
+            [self.components[movie_id], np.asarray(components, dtype=self.score_dtype).reshape(-1, 3)])
+
+    def add_edges(self, edges):
+        """Add (id1, id2, score, components) edges not yet in the graph, one array per row.
+
+        Rows list their new neighbours in the given order, as the same
+        add_similarity calls would.
+        """
+        rows = {}
+        for id1, id2, score, components in edges:
+            for source, target in ((id1, id2),) if id1 == id2 else ((id1, id2), (id2, id1)):
+                row = rows.get(source)
+                if row is None:
+                    row = rows[source] = ([], [], [])
+                row[0].append(target)
+                row[1].append(score)
+                row[2].append(components)
+        for movie_id, (neighbor_ids, scores, components) in rows.items():
+            self.extend_row(movie_id, neighbor_ids, scores, components)
+        if rows:
+            self._changed()
+
+    def remove_edges(self, pairs):
+        """Delete the (id1, id2) edges in ``pairs``, rewriting each touched row once."""
+        removed = defaultdict(set)
+        for id1, id2 in pairs:
+            removed[id1].add(id2)
+            removed[id2].add(id1)
+        for movie_id, gone in removed.items():
+            neighbors = self.adj_list[movie_id]
+            positions = [k for k, neighbor_id in enumerate(neighbors) if neighbor_id in gone]
+            if not positions:
+                continue
+            self.components[movie_id] = np.delete(self.components[movie_id], positions, axis=0)
+            if 2 * len(positions) > len(neighbors):
+                # Dicts never shrink in place; rebuild one that lost most of its entries
+                self.adj_list[movie_id] = {j: score for j, score in neighbors.items() if j not in gone}
+                if self._owned_rows is not None:
+                    self._owned_rows.add(movie_id)
+            else:
+                neighbors = self.writable_row(movie_id)
+                for neighbor_id in gone:
+                    neighbors.pop(neighbor_id, None)
+        if removed:
+            self._changed()
+
+    def _drop_edges(self, movie_id):
+        self.remove_edges([(movie_id, neighbor_id) for neighbor_id in self.adj_list[movie_id]])
+
+    @instrumented()
+    def connect_movie(self, movie_id, dependents=()):
+        """Drop a movie's edges and re-score it against its candidates.
+
+        ``dependents`` are passed on to the policy (see SparsificationPolicy.dependents).
+        """
+        movie = self.movies[movie_id]
+        self._drop_edges(movie_id)
+        edges = []
+        for other_id in self.candidate_ids(movie):
+            components = similarity_components(movie, self.movies[other_id])
+            sim = weighted_similarity(components)
+            if sim > self.threshold:
+                edges.append((movie_id, other_id, sim, components))
+        self.add_edges(edges)
+        if self.policy is not None:
+            self.policy.apply(self, [movie_id], dependents)
+
+    def insert_movie(self, movie):
+        """Add a movie and connect it without rebuilding the graph."""
+        if not self.add_movie(movie):
+            return False
+        self.connect_movie(movie.movie_id)
+        return True
+
+    def refresh_movie(self, movie_id):
+        """Re-index a movie whose features were edited in place and re-score its edges."""
+        if movie_id not in self.movies:
+            print(f"No movie found with ID {movie_id}")
+            return False
+        dependents = self.policy.dependents(self, movie_id) if self.policy is not None else ()
+        self._unindex_features(movie_id)
+        self._index_features(self.movies[movie_id])
+        self.connect_movie(movie_id, dependents)
+        return True
+
+    def update_movie(self, movie_id, title=None, genres=None, director=None, actors=None):
+        if movie_id not in self.movies:
+            print(f"No movie found with ID {movie_id}")
+            return False
+        if movie_id in self._shared_movie_ids:
+            self.movies[movie_id] = self.movies[movie_id].copy()
+            self._shared_movie_ids.discard(movie_id)
+        movie = self.movies[movie_id]
+        if title:
+            movie.title = title
+        if genres is None and director is None and actors is None:
+            return True
+        if genres is not None:
+            movie.genres = set(genres)
+        if director is not None:
+            movie.director = director.strip().lower()
+        if actors is not None:
+            movie.actors = set(actor.strip().lower() for actor in actors if actor)
+        return self.refresh_movie(movie_id)
+
+    def delete_movie(self, movie_id):
+        if movie_id not in self.movies:
+            print(f"No movie found with ID {movie_id}")
+            return False
+        dependents = self.policy.dependents(self, movie_id) if self.policy is not None else ()
+        self._drop_edges(movie_id)
+        self._unindex_features(movie_id)
+        del self.movies[movie_id]
+        del self.adj_list[movie_id]
+        del self.components[movie_id]
+        self.policy_top.pop(movie_id, None)
+        if self.policy is not None:
+            self.policy.apply(self, [], dependents)
+        self._changed()
+        return True
     
-    def add_similarity(self, id1, id2, score):
+    def add_similarity(self, id1, id2, score, components=None):
+        """Add or re-score an edge; without ``components`` a new edge is left out of
+        re-weighted rankings, which have nothing to weight."""
         if id1 not in self.movies or id2 not in self.movies:
             print("Both movies must exist to add similarity.")
             return
-        self.adj_list[id1][id2] = score
-        self.adj_list[id2][id1] = score  # undirected relationship
+        if id2 not in self.adj_list[id1]:
+            self.add_edges([(id1, id2, score, (np.nan,) * 3 if components is None else components)])
+            return
+        self.writable_row(id1)[id2] = score
+        self.writable_row(id2)[id1] = score  # undirected relationship
+        if components is not None:
+            for source, target in ((id1, id2), (id2, id1)):
+                row = self.components[source].copy()
+                row[list(self.adj_list[source]).index(target)] = components
+                self.components[source] = row
+        self._changed()
+
+    def update_similarity(self, id1, id2, score):
+        if id1 not in self.adj_list or id2 not in self.adj_list[id1]:
+            print("Similarity link doesn't exist.")
+            return False
+        self.writable_row(id1)[id2] = score
+        self.writable_row(id2)[id1] = score
+        self._changed()
+        return True
+
+    def delete_similarity(self, id1, id2):
+        if id1 not in self.adj_list or id2 not in self.adj_list[id1]:
+            print("Similarity link doesn't exist.")
+            return False
+        self.remove_edges([(id1, id2)])
+        return True
+
+    def _changed(self):
+        self._csr = None
+        self.cache.clear()
+
+    @instrumented()
+    def to_csr(self):
+        if self._csr is None:
+            self._csr = CSRGraph(self.adj_list, self.score_dtype)
+        return self._csr
 
     def get_movie(self, title):
         normalized_title = title.strip().lower()
@@ -104,45 +767,390 @@ class MovieGraph:
                 return movie
         return None
 
-    def get_similar_movies(self, movie_id):
+    @instrumented()
+    def get_similar_movies(self, movie_id, weights=None):
+        key = (movie_id, None if weights is None else tuple(sorted(weights.items())))
+        return self.cache.get_or_compute(key, lambda: self._rank_neighbors(movie_id, weights))
+
+    def _rank_neighbors(self, movie_id, weights):
         neighbors = self.adj_list.get(movie_id, {})
-        return sorted(neighbors.items(), key=lambda x: x[1], reverse=True)
+        if weights is None:
+            return sorted(neighbors.items(), key=lambda x: x[1], reverse=True)
+        if movie_id not in self.adj_list:
+            return []
+        # Re-rank the stored components under the requested weights
+        neighbor_ids = list(neighbors)
+        scores = weighted_components(self.components[movie_id], weights)
+        if self.policy is None:
+            # Movies sharing a feature but below the threshold under the default
+            # weights have no stored components; other weights may lift them over it
+            movie = self.movies[movie_id]
+            others = sorted(self.candidate_ids(movie) - neighbors.keys())
+            if others:
+                neighbor_ids += others
+                scores = np.concatenate([scores, [weighted_similarity(
+                    similarity_components(movie, self.movies[other_id]), weights) for other_id in others]])
+        order = np.argsort(-scores, kind="stable")
+        order = order[scores[order] > self.threshold]
+        return [(neighbor_ids[i], float(scores[i])) for i in order]
 
 def jaccard_similarity(set1, set2):
     intersection = set1.intersection(set2)
     union = set1.union(set2)
     return len(intersection) / len(union) if union else 0
 
-def combined_similarity(movie1, movie2, weights=None):
-    if weights is None:
-        weights = {"genre": 0.5, "actors": 0.3, "director": 0.2}
+def similarity_components(movie1, movie2):
     genre_sim = jaccard_similarity(movie1.genres, movie2.genres)
     actor_sim = jaccard_similarity(movie1.actors, movie2.actors)
     director_sim = 1.0 if movie1.director == movie2.director else 0.0
+    return genre_sim, actor_sim, director_sim
+
+def weighted_similarity(components, weights=None):
+    if weights is None:
+        weights = DEFAULT_WEIGHTS
+    genre_sim, actor_sim, director_sim = components
     return weights["genre"] * genre_sim + weights["actors"] * actor_sim + weights["director"] * director_sim
 
+def combined_similarity(movie1, movie2, weights=None):
+    return weighted_similarity(similarity_components(movie1, movie2), weights)
+
+LAZY_INDEXES = ("title_trie", "genre_tries", "bst")
+# Reported by startup_report(); numpy is always there (imported above), the rest only once used
+HEAVY_MODULES = ("numpy", "pandas", "scipy", "cProfile", "tracemalloc", "communities", "pair_cache",
+                 "query_planner")
+_build_lock = threading.RLock()  # serializes lazy index and graph builds across threads
+
+def score_rows(graph, movies, first, last):
+    """Score rows [first, last) of ``movies`` against every later row into ``graph``."""
+    n = len(movies)
+    edges = []
+    for i in range(first, last):
+        movie1 = movies[i]
+        for j in range(i + 1, n):
+            movie2 = movies[j]
+            components = similarity_components(movie1, movie2)
+            sim = weighted_similarity(components)
+            if sim > graph.threshold:  # threshold to decide if two movies are similar
+                edges.append((movie1.movie_id, movie2.movie_id, sim, components))
+    graph.add_edges(edges)
+
+class GraphBuild:
+    """Similarity graph built in row blocks that can be queried while it runs.
+
+    Each row is scored against every later row, so once rows [0, rows_done)
+    are finished those movies already have their complete neighbour lists.
+    With a policy no row is final until the whole graph is pruned, so
+    rows_done stays 0 until then and readers score on demand.
+    """
+    def __init__(self, movies, block_size=64, policy=None, pair_cache=None):
+        self.movies = list(movies)
+        self.block_size = block_size
+        self.policy = policy
+        self.pair_cache = pair_cache
+        self.graph = MovieGraph(policy=policy)
+        for movie in self.movies:
+            self.graph.add_movie(movie)
+        self.row_of = {movie.movie_id: row for row, movie in enumerate(self.movies)}
+        self.rows_scored = 0
+        self.rows_done = 0  # rows readers may use: scored, and pruned if there is a policy
+        self.seconds = None
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def progress(self):
+        return self.rows_scored / len(self.movies) if self.movies else 1.0
+
+    def is_ready(self, movie_id):
+        row = self.row_of.get(movie_id)
+        return row is not None and row < self.rows_done
+
+    @instrumented()
+    def run(self):
+        start = time.perf_counter()
+        try:
+            if self.pair_cache is not None:
+                # Rows are filled in pair order, so none is complete before the end
+                self.pair_cache.build(self.graph, self.movies)
+                self.rows_scored = len(self.movies)
+            for first in range(self.rows_scored, len(self.movies), self.block_size):
+                last = min(first + self.block_size, len(self.movies))
+                score_rows(self.graph, self.movies, first, last)
+                self.rows_scored = last
+                if self.policy is None:
+                    self.rows_done = last  # publish the finished block
+            if self.policy is not None:
+                self.policy.apply(self.graph)
+            self.rows_done = len(self.movies)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.seconds = time.perf_counter() - start
+            self.done.set()
+
+def _bst_insert(root, movie, owner=None):
+    if root is None:
+        return CatalogueBST(movie, owner=owner)
+    return root.insert(movie, owner)
+
 class MovieDatabase:
     def __init__(self):
-        self.bst = None
-        self.title_trie = Trie()
-        self.genre_tries = defaultdict(Trie)
+        # The search indexes are built from self.movies on first use (see _ensure_index)
+        self._bst = None
+        self._bst_owner = object()  # BST nodes this database may change in place (see copy)
+        self._title_trie = Trie()
+        self._genre_tries = defaultdict(Trie)
+        self._built = set(LAZY_INDEXES)  # indexes that are up to date with self.movies
         self.all_genres = set()
         self.movies = {}  # movie_id -> Movie
+        self.cache = ResultCache()  # prefix, genre and preference lookups
+        self.build_times = {}  # stage -> seconds, for startup_report()
+        self._query_index = None  # MovieQueryIndex, built lazily and rebuilt after many edits
+        self._shared_movie_ids = set()  # movies still shared with the database this was copied from
+
+    @property
+    def bst(self):
+        self._ensure_index("bst")
+        return self._bst
+
+    @property
+    def title_trie(self):
+        self._ensure_index("title_trie")
+        return self._title_trie
+
+    @property
+    def genre_tries(self):
+        self._ensure_index("genre_tries")
+        return self._genre_tries
+
+    def _ensure_index(self, name):
+        if name in self._built:
+            return
+        with _build_lock:
+            if name in self._built:
+                return
+            start = time.perf_counter()
+            movies = list(self.movies.values())
+            if name == "bst":
+                self._bst = None
+                for movie in movies:
+                    self._bst = _bst_insert(self._bst, movie, self._bst_owner)
+            elif name == "title_trie":
+                self._title_trie = Trie()
+                for movie in movies:
+                    self._title_trie.insert(movie.title.lower(), movie)
+            else:
+                self._genre_tries = defaultdict(Trie)
+                for movie in movies:
+                    for genre in movie.genres:
+                        self._genre_tries[genre].insert(movie.title.lower(), movie)
+            self.build_times[name] = time.perf_counter() - start
+            self._built.add(name)
 
+    def build_indexes(self):
+        for name in LAZY_INDEXES:
+            self._ensure_index(name)
+
+    def copy(self):
+        """Independent database for copy-on-write edits.
+
+        The indexes, query index and Movie objects stay shared; after the copy
+        both databases copy a BST path, trie path or movie record before
+        changing it, so neither sees the other's edits.
+        """
+        db = MovieDatabase()
+        with _build_lock:
+            db._built = set(self._built)
+            db._bst = self._bst
+            self._bst_owner = object()
+            db._title_trie = self._title_trie.copy()
+            db._genre_tries.update((genre, trie.copy()) for genre, trie in self._genre_tries.items())
+            if self._query_index is not None:
+                db._query_index = self._query_index.copy()
+            db.all_genres = set(self.all_genres)
+            db.movies = dict(self.movies)
+            self._shared_movie_ids = set(self.movies)
+            db._shared_movie_ids = set(self.movies)
+        return db
+
+    @instrumented()
     def load_from_csv(self, filename):
+        start = time.perf_counter()
         with open(filename, encoding="utf8") as csvfile:
             reader = csv.DictReader(csvfile, skipinitialspace=True)
-            for idx, row in enumerate(reader):
-                movie = self._create_movie_object(row, idx)
-                self.movies[idx] = movie
-                if self.bst is None:
-                    self.bst = CatalogueBST(movie)
-                else:
-                    self.bst.insert(movie)
-                self.title_trie.insert(movie.title.lower(), movie)
-                for genre in movie.genres:
-                    self.genre_tries[genre].insert(movie.title.lower(), movie)
+            self.bulk_load(self._create_movie_object(row, idx) for idx, row in enumerate(reader))
+        self.build_times["csv_load"] = time.perf_counter() - start
+        increment("movies_loaded", len(self.movies))
+
+    def bulk_load(self, movies):
+        """Add many movies at once; the search indexes are rebuilt on next use."""
+        with _build_lock:
+            for movie in movies:
+                self.movies[movie.movie_id] = movie
                 self.all_genres.update(movie.genres)
+            self._built.clear()
+        self._changed()
+
+    def _index_movie(self, movie):
+        # Indexes that have not been built yet pick the movie up when they are
+        if "bst" in self._built:
+            self._bst = _bst_insert(self._bst, movie, self._bst_owner)
+        if "title_trie" in self._built:
+            self._title_trie.insert(movie.title.lower(), movie)
+        if "genre_tries" in self._built:
+            for genre in movie.genres:
+                self._genre_tries[genre].insert(movie.title.lower(), movie)
+
+    def _unindex_movie(self, movie):
+        if "bst" in self._built:
+            self._bst = self._bst.delete(movie, self._bst_owner)
+        if "title_trie" in self._built:
+            self._title_trie.remove(movie.title.lower(), movie)
+        if "genre_tries" in self._built:
+            for genre in movie.genres:
+                self._genre_tries[genre].remove(movie.title.lower(), movie)
+
+    # Edits hold _build_lock so a lazy index build neither misses the movie nor
+    # indexes it twice, and call _changed() once the edit is complete
+    def insert(self, movie):
+        with _build_lock:
+            if movie.movie_id in self.movies:
+                print(f"Movie ID {movie.movie_id} already exists; use update_movie to change it")
+                return False
+            self.movies[movie.movie_id] = movie
+            self._index_movie(movie)
+        self.all_genres.update(movie.genres)
+        self._changed(movie.movie_id, movie)
+        return True
+
+    def update_movie(self, movie_id, **kwargs):
+        movie = self.movies.get(movie_id)
+        if not movie:
+            print(f"No movie found with ID {movie_id}")
+            return False
+        if movie_id in self._shared_movie_ids:
+            # Swap in a private copy so older snapshots keep the original
+            self._shared_movie_ids.discard(movie_id)
+            self.delete(movie_id)
+            movie = movie.copy()
+            self.insert(movie)
+
+        # The indexes key on the lower-cased title, so a change of case alone keeps its entries
+        renamed = 'title' in kwargs and kwargs['title'].strip().lower() != movie.title.lower()
+        if renamed or 'genres' in kwargs:
+            with _build_lock:
+                self._unindex_movie(movie)
+                if renamed:
+                    movie.title = kwargs['title'].strip()
+                if 'genres' in kwargs:
+                    movie.genres = set(kwargs['genres'])
+                self._index_movie(movie)
+            self.all_genres.update(movie.genres)
+        if 'title' in kwargs:
+            movie.title = kwargs['title'].strip()
+
+        if 'director' in kwargs:
+            movie.director = kwargs['director'].strip().lower() if kwargs['director'] else ""
+        if 'actors' in kwargs:
+            movie.actors = set(actor.strip().lower() for actor in kwargs['actors'] if actor)
+        for attr in ['year', 'rating', 'runtime', 'description']:
+            if attr in kwargs:
+                setattr(movie, attr, kwargs[attr])
+        self._changed(movie_id, movie)
+        return True
+
+    def delete(self, movie_id):
+        with _build_lock:
+            movie = self.movies.pop(movie_id, None)
+            if movie:
+                self._unindex_movie(movie)
+        if not movie:
+            print(f"No movie found with ID {movie_id}")
+            return False
+        self._changed(movie_id, None)
+        return True
+
+    def _changed(self, movie_id=None, movie=None):
+        """Drop cached results; an edit of one movie (``movie`` None once deleted) keeps the query index."""
+        self.cache.clear()
+        with _build_lock:
+            if movie_id is None or self._query_index is None:
+                self._query_index = None
+            else:
+                self._query_index.mark_changed(movie_id, movie)
+
+    def get_movie(self, title):
+        """Exact (case-insensitive) title lookup through the BST."""
+        return self.bst.retrieve(title.strip()) if self.bst is not None else None
+
+    @instrumented()
+    def query(self, explain=False, **filters):
+        """Movies matching every filter, e.g. genres=["Crime", "Drama"], min_rating=8.5,
+        min_year=1991, actor="al pacino", sort_by="rating", limit=10.
+
+        With explain=True returns (movies, plan text) instead.
+        """
+        from query_planner import MovieQueryIndex, format_plan  # only needed here; keeps startup lean
+
+        with _build_lock:
+            if self._query_index is None or self._query_index.needs_rebuild:
+                self._query_index = MovieQueryIndex(self.movies.values())
+            index = self._query_index
+        movies, plan = index.execute(**filters)
+        return (movies, format_plan(plan)) if explain else movies
+
+    @instrumented()
+    def search_prefix(self, prefix):
+        prefix = prefix.lower()
+        return self.cache.get_or_compute(("title", prefix), lambda: self.title_trie.search_prefix(prefix))
+
+    @instrumented()
+    def search_page(self, prefix, page=1, page_size=20):
+        """(movies on ``page``, total matches) for a title prefix."""
+        return self._page(("title_page",), self.title_trie, prefix, page, page_size)
+
+    @instrumented()
+    def genre_page(self, genre, prefix="", page=1, page_size=20):
+        """(movies on ``page``, total matches) for a genre and optional title prefix."""
+        if genre not in self.all_genres:
+            return [], 0
+        return self._page(("genre_page", genre), self.genre_tries[genre], prefix, page, page_size)
+
+    def _page(self, key, trie, prefix, page, page_size):
+        prefix = prefix.lower()
+        offset = (page - 1) * page_size
+        return self.cache.get_or_compute(
+            key + (prefix, offset, page_size),
+            lambda: (trie.search_prefix(prefix, offset, page_size), trie.count_prefix(prefix)))
+
+    @instrumented()
+    def genre_movies(self, genre, prefix=""):
+        if genre not in self.all_genres:
+            return []
+        prefix = prefix.lower()
+        return self.cache.get_or_compute(("genre", genre, prefix),
+                                         lambda: self.genre_tries[genre].search_prefix(prefix))
+
+    @instrumented()
+    def search_by_preference(self, director="", actor=""):
+        """(score, movie) pairs for a director (+2) and/or actor (+1) match, best first."""
+        director = director.strip().lower() if director else ""
+        actor = actor.strip().lower() if actor else ""
+        return self.cache.get_or_compute(("preference", director, actor),
+                                         lambda: self._score_preferences(director, actor))
+
+    def _score_preferences(self, director, actor):
+        movie_scores = []
+        for movie in self.movies.values():
+            score = 0
+            if director and movie.director == director:
+                score += 2
+            if actor and actor in movie.actors:
+                score += 1
+            if score > 0:
+                movie_scores.append((score, movie))
+        movie_scores.sort(reverse=True, key=lambda x: x[0])
+        return movie_scores
 
     def _create_movie_object(self, movie_data, movie_id):
         title = movie_data['Series_Title'].strip()
@@ -166,21 +1174,288 @@ class MovieDatabase:
         return Movie(movie_id, title, genres, director, actors, year, rating, runtime)
 
 class MovieRecommendationSystem:
-    def __init__(self, csv_file):
-        self.db = MovieDatabase()
-        self.db.load_from_csv(csv_file)
-        self.graph = MovieGraph()
-        for movie in self.db.movies.values():
-            self.graph.add_movie(movie)
-        self.build_similarity_graph()
-
-    def build_similarity_graph(self):
-        movie_ids = list(self.db.movies.keys())
-        n = len(movie_ids)
-        for i in range(n):
-            for j in range(i + 1, n):
-                movie1 = self.db.movies[movie_ids[i]]
-                movie2 = self.db.movies[movie_ids[j]]
-                sim = combined_similarity(movie1, movie2)
-                if sim > 0.1:  # threshold to decide if two movies are similar
-                    self.graph.add_similarity(movie1.movie_id, movie2.movie_id, sim)
\ No newline at end of file
+    def __init__(self, csv_file, policy=None, pair_cache=None):
+        db = MovieDatabase()
+        db.load_from_csv(csv_file)
+        self._setup(db, policy, pair_cache)
+
+    @classmethod
+    def from_database(cls, db, policy=None, pair_cache=None):
+        """Build the system around an already loaded MovieDatabase."""
+        system = cls.__new__(cls)
+        system._setup(db, policy, pair_cache)
+        return system
+
+    def _setup(self, db, policy=None, pair_cache=None):
+        self.db = db
+        self.policy = policy  # sparsify.SparsificationPolicy for the graph, or None for every edge
+        # Path of a pair_cache.PairCache: graph rebuilds then only score movies whose features changed
+        self.pair_cache = None
+        if pair_cache:
+            from pair_cache import PairCache  # pulls in hashlib and pickle; only needed with a cache
+
+            self.pair_cache = PairCache(pair_cache)
+        self._graph = None  # built on first use; see the graph property and warm_up()
+        self._build = None  # in-flight GraphBuild
+        self._build_shared = False  # True when a copy() shares _build, so each publishes its own graph copy
+        self.build_times = {}
+        self._ppr = None
+        self._communities = None  # CommunityIndex, rebuilt lazily after edits
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_build"] = None  # an unfinished build is redone lazily after loading
+        return state
+
+    @property
+    def graph(self):
+        """The similarity graph, waiting for (or running) its build if needed."""
+        if self._graph is None:
+            build = self.start_graph_build(background=False)
+            if build is not None:
+                build.done.wait()
+                with _build_lock:
+                    if self._build is build:
+                        self._build = None  # after a failure the next access starts a new build
+                        if build.error is None:
+                            self._graph = build.graph.copy() if self._build_shared else build.graph
+                            self.build_times["graph"] = build.seconds
+                        self._build_shared = False
+                # Every thread that waited on a failed build sees its error, not a missing graph
+                if build.error is not None:
+                    raise build.error
+        return self._graph
+
+    @property
+    def graph_ready(self):
+        build = self._build
+        if self._graph is None and build is not None and build.done.is_set():
+            self.graph  # publish the finished background build
+        return self._graph is not None
+
+    def graph_progress(self):
+        """Fraction of graph rows finished: 1.0 once ready, 0.0 before a build starts."""
+        if self.graph_ready:
+            return 1.0
+        build = self._build
+        return build.progress if build is not None else 0.0
+
+    def start_graph_build(self, block_size=64, background=True):
+        """Start building the similarity graph; returns the GraphBuild, or None if already built."""
+        with _build_lock:
+            if self._graph is not None or self._build is not None:
+                return self._build
+            build = self._build = GraphBuild(self.db.movies.values(), block_size, self.policy, self.pair_cache)
+        if background:
+            threading.Thread(target=build.run, name="graph-build", daemon=True).start()
+        else:
+            build.run()
+        return build
+
+    def warm_up(self, background=True):
+        """Build every lazy index and the similarity graph, by default in daemon threads."""
+        def build():
+            self.db.build_indexes()
+            self.graph.to_csr()
+        if not background:
+            build()
+            return None
+        self.start_graph_build()
+        thread = threading.Thread(target=build, name="catalogue-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def similar_movies(self, movie_id, weights=None):
+        """Same results as graph.get_similar_movies, without waiting for the graph build.
+
+        While the graph is building, movies whose rows are finished are answered
+        from the partial graph and the rest are scored on demand.
+        """
+        if self.graph_ready:
+            return self.graph.get_similar_movies(movie_id, weights)
+        build = self._build
+        if build is not None and build.is_ready(movie_id):
+            return build.graph._rank_neighbors(movie_id, weights)
+        return self.score_on_demand(movie_id, weights)
+
+    def score_on_demand(self, movie_id, weights=None):
+        """Score one movie against the whole catalogue, O(n).
+
+        With a policy only the neighbours it keeps for this movie are ranked
+        (see SparsificationPolicy.kept_neighbours).
+        """
+        movie = self.db.movies.get(movie_id)
+        if movie is None:
+            return []
+        others = (other for other in self.db.movies.values() if other.movie_id != movie_id)
+        if self.policy is not None:
+            kept = self.policy.kept_neighbours(movie, others, SIMILARITY_THRESHOLD)
+            if weights is None:
+                scored = list(kept.items())
+                scored.sort(key=lambda x: x[1], reverse=True)
+                return scored
+            others = (self.db.movies[other_id] for other_id in kept)
+        scored = []
+        for other in others:
+            sim = weighted_similarity(similarity_components(movie, other), weights)
+            if sim > SIMILARITY_THRESHOLD:
+                scored.append((other.movie_id, sim))
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return scored
+
+    def _graph_for_edit(self):
+        """The graph an edit must keep in step (None if not built), after any in-flight build."""
+        if self._graph is None and self._build is not None:
+            return self.graph
+        return self._graph
+
+    def startup_report(self):
+        """Seconds spent in each startup stage; stages still pending are listed as None."""
+        times = {**self.db.build_times, **self.build_times}
+        stages = {name: times.get(name) for name in ("csv_load",) + LAZY_INDEXES + ("graph", "communities")}
+        report = {
+            "movies": len(self.db.movies),
+            "stages": stages,
+            "graph_progress": self.graph_progress(),
+            "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+        }
+        if self.pair_cache is not None:
+            report["pair_cache"] = self.pair_cache.stats
+        return report
+
+    def memory_report(self):
+        """Bytes per structure, per movie and per edge (see footprint.py).
+
+        Each object is counted once, under the first structure that reaches
+        it; indexes and the graph are reported only once built.
+        """
+        from footprint import footprint  # only needed here; keeps startup lean
+
+        db, graph = self.db, self._graph if self.graph_ready else None
+
+        def built(name, *objects):
+            return list(objects) if name in db._built else None
+
+        def of_graph(*names):
+            return [getattr(graph, name) for name in names] if graph is not None else None
+        parts = [
+            ("movies", [db.movies, db.all_genres]),
+            ("title_trie", built("title_trie", db._title_trie)),
+            ("genre_tries", built("genre_tries", db._genre_tries)),
+            ("catalogue_bst", built("bst", db._bst)),
+            ("query_index", [db._query_index] if db._query_index is not None else None),
+            ("database_cache", [db.cache]),
+            ("graph.adj_list", of_graph("adj_list")),
+            ("graph.components", of_graph("components")),
+            ("graph.postings", of_graph("genre_postings", "actor_postings", "director_postings",
+                                        "_indexed_features")),
+            ("graph.policy_top", of_graph("policy_top")),
+            ("graph.movies", of_graph("movies")),
+            ("graph.csr", [graph._csr] if graph is not None and graph._csr is not None else None),
+            ("graph.cache", of_graph("cache")),
+            ("communities", [self._communities] if self._communities is not None else None),
+            ("random_walk", [self._ppr] if self._ppr is not None else None),
+        ]
+        edges = sum(len(neighbors) for neighbors in graph.adj_list.values()) // 2 if graph is not None else None
+        return footprint(parts, len(db.movies), edges)
+
+    def copy(self):
+        """Independent system for copy-on-write edits (see snapshots.SnapshotStore).
+
+        A graph build still in flight carries over: both systems wait for the
+        same build and each publishes its own copy of the result.
+        """
+        system = MovieRecommendationSystem.__new__(MovieRecommendationSystem)
+        system.db = self.db.copy()
+        system.policy = self.policy
+        system.pair_cache = self.pair_cache
+        self.graph_ready  # publish a finished background build first
+        with _build_lock:
+            system._graph = self._graph.copy() if self._graph is not None else None
+            system._build = self._build
+            system._build_shared = self._build is not None
+            if system._build_shared:
+                self._build_shared = True
+        system.build_times = dict(self.build_times)
+        system._ppr = None
+        system._communities = None
+        return system
+
+    # Catalogue edits keep the search indexes and the similarity graph in sync
+    # by re-scoring only the edited movie's edges. A graph that has not been
+    # built yet picks the edits up from the database when it is.
+    def add_movie(self, movie):
+        self._communities = None
+        graph = self._graph_for_edit()
+        if not self.db.insert(movie):
+            return False
+        if graph is not None:
+            graph.insert_movie(movie)
+        return True
+
+    def update_movie(self, movie_id, **kwargs):
+        self._communities = None
+        graph = self._graph_for_edit()
+        if not self.db.update_movie(movie_id, **kwargs):
+            return False
+        if graph is not None:
+            graph.movies[movie_id] = self.db.movies[movie_id]  # may be a fresh copy
+            if FEATURE_FIELDS & kwargs.keys():
+                graph.refresh_movie(movie_id)
+        return True
+
+    def delete_movie(self, movie_id):
+        self._communities = None
+        graph = self._graph_for_edit()
+        if not self.db.delete(movie_id):
+            return False
+        if graph is not None:
+            return graph.delete_movie(movie_id)
+        return True
+
+    @instrumented()
+    def recommend_for_history(self, movie_ids, k=10):
+        """Top-k unseen movies by summed similarity to every movie in the history."""
+        csr = self.graph.to_csr()
+        seen_rows = np.array([csr.row_of[movie_id] for movie_id in set(movie_ids)
+                              if movie_id in csr.row_of], dtype=np.int64)
+        scores = csr.rows_sum(seen_rows)
+        scores[seen_rows] = 0.0
+        candidates = np.flatnonzero(scores)
+        # Ties go to the earlier row, matching the stable sort in get_similar_movies
+        best = heapq.nlargest(k, zip(scores[candidates].tolist(), candidates.tolist()),
+                              key=lambda pair: (pair[0], -pair[1]))
+        return [(csr.ids[row], score) for score, row in best]
+
+    @property
+    def communities(self):
+        """CommunityIndex over the similarity graph (built on first use, after the graph)."""
+        if self._communities is None:
+            from communities import CommunityIndex  # only needed here; keeps startup lean
+
+            start = time.perf_counter()
+            self._communities = CommunityIndex.build(self.graph.to_csr(), self.db.movies)
+            self.build_times["communities"] = time.perf_counter() - start
+        return self._communities
+
+    @instrumented()
+    def recommend_clustered(self, movie_id, k=10, n_clusters=3, weights=None):
+        """Top-k similar movies ranked only within the few best-matching communities."""
+        movie = self.db.movies.get(movie_id)
+        if movie is None:
+            return []
+        return self.communities.recommend(
+            movie, lambda a, b: weighted_similarity(similarity_components(a, b), weights),
+            k, n_clusters, SIMILARITY_THRESHOLD, weights)
+
+    def explore_cluster(self, cluster_id):
+        """Members of one community, best rated first."""
+        movies = [self.db.movies[movie_id] for movie_id in self.communities.members(cluster_id)]
+        return sorted(movies, key=lambda movie: movie.rating or 0, reverse=True)
+
+    @instrumented()
+    def recommend_random_walk(self, seed_sets, k=10):
+        """Multi-hop personalized PageRank recommendations, one list per seed set."""
+        if self._ppr is None:
+            self._ppr = PersonalizedPageRank(self.graph)
+        return self._ppr.recommend(seed_sets, k)
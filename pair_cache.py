@@ -0,0 +1,181 @@
+"""On-disk memo of pair similarity components, so rebuilds only score what changed.
+
+    system = MovieRecommendationSystem(CSV_FILE, pair_cache="graph_pairs.pkl")
+    system.graph                         # scores changed movies, copies the rest
+    print(system.startup_report()["pair_cache"])
+
+A pair's (genre, actors, director) components depend only on the two
+movies' features, so the cache is keyed by a fingerprint of those features
+rather than by movie_id (ids shift when CSV rows are inserted). After a
+catalogue refresh:
+
+    both fingerprints cached   components copied from the cache
+    a new fingerprint          that movie is scored against the movies it
+                               shares a genre, actor or director with
+    fingerprints that are gone their pairs are dropped on save
+
+The resulting graph is the same as a full build, neighbour order included.
+"""
+import hashlib
+import os
+import pickle
+import time
+
+import numpy as np
+
+CACHE_VERSION = 1  # bump when similarity_components changes
+
+
+def fingerprint(movie):
+    """Stable digest of the features similarity_components reads."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (sorted(movie.genres), sorted(movie.actors), [movie.director]):
+        digest.update("\x1f".join(part).encode("utf8") + b"\x1e")
+    return digest.digest()
+
+
+class PairCache:
+    def __init__(self, path):
+        self.path = path
+        self.stats = {}  # what the last build reused and scored
+
+    def load(self):
+        """(fingerprints, first, second, components) arrays, or None if there is no usable cache."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                version, *cached = pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable pair cache {self.path}: {e}")
+            return None
+        return cached if version == CACHE_VERSION else None
+
+    def save(self, fingerprints, first, second, components):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((CACHE_VERSION, fingerprints, first, second, components), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def build(self, graph, movies):
+        """Fill ``graph`` (which already holds ``movies``) with every pair above the threshold."""
+        # Imported here: movie_recommender imports this module
+        from movie_recommender import similarity_components
+
+        start = time.perf_counter()
+        groups = {}  # fingerprint -> movie_ids with those features, in row order
+        for movie in movies:
+            groups.setdefault(fingerprint(movie), []).append(movie.movie_id)
+        fps = list(groups)
+        index = {fp: k for k, fp in enumerate(fps)}
+        group_of = {movie_id: k for k, ids in enumerate(groups.values()) for movie_id in ids}
+
+        first, second, components = [], [], []  # fingerprint pairs (first < second) and their scores
+        known = set()
+        reused = 0
+        cached = self.load()
+        if cached is not None:
+            old_fps, old_first, old_second, old_components = cached
+            old_to_new = np.array([index.get(fp, -1) for fp in old_fps], dtype=np.int64)
+            known = {fp for fp in old_fps if fp in index}
+            a, b = old_to_new[old_first], old_to_new[old_second]
+            keep = (a >= 0) & (b >= 0)
+            a, b = a[keep], b[keep]
+            first.append(np.minimum(a, b))
+            second.append(np.maximum(a, b))
+            components.append(old_components[keep])
+            reused = int(keep.sum())
+
+        scored = []
+        for i, fp in enumerate(fps):
+            if fp in known:
+                continue
+            movie = graph.movies[groups[fp][0]]
+            # Candidates are symmetric, so a pair of two new fingerprints is scored once
+            for j in {group_of[other_id] for other_id in graph.candidate_ids(movie)}:
+                if j == i or (j < i and fps[j] not in known):
+                    continue
+                scored.append((min(i, j), max(i, j), similarity_components(movie, graph.movies[groups[fps[j]][0]])))
+        if scored:
+            first.append(np.array([i for i, _, _ in scored], dtype=np.int64))
+            second.append(np.array([j for _, j, _ in scored], dtype=np.int64))
+            components.append(np.array([comp for _, _, comp in scored], dtype=np.float64))
+        first = np.concatenate(first) if first else np.zeros(0, dtype=np.int64)
+        second = np.concatenate(second) if second else np.zeros(0, dtype=np.int64)
+        components = np.concatenate(components).reshape(-1, 3) if len(first) else np.zeros((0, 3))
+
+        self._fill(graph, movies, groups, fps, first, second, components)
+        build_seconds = time.perf_counter() - start
+
+        save_start = time.perf_counter()
+        self.save(fps, first.astype(np.int32), second.astype(np.int32), components)
+        self.stats = {
+            "movies": len(movies),
+            "movies_rescored": sum(len(groups[fp]) for fp in fps if fp not in known),
+            "pairs_reused": reused,
+            "pairs_scored": len(scored),
+            "build_seconds": build_seconds,
+            "save_seconds": time.perf_counter() - save_start,
+        }
+        return self.stats
+
+    def _fill(self, graph, movies, groups, fps, first, second, components):
+        """Write fingerprint pairs into the graph as movie pairs, in bulk."""
+        from movie_recommender import DEFAULT_WEIGHTS as weights, similarity_components
+
+        members = [groups[fp] for fp in fps]
+        single = np.array([len(ids) == 1 for ids in members], dtype=bool)
+        lead = np.array([ids[0] for ids in members], dtype=np.int64)
+        simple = single[first] & single[second]
+        movie_a, movie_b = [lead[first[simple]]], [lead[second[simple]]]
+        parts = [components[simple]]
+        # Several movies share a fingerprint: every member pair gets the score
+        extra_a, extra_b, extra = [], [], []
+        for i, j, comp in zip(first[~simple].tolist(), second[~simple].tolist(), components[~simple].tolist()):
+            for a in members[i]:
+                for b in members[j]:
+                    extra_a.append(a)
+                    extra_b.append(b)
+                    extra.append(comp)
+        for ids in members:
+            if len(ids) > 1:
+                movie = graph.movies[ids[0]]
+                comp = similarity_components(movie, movie)
+                for k, a in enumerate(ids):
+                    for b in ids[k + 1:]:
+                        extra_a.append(a)
+                        extra_b.append(b)
+                        extra.append(comp)
+        movie_a = np.concatenate(movie_a + [np.array(extra_a, dtype=np.int64)])
+        movie_b = np.concatenate(movie_b + [np.array(extra_b, dtype=np.int64)])
+        components = np.concatenate(parts + [np.array(extra, dtype=np.float64).reshape(-1, 3)])
+
+        # Same operation order as weighted_similarity, so the scores are bit-identical
+        sims = (weights["genre"] * components[:, 0] + weights["actors"] * components[:, 1]
+                + weights["director"] * components[:, 2])
+        edge = sims > graph.threshold
+        movie_a, movie_b, sims, components = movie_a[edge], movie_b[edge], sims[edge], components[edge]
+
+        # Both directions, ordered by (row, neighbour row) as a full build inserts them
+        row_of = np.full(max(graph.movies, default=-1) + 1, -1, dtype=np.int64)
+        row_of[[movie.movie_id for movie in movies]] = np.arange(len(movies))
+        source = np.concatenate([movie_a, movie_b])
+        target = np.concatenate([movie_b, movie_a])
+        order = np.lexsort((row_of[target], row_of[source]))
+        source, target = source[order], target[order]
+        sims = np.concatenate([sims, sims])[order]
+        components = np.concatenate([components, components])[order]
+        _extend_rows(graph, source, target, sims, components)
+        graph._changed()
+
+
+def _extend_rows(graph, source, target, sims, components):
+    """Append edge source[k] -> target[k] to the graph, for ``source`` sorted into runs."""
+    bounds = np.flatnonzero(np.diff(source)) + 1
+    starts = [0] + bounds.tolist()
+    ends = bounds.tolist() + [len(source)]
+    ids, target, sims = source.tolist(), target.tolist(), sims.tolist()
+    for start, end in zip(starts, ends):
+        if start < end:
+            graph.extend_row(ids[start], target[start:end], sims[start:end], components[start:end])
@@ -0,0 +1,226 @@
+"""Compound filter queries over a MovieDatabase with index intersection.
+
+    index = MovieQueryIndex(db.movies.values())
+    movies, plan = index.execute(genres=["Crime", "Drama"], min_rating=8.5,
+                                 min_year=1991, actor="al pacino", limit=10)
+    print(format_plan(plan))
+
+Each predicate has its own index: genre masks (numpy bool arrays, one entry
+per movie), actor/director postings (ascending row lists) and rating/year
+sorted arrays. The planner estimates every predicate's cardinality, drives
+from the most selective one and narrows the candidates with the rest,
+cheapest first, before sorting and limiting. Candidates are ascending numpy
+row arrays, so every step is a vectorized mask lookup, merge or comparison.
+
+Edits don't rebuild the index: mark_changed() hides the movie's old row and
+queries check the movies edited since the build one by one, until there
+are enough of them (needs_rebuild) that a rebuild is cheaper.
+"""
+import copy
+import heapq
+
+import numpy as np
+
+SORT_KEYS = {
+    "rating": lambda movie: (movie.rating if movie.rating is not None else float("-inf")),
+    "year": lambda movie: _year(movie) or 0,
+    "title": lambda movie: movie.title.lower(),
+}
+
+
+def _year(movie):
+    try:
+        return int(str(movie.year).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _rows(rows):
+    return np.asarray(rows, dtype=np.int64)
+
+
+def _matches(movie, genres, actor, director, min_rating, max_rating, min_year, max_year):
+    """The index's predicates for one movie, for movies edited since the build."""
+    if genres and not all(genre in movie.genres for genre in genres):
+        return False
+    if actor and actor.strip().lower() not in movie.actors:
+        return False
+    if director and director.strip().lower() != movie.director:
+        return False
+    for value, low, high in ((movie.rating, min_rating, max_rating), (_year(movie), min_year, max_year)):
+        if low is None and high is None:
+            continue
+        if value is None or (low is not None and value < low) or (high is not None and value > high):
+            return False
+    return True
+
+
+class MovieQueryIndex:
+    def __init__(self, movies):
+        self.movies = sorted(movies, key=lambda m: m.movie_id)  # row -> Movie
+        self.actor_postings = {}     # actor -> ascending rows
+        self.director_postings = {}  # director -> ascending rows
+        genre_rows = {}
+        ratings, years = [], []
+        for row, movie in enumerate(self.movies):
+            for genre in movie.genres:
+                genre_rows.setdefault(genre, []).append(row)
+            for actor in movie.actors:
+                self.actor_postings.setdefault(actor, []).append(row)
+            self.director_postings.setdefault(movie.director, []).append(row)
+            ratings.append(movie.rating if movie.rating is not None else np.nan)
+            year = _year(movie)
+            years.append(year if year is not None else np.nan)
+        self.genre_masks = {}  # genre -> bool array over rows
+        for genre, rows in genre_rows.items():
+            mask = self.genre_masks[genre] = np.zeros(len(self.movies), dtype=bool)
+            mask[rows] = True
+        # Per-row values (NaN when missing) for value filters, and the same sorted for range bisection
+        self.rating_values = np.array(ratings, dtype=np.float64)
+        self.year_values = np.array(years, dtype=np.float64)
+        self.rating_keys, self.rating_rows = self._sorted(self.rating_values)
+        self.year_keys, self.year_rows = self._sorted(self.year_values)
+        self.row_of = {movie.movie_id: row for row, movie in enumerate(self.movies)}
+        self.stale = np.zeros(len(self.movies), dtype=bool)  # rows edited or deleted since the build
+        self.changed = {}  # movie_id -> current Movie (None once deleted), for edits since the build
+
+    def mark_changed(self, movie_id, movie):
+        """Record an edit: ``movie`` is the movie's current object, or None after a delete."""
+        row = self.row_of.get(movie_id)
+        if row is not None:
+            self.stale[row] = True
+        self.changed[movie_id] = movie
+
+    def copy(self):
+        """Index for a copied database: the built arrays are shared, only the edit bookkeeping is copied."""
+        index = copy.copy(self)
+        index.stale = self.stale.copy()
+        index.changed = dict(self.changed)
+        return index
+
+    @property
+    def needs_rebuild(self):
+        return len(self.changed) > max(64, len(self.movies) // 32)
+
+    @staticmethod
+    def _sorted(values):
+        rows = np.flatnonzero(~np.isnan(values))
+        rows = rows[np.argsort(values[rows], kind="stable")]
+        return values[rows], rows
+
+    def _range_bounds(self, keys, low, high):
+        start = 0 if low is None else int(np.searchsorted(keys, low, side="left"))
+        end = len(keys) if high is None else int(np.searchsorted(keys, high, side="right"))
+        return start, max(start, end)
+
+    def _predicates(self, genres, actor, director, min_rating, max_rating, min_year, max_year):
+        """(name, estimated rows, kind, payload) for every active predicate."""
+        predicates = []
+        if genres:
+            mask = np.ones(len(self.movies), dtype=bool)
+            for genre in genres:
+                if genre not in self.genre_masks:
+                    mask = np.zeros(len(self.movies), dtype=bool)
+                    break
+                mask &= self.genre_masks[genre]
+            predicates.append((f"genres={'+'.join(genres)}", int(np.count_nonzero(mask)), "mask", mask))
+        if actor:
+            rows = self.actor_postings.get(actor.strip().lower(), [])
+            predicates.append((f"actor={actor}", len(rows), "postings", rows))
+        if director:
+            rows = self.director_postings.get(director.strip().lower(), [])
+            predicates.append((f"director={director}", len(rows), "postings", rows))
+        if min_rating is not None or max_rating is not None:
+            start, end = self._range_bounds(self.rating_keys, min_rating, max_rating)
+            predicates.append((f"rating in [{min_rating}, {max_rating}]", end - start, "range",
+                               (self.rating_rows, start, end, min_rating, max_rating, self.rating_values)))
+        if min_year is not None or max_year is not None:
+            start, end = self._range_bounds(self.year_keys, min_year, max_year)
+            predicates.append((f"year in [{min_year}, {max_year}]", end - start, "range",
+                               (self.year_rows, start, end, min_year, max_year, self.year_values)))
+        return predicates
+
+    def _materialize(self, kind, payload):
+        if kind == "mask":
+            return np.flatnonzero(payload)
+        if kind == "postings":
+            return _rows(payload)
+        rows, start, end = payload[:3]
+        return np.sort(rows[start:end])
+
+    def _narrow(self, candidates, kind, payload, estimate):
+        """Apply one more predicate to the ascending candidate rows; returns (rows, method)."""
+        if kind == "mask":
+            return candidates[payload[candidates]], "mask probe"
+        if kind == "postings":
+            return np.intersect1d(candidates, _rows(payload), assume_unique=True), "sorted merge"
+        rows, start, end, low, high, values = payload
+        if estimate < len(candidates):
+            return np.intersect1d(candidates, rows[start:end], assume_unique=True), "sorted merge"
+        # The range is wider than the candidate list: compare each candidate's value instead
+        v = values[candidates]
+        keep = ~np.isnan(v)
+        if low is not None:
+            keep &= v >= low
+        if high is not None:
+            keep &= v <= high
+        return candidates[keep], "value filter"
+
+    def execute(self, genres=None, actor=None, director=None, min_rating=None, max_rating=None,
+                min_year=None, max_year=None, sort_by="rating", descending=True, limit=10):
+        """(movies, plan) for the conjunction of all given filters."""
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"sort_by must be one of {sorted(SORT_KEYS)}")
+        predicates = self._predicates(genres, actor, director, min_rating, max_rating, min_year, max_year)
+        predicates.sort(key=lambda p: p[1])
+        plan = {"steps": [], "sort_by": sort_by, "descending": descending, "limit": limit}
+
+        if predicates:
+            name, estimate, kind, payload = predicates[0]
+            candidates = self._materialize(kind, payload)
+            plan["steps"].append({"predicate": name, "method": f"drive from {kind} index",
+                                  "estimated": estimate, "rows": len(candidates)})
+            for name, estimate, kind, payload in predicates[1:]:
+                if not len(candidates):
+                    plan["steps"].append({"predicate": name, "method": "skipped (no candidates)",
+                                          "estimated": estimate, "rows": 0})
+                    continue
+                candidates, method = self._narrow(candidates, kind, payload, estimate)
+                plan["steps"].append({"predicate": name, "method": method,
+                                      "estimated": estimate, "rows": len(candidates)})
+        else:
+            candidates = np.arange(len(self.movies))
+            plan["steps"].append({"predicate": "(none)", "method": "full scan",
+                                  "estimated": len(self.movies), "rows": len(self.movies)})
+
+        movies = [self.movies[row] for row in candidates.tolist()]
+        if self.changed:
+            filters = (genres, actor, director, min_rating, max_rating, min_year, max_year)
+            movies = [self.movies[row] for row in candidates[~self.stale[candidates]].tolist()]
+            edited = sorted((movie for movie in list(self.changed.values())  # edits may land meanwhile
+                             if movie is not None and _matches(movie, *filters)), key=lambda m: m.movie_id)
+            # Keep movie_id order, so ties sort as they would after a rebuild
+            movies = list(heapq.merge(movies, edited, key=lambda m: m.movie_id))
+            plan["steps"].append({"predicate": "(edited since build)", "method": "value filter",
+                                  "estimated": len(self.changed), "rows": len(movies)})
+
+        key = SORT_KEYS[sort_by]
+        if limit is None:
+            result = sorted(movies, key=key, reverse=descending)
+        elif descending:
+            result = heapq.nlargest(limit, movies, key=key)
+        else:
+            result = heapq.nsmallest(limit, movies, key=key)
+        plan["returned"] = len(result)
+        return result, plan
+
+
+def format_plan(plan):
+    lines = []
+    for i, step in enumerate(plan["steps"], 1):
+        lines.append(f"{i}. {step['predicate']:<32} {step['method']:<24} "
+                     f"est={step['estimated']:<6} rows={step['rows']}")
+    order = "desc" if plan["descending"] else "asc"
+    lines.append(f"{len(plan['steps']) + 1}. sort by {plan['sort_by']} {order}, "
+                 f"limit {plan['limit']} -> {plan['returned']} movies")
+    return "\n".join(lines)
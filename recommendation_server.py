@@ -0,0 +1,328 @@
+"""Headless JSON API over MovieRecommendationSystem.
+
+    python recommendation_server.py --port 8080 --workers 4
+
+Endpoints (all GET unless noted; list responses take page/page_size):
+    /health
+    /search?prefix=the
+    /genres
+    /genres/<genre>?prefix=
+    /preferences?director=&actor=
+    /recommendations?movie_id=1  (or title=...; optional genre/actors/director weights)
+    POST /recommendations/history   {"movie_ids": [...], "k": 10}
+    POST /recommendations/random-walk {"seed_sets": [[...], ...], "k": 10}
+
+The catalogue is loaded once and treated as read-only; searches and graph
+queries run in a process pool so the event loop only parses requests and
+pages results.
+"""
+import argparse
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from movie_recommender import DEFAULT_WEIGHTS, MovieRecommendationSystem
+
+CSV_FILE = "imdb_top_1000_cleaned.csv"
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_BODY_BYTES = 1 << 20
+
+_system = None  # shared read-only system (inherited by forked workers)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _init_worker(csv_file):
+    global _system
+    if _system is None:
+        _system = MovieRecommendationSystem(csv_file)
+
+
+def _similar(movie_id, weights, limit):
+    """The first ``limit`` ranked neighbours, and how many there are in all."""
+    recs = _system.graph.get_similar_movies(movie_id, weights)
+    return recs[:limit], len(recs)
+
+
+# Searches return ids rather than Movie objects, which are cheaper to send back from a worker
+def _search(prefix):
+    return [movie.movie_id for movie in _system.db.search_prefix(prefix)]
+
+
+def _genre_movies(genre, prefix):
+    return [movie.movie_id for movie in _system.db.genre_movies(genre, prefix)]
+
+
+def _preferences(director, actor):
+    return [(score, movie.movie_id) for score, movie in _system.db.search_by_preference(director, actor)]
+
+
+def _history(movie_ids, k):
+    return _system.recommend_for_history(movie_ids, k)
+
+
+def _random_walk(seed_sets, k):
+    return _system.recommend_random_walk(seed_sets, k)
+
+
+def movie_to_dict(movie):
+    return {
+        "movie_id": movie.movie_id,
+        "title": movie.title,
+        "year": movie.year,
+        "rating": movie.rating,
+        "director": movie.director,
+        "actors": sorted(movie.actors),
+        "genres": sorted(movie.genres),
+    }
+
+
+def paginate(items, query, total=None):
+    page, page_size = page_params(query)
+    start = (page - 1) * page_size
+    total = len(items) if total is None else total
+    return {
+        "items": items[start:start + page_size],
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "next_page": page + 1 if start + page_size < total else None,
+    }
+
+
+def page_params(query):
+    try:
+        page = int(query.get("page", 1))
+        page_size = int(query.get("page_size", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise HTTPError(400, "page and page_size must be integers")
+    if page < 1 or page_size < 1:
+        raise HTTPError(400, "page and page_size must be positive")
+    return page, min(page_size, MAX_PAGE_SIZE)
+
+
+class RecommendationServer:
+    def __init__(self, system, executor):
+        self.system = system
+        self.executor = executor
+        self.genres = sorted(system.db.all_genres)
+        self.by_title = {}
+        for movie in system.db.movies.values():
+            self.by_title.setdefault(movie.title.strip().lower(), movie.movie_id)
+
+    async def offload(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def handle(self, method, path, query, body):
+        parts = [unquote(part) for part in path.strip("/").split("/") if part]
+        if method == "GET" and parts == ["health"]:
+            health = {"status": "ok", "movies": len(self.system.db.movies)}
+            # Worker processes keep their own caches; the parent's would always read zero
+            if not isinstance(self.executor, ProcessPoolExecutor):
+                health["cache"] = {"db": self.system.db.cache.stats(), "graph": self.system.graph.cache.stats()}
+            return health
+        if method == "GET" and parts == ["search"]:
+            movie_ids = await self.offload(_search, query.get("prefix", ""))
+            return self.page_of_movies(movie_ids, query)
+        if method == "GET" and parts == ["genres"]:
+            return {"genres": self.genres}
+        if method == "GET" and len(parts) == 2 and parts[0] == "genres":
+            if parts[1] not in self.system.db.all_genres:
+                raise HTTPError(404, f"unknown genre '{parts[1]}'")
+            movie_ids = await self.offload(_genre_movies, parts[1], query.get("prefix", ""))
+            return self.page_of_movies(movie_ids, query)
+        if method == "GET" and parts == ["preferences"]:
+            if not query.get("director") and not query.get("actor"):
+                raise HTTPError(400, "give a director and/or actor")
+            matches = await self.offload(_preferences, query.get("director"), query.get("actor"))
+            result = paginate(matches, query)
+            result["items"] = [{**movie_to_dict(self.system.db.movies[movie_id]), "score": score}
+                               for score, movie_id in result["items"]]
+            return result
+        if method == "GET" and parts == ["recommendations"]:
+            return await self.recommendations(query)
+        if method == "POST" and parts == ["recommendations", "history"]:
+            payload = self.parse_json(body)
+            movie_ids = self.movie_ids(payload.get("movie_ids"))
+            recs = await self.offload(_history, movie_ids, self.k(payload))
+            return {"items": self.scored(recs)}
+        if method == "POST" and parts == ["recommendations", "random-walk"]:
+            payload = self.parse_json(body)
+            seed_sets = payload.get("seed_sets")
+            if not isinstance(seed_sets, list) or not seed_sets:
+                raise HTTPError(400, "seed_sets must be a non-empty list of movie_id lists")
+            seed_sets = [self.movie_ids(seeds) for seeds in seed_sets]
+            results = await self.offload(_random_walk, seed_sets, self.k(payload))
+            return {"results": [self.scored(recs) for recs in results]}
+        raise HTTPError(404, f"no route for {method} {path}")
+
+    async def recommendations(self, query):
+        if "movie_id" in query:
+            movie_id = self.movie_ids([query["movie_id"]])[0]
+        elif "title" in query:
+            movie_id = self.by_title.get(query["title"].strip().lower())
+        else:
+            raise HTTPError(400, "give movie_id or title")
+        if movie_id not in self.system.db.movies:
+            raise HTTPError(404, "movie not found")
+        weights = None
+        if any(name in query for name in DEFAULT_WEIGHTS):
+            try:
+                weights = {name: float(query.get(name, value)) for name, value in DEFAULT_WEIGHTS.items()}
+            except ValueError:
+                raise HTTPError(400, "weights must be numbers")
+        page, page_size = page_params(query)
+        # Only the rows up to the requested page come back from the worker, with the full count
+        recs, total = await self.offload(_similar, movie_id, weights, page * page_size)
+        result = paginate(self.scored(recs), query, total)
+        result["movie"] = movie_to_dict(self.system.db.movies[movie_id])
+        return result
+
+    def page_of_movies(self, movie_ids, query):
+        result = paginate(movie_ids, query)
+        result["items"] = [movie_to_dict(self.system.db.movies[movie_id]) for movie_id in result["items"]]
+        return result
+
+    def scored(self, recs):
+        return [{**movie_to_dict(self.system.db.movies[movie_id]), "score": score}
+                for movie_id, score in recs]
+
+    def movie_ids(self, values):
+        if not isinstance(values, list):
+            raise HTTPError(400, "movie_ids must be a list")
+        try:
+            return [int(value) for value in values]
+        except (TypeError, ValueError):
+            raise HTTPError(400, "movie ids must be integers")
+
+    def k(self, payload):
+        try:
+            return max(1, min(int(payload.get("k", 10)), MAX_PAGE_SIZE))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "k must be an integer")
+
+    def parse_json(self, body):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return payload
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except ValueError:  # longer than the stream limit
+                    await self.respond(writer, 400, {"error": "request line too long"}, keep_alive=False)
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "bad request line"}, keep_alive=False)
+                    break
+                headers = await self.read_headers(reader)
+                if headers is None:
+                    await self.respond(writer, 431, {"error": "header line too long"}, keep_alive=False)
+                    break
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {"error": "bad Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {"error": "body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version == "HTTP/1.1")
+
+                url = urlsplit(target)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                try:
+                    status, payload = 200, await self.handle(method.upper(), url.path, query, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:  # keep serving other requests
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_headers(self, reader):
+        """The request's headers, or None when a line is longer than the stream limit."""
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                return None
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    async def respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload).encode("utf8")
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                  431: "Request Header Fields Too Large", 500: "Internal Server Error"}.get(status, "")
+        head = (f"HTTP/1.1 {status} {reason}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host, port, workers, csv_file):
+    global _system
+    _system = MovieRecommendationSystem(csv_file)
+    _system.graph.to_csr()  # build the CSR snapshot once so forked workers share it
+    _system.db.build_indexes()  # and the search indexes
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(csv_file,))
+    else:
+        executor = ThreadPoolExecutor(max_workers=4)
+    app = RecommendationServer(_system, executor)
+    server = await asyncio.start_server(app.serve_connection, host, port)
+    print(f"Serving {len(_system.db.movies)} movies on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve movie search and recommendations as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2, help="worker processes for graph queries (0 = threads)")
+    parser.add_argument("--csv", default=CSV_FILE)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.csv))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import threading
+from contextlib import contextmanager
+
+
+class SnapshotStore:
+    """Publishes immutable versions of a catalogue object for lock-free reads.
+
+    Readers call ``snapshot()`` and keep using the returned object; it is never
+    modified afterwards. Writers get a private ``copy()`` inside ``edit()``,
+    and the edited copy becomes the current version with a single reference
+    swap when the block exits without an exception. Writers are serialized;
+    readers never wait.
+
+    Works with anything that has a ``copy()`` returning an independent object
+    (MovieRecommendationSystem, MovieDatabase, MovieGraph, MovieBST).
+    """
+    def __init__(self, value):
+        self._current = (0, value)
+        self._write_lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    def snapshot(self):
+        return self._current[1]
+
+    def versioned_snapshot(self):
+        """(version, object) read together."""
+        return self._current
+
+    @contextmanager
+    def edit(self):
+        with self._write_lock:
+            version, current = self._current
+            draft = current.copy()
+            yield draft
+            self._current = (version + 1, draft)
+
+    def apply(self, method, *args, **kwargs):
+        """Run one mutating method on a fresh draft and publish it."""
+        with self.edit() as draft:
+            return getattr(draft, method)(*args, **kwargs)
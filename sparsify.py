@@ -0,0 +1,262 @@
+"""Edge pruning policies for MovieGraph, and stats to size them.
+
+    policy = SparsificationPolicy(top_k=20, mutual=True, quantize=True)
+    system = MovieRecommendationSystem(CSV_FILE, policy=policy)
+    print(graph_stats(system.graph, reference=unpruned_graph))
+
+    python sparsify.py --top-k 20 --mutual --genre-quantile 0.9 --quantize
+
+At the fixed 0.1 threshold almost every pair sharing a popular genre is an
+edge, so degree grows with the catalogue. The policies, applied in order:
+
+    genre_quantile  per-genre thresholds: an edge whose movies share genres
+                    must beat the given score quantile of the least crowded
+                    shared genre, so "Drama" needs a far higher score than
+                    "Film-Noir"
+    top_k           keep an edge if it is among either endpoint's top_k
+    mutual          ...only if it is among both endpoints' top_k, which
+                    caps every node's degree at top_k
+    quantize        store scores as float16 (CSR snapshot and per-edge
+                    components); adj_list scores are rounded to match
+
+Pruned pairs also lose their stored components, so re-weighted queries rank
+only the kept edges. After an edit the policy re-scores the edited movie
+and the movies whose top_k it enters or leaves, with the genre thresholds
+learned on the full graph; the result is what a full apply with those
+thresholds would keep.
+"""
+import argparse
+import sys
+
+import numpy as np
+
+_NO_TOP = (frozenset(), None)  # policy_top entry of a movie without edges
+
+
+class SparsificationPolicy:
+    def __init__(self, top_k=None, mutual=False, genre_quantile=None, quantize=False):
+        if mutual and not top_k:
+            raise ValueError("mutual kNN needs top_k")
+        if genre_quantile is not None and not 0 < genre_quantile < 1:
+            raise ValueError("genre_quantile must be between 0 and 1")
+        self.top_k = top_k
+        self.mutual = mutual
+        self.genre_quantile = genre_quantile
+        self.quantize = quantize
+        self.genre_thresholds = {}  # genre -> score threshold, learned on the first full apply
+
+    def __repr__(self):
+        return (f"SparsificationPolicy(top_k={self.top_k}, mutual={self.mutual}, "
+                f"genre_quantile={self.genre_quantile}, quantize={self.quantize})")
+
+    def apply(self, graph, movie_ids=None, dependents=()):
+        """Prune ``graph`` in place; after an edit only around ``movie_ids``.
+
+        ``movie_ids`` are edited movies whose rows already hold every edge
+        above the threshold; ``dependents`` are the movies returned by
+        dependents() before the edit. With top_k each movie's top_k is kept
+        in graph.policy_top, so only the rows whose top_k an edited movie
+        enters or leaves are re-scored, and pairs pruned earlier come back
+        when they make the cut again.
+        """
+        if movie_ids is not None:
+            self._reapply(graph, movie_ids, dependents)
+            graph._changed()
+            return
+        adj = graph.adj_list
+        if self.genre_quantile is not None:
+            self.learn_genre_thresholds(graph)
+        drop = set()
+        if self.genre_thresholds:
+            for i, neighbors in adj.items():
+                for j, score in neighbors.items():
+                    if i < j and score <= self._genre_threshold(graph, i, j):
+                        drop.add((i, j))
+        if self.top_k:
+            graph.policy_top = {movie_id: self._top((j, score) for j, score in neighbors.items()
+                                                    if (min(movie_id, j), max(movie_id, j)) not in drop)
+                                for movie_id, neighbors in adj.items()}
+            for i, neighbors in adj.items():
+                for j in neighbors:
+                    if i < j and (i, j) not in drop and not self._keeps(graph, i, j):
+                        drop.add((i, j))
+        graph.remove_edges(drop)
+        if self.quantize:
+            self._quantize(graph, adj)
+        graph._changed()
+
+    def dependents(self, graph, movie_id):
+        """Movies whose top_k holds ``movie_id``; call before editing or deleting it."""
+        if not self.top_k:
+            return set()
+        return {other_id for other_id in graph.indexed_candidate_ids(movie_id)
+                if movie_id in graph.policy_top.get(other_id, _NO_TOP)[0]}
+
+    def _reapply(self, graph, movie_ids, dependents):
+        rows = set(movie_ids) | {movie_id for movie_id in dependents if movie_id in graph.movies}
+        if self.top_k:
+            # Movies the edited ones now make the top_k of
+            for movie_id in movie_ids:
+                for other_id, score in graph.adj_list[movie_id].items():
+                    if other_id not in rows and self._passes(graph, movie_id, other_id, score) \
+                            and self._enters_top(graph, other_id, movie_id, score):
+                        rows.add(other_id)
+        scored = {movie_id: self._score_row(graph, movie_id) for movie_id in rows}
+        if self.top_k:
+            for movie_id, row in scored.items():
+                graph.policy_top[movie_id] = self._top((j, score) for j, (score, _) in row.items())
+        kept = []
+        for i, row in scored.items():
+            for j, (score, components) in row.items():
+                if j in rows and j < i:
+                    continue  # both rows were scored; add the pair once
+                if self.top_k and not self._keeps(graph, i, j):
+                    continue
+                kept.append((i, j, float(np.float16(score)) if self.quantize else score, components))
+        graph.remove_edges([(i, j) for i in rows for j in graph.adj_list[i]])
+        graph.add_edges(kept)
+
+    def _score_row(self, graph, movie_id):
+        """{other_id: (score, components)} of the movie's edges that pass the thresholds."""
+        from movie_recommender import similarity_components, weighted_similarity
+
+        movie = graph.movies[movie_id]
+        row = {}
+        for other_id in graph.candidate_ids(movie):
+            components = similarity_components(movie, graph.movies[other_id])
+            score = weighted_similarity(components)
+            if score > graph.threshold and self._passes(graph, movie_id, other_id, score):
+                row[other_id] = (score, components)
+        return row
+
+    def _passes(self, graph, i, j, score):
+        return not self.genre_thresholds or score > self._genre_threshold(graph, i, j)
+
+    def _top(self, scored):
+        """(ids of the top_k of (id, score) pairs, rank key of the k-th or None if fewer)."""
+        ranked = sorted(((score, -j) for j, score in scored), reverse=True)[:self.top_k]
+        return frozenset(-neg_j for _, neg_j in ranked), ranked[-1] if len(ranked) == self.top_k else None
+
+    def _enters_top(self, graph, movie_id, other_id, score):
+        top = graph.policy_top.get(movie_id)
+        return top is None or top[1] is None or (score, -other_id) > top[1]
+
+    def _keeps(self, graph, i, j):
+        tops = graph.policy_top
+        for movie_id in (i, j):
+            if movie_id not in tops:
+                tops[movie_id] = self._top((k, score) for k, (score, _) in self._score_row(graph, movie_id).items())
+        in_i, in_j = j in tops[i][0], i in tops[j][0]
+        return in_i and in_j if self.mutual else in_i or in_j
+
+    def kept_neighbours(self, movie, others, threshold):
+        """{movie_id: score} of the edges to ``movie`` that this policy keeps, without a graph.
+
+        For answering while the graph is still building. Applies the learned
+        genre thresholds and the movie's own top_k. The pruned graph can
+        differ only where the other movie's top_k decides: without mutual it
+        also keeps edges among the neighbour's top_k, with mutual it drops
+        edges outside it.
+        """
+        from movie_recommender import similarity_components, weighted_similarity
+
+        kept = {}
+        for other in others:
+            score = weighted_similarity(similarity_components(movie, other))
+            if score <= threshold:
+                continue
+            shared = movie.genres & other.genres
+            if self.genre_thresholds and shared and \
+                    score <= min(self.genre_thresholds.get(genre, threshold) for genre in shared):
+                continue
+            kept[other.movie_id] = score
+        if self.top_k:
+            top = sorted(((score, -other_id) for other_id, score in kept.items()), reverse=True)[:self.top_k]
+            kept = {-neg_id: score for score, neg_id in top}
+        if self.quantize:
+            kept = {other_id: float(np.float16(score)) for other_id, score in kept.items()}
+        return kept
+
+    def learn_genre_thresholds(self, graph):
+        scores = {}
+        for i, neighbors in graph.adj_list.items():
+            genres_i = graph.movies[i].genres
+            for j, score in neighbors.items():
+                if i < j:
+                    for genre in genres_i & graph.movies[j].genres:
+                        scores.setdefault(genre, []).append(score)
+        self.genre_thresholds = {genre: max(graph.threshold, float(np.quantile(values, self.genre_quantile)))
+                                 for genre, values in scores.items()}
+
+    def _genre_threshold(self, graph, i, j):
+        shared = graph.movies[i].genres & graph.movies[j].genres
+        if not shared:
+            return graph.threshold
+        return min(self.genre_thresholds.get(genre, graph.threshold) for genre in shared)
+
+    def _quantize(self, graph, scope):
+        graph.score_dtype = np.float16
+        for i in scope:
+            graph.components[i] = graph.components[i].astype(np.float16, copy=False)
+            neighbors = graph.writable_row(i)
+            for j, score in neighbors.items():
+                rounded = float(np.float16(score))
+                neighbors[j] = rounded
+                graph.writable_row(j)[i] = rounded
+
+
+def graph_stats(graph, reference=None, k=10, sample=None):
+    """Edge count, degree, memory and (with an unpruned ``reference``) recall@k."""
+    adj = graph.adj_list
+    degrees = np.array([len(neighbors) for neighbors in adj.values()])
+    csr = graph.to_csr()
+    stats = {
+        "movies": len(adj),
+        "edges": int(degrees.sum()) // 2,
+        "mean_degree": float(degrees.mean()) if len(degrees) else 0.0,
+        "max_degree": int(degrees.max()) if len(degrees) else 0,
+        "csr_bytes": csr.indptr.nbytes + csr.indices.nbytes + csr.data.nbytes,
+        "component_bytes": sum(values.nbytes for values in graph.components.values()),
+        # dict overhead per node plus a float object per directed edge
+        "adj_list_bytes": sum(sys.getsizeof(neighbors) for neighbors in adj.values()) + 24 * int(degrees.sum()),
+    }
+    stats["bytes_per_node"] = ((stats["csr_bytes"] + stats["component_bytes"] + stats["adj_list_bytes"])
+                               / max(1, len(adj)))
+    if reference is not None:
+        movie_ids = list(adj) if sample is None else list(adj)[:sample]
+        hits = total = 0
+        for movie_id in movie_ids:
+            expected = {j for j, _ in reference.get_similar_movies(movie_id)[:k]}
+            got = {j for j, _ in graph.get_similar_movies(movie_id)[:k]}
+            hits += len(expected & got)
+            total += len(expected)
+        stats[f"recall@{k}"] = hits / total if total else 1.0
+    return stats
+
+
+def main(argv=None):
+    from movie_recommender import MovieRecommendationSystem
+
+    parser = argparse.ArgumentParser(description="Compare a sparsified similarity graph with the full one.")
+    parser.add_argument("--csv", default="imdb_top_1000_cleaned.csv")
+    parser.add_argument("--top-k", type=int)
+    parser.add_argument("--mutual", action="store_true")
+    parser.add_argument("--genre-quantile", type=float)
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--sample", type=int, help="movies used for recall (default all)")
+    args = parser.parse_args(argv)
+
+    system = MovieRecommendationSystem(args.csv)
+    full = system.graph
+    pruned = full.copy()
+    policy = SparsificationPolicy(args.top_k, args.mutual, args.genre_quantile, args.quantize)
+    policy.apply(pruned)
+    print(f"{'':<18}{'full':>14}{'pruned':>14}")
+    full_stats, pruned_stats = graph_stats(full), graph_stats(pruned, full, sample=args.sample)
+    for name, value in pruned_stats.items():
+        before = full_stats.get(name, 1.0)
+        print(f"{name:<18}{before:>14.6g}{value:>14.6g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,108 @@
+import os
+
 import streamlit as st
+import instrumentation
+from catalogues import CatalogueRegistry
 from movie_recommender import MovieRecommendationSystem
+from snapshots import SnapshotStore
+
+# Several regional catalogues in one process, e.g. MOVIE_CATALOGUES="us=imdb_us.csv,eu=imdb_eu.csv"
+CATALOGUES = os.environ.get("MOVIE_CATALOGUES", "").strip()
 
 # Cache the system instance to avoid reloading on every refresh
 @st.cache_resource
 def load_system():
     csv_file = "imdb_top_1000_cleaned.csv"  # Ensure the CSV file is in the same directory
     system = MovieRecommendationSystem(csv_file)
-    return system
+    # Searches work as soon as the CSV is parsed; the graph fills in behind them
+    system.start_graph_build()
+    return SnapshotStore(system)
 
-# Load the system
-system = load_system()
+@st.cache_resource
+def load_registry(spec):
+    registry = CatalogueRegistry()
+    for entry in spec.split(","):
+        name, _, csv_file = entry.strip().rpartition("=")
+        registry.load(name or csv_file, csv_file)
+    registry.system.start_graph_build()
+    return registry
+
+if CATALOGUES:
+    # Read-only views sharing one set of movies and one similarity graph
+    registry = load_registry(CATALOGUES)
+    system = registry.view(st.sidebar.selectbox("Catalogue", list(registry.views)))
+else:
+    # Each rerun reads one consistent version; edits publish a new one via store.apply(...)
+    store = load_system()
+    system = store.snapshot()
 
 st.title("IMDB's Movie Recommendation System")
 st.write("*By May Mon Thant & Thant Thaw Tun*")
 st.video("film_loop.mp4")  
 
+PAGE_SIZE = 25  # movies per page in the search result pickers
+
+def pick_movie(fetch_page, key):
+    """Paged movie picker keyed by movie_id; fetch_page(page) returns (movies, total)."""
+    movies, total = fetch_page(1)
+    if not total:
+        return None
+    pages = -(-total // PAGE_SIZE)
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"page:{key}")
+        if page > 1:
+            movies, total = fetch_page(page)
+    first = (page - 1) * PAGE_SIZE
+    st.caption(f"Showing {first + 1}-{first + len(movies)} of {total} movies")
+    labels = {movie.movie_id: f"{movie.title} ({movie.year})" for movie in movies}
+    movie_id = st.selectbox("Select a movie", list(labels), format_func=labels.get, key=f"movie:{key}")
+    return system.db.movies.get(movie_id)
+
+def show_details(movie):
+    st.subheader("Movie Details")
+    st.markdown(f"**Title:** {movie.title}  \n"
+                f"**Year:** {movie.year}  \n"
+                f"**Rating:** {movie.rating}  \n"
+                f"**Director:** {movie.director}  \n"
+                f"**Actors:** {', '.join(movie.actors)}  \n"
+                f"**Genres:** {', '.join(movie.genres)}")
+
+def show_recommendations(movie_id):
+    if not system.graph_ready:
+        st.progress(system.graph_progress(), text="Building the similarity graph...")
+        st.caption("Until it finishes, recommendations are scored on demand.")
+    recs = system.similar_movies(movie_id)
+    if recs:
+        st.subheader("Recommendations")
+        cards = []
+        for sim_id, score in recs[:10]:
+            sim_movie = system.db.movies[sim_id]
+            cards.append(f"**Title:** {sim_movie.title}  \n"
+                         f"**Year:** {sim_movie.year}  \n"
+                         f"**Rating:** {sim_movie.rating}  \n"
+                         f"**Director:** {sim_movie.director.capitalize()}  \n"
+                         f"**Actors:** {', '.join(actor.capitalize() for actor in sim_movie.actors)}  \n"
+                         f"**Genres:** {', '.join(sim_movie.genres)}  \n"
+                         f"**Similarity Score:** {score:.2f}")
+        # One element for all cards instead of two per recommendation
+        st.markdown("\n\n---\n\n".join(cards))
+    else:
+        st.write("No recommendations found.")
+
 # Sidebar: choose an action
-action = st.sidebar.radio("Choose an action", ["Search by Title", "Search by Genre", "Get Recommendations", "Search by Preferences"])
+action = st.sidebar.radio("Choose an action", ["Search by Title", "Search by Genre", "Get Recommendations", "Search by Preferences", "Explore Clusters"])
 
 if action == "Search by Title":
     st.header("Search Movie by Title")
     title_prefix = st.text_input("Enter the beginning of a movie title")
     if title_prefix:
-        matching_movies = system.db.title_trie.search_prefix(title_prefix.lower())
-        if matching_movies:
-            movie_options = [f"{movie.title} ({movie.year})" for movie in matching_movies]
-            chosen = st.selectbox("Select a movie", movie_options)
-            selected_movie = next((m for m in matching_movies if f"{m.title} ({m.year})" == chosen), None)
-            if selected_movie:
-                st.subheader("Movie Details")
-                st.write(f"**Title:** {selected_movie.title}")
-                st.write(f"**Year:** {selected_movie.year}")
-                st.write(f"**Rating:** {selected_movie.rating}")
-                st.write(f"**Director:** {selected_movie.director}")
-                st.write(f"**Actors:** {', '.join(selected_movie.actors)}")
-                st.write(f"**Genres:** {', '.join(selected_movie.genres)}")
-                if st.button("Get Recommendations for this movie"):
-                    recs = system.graph.get_similar_movies(selected_movie.movie_id)
-                    if recs:
-                        st.subheader("Recommendations")
-                        for sim_id, score in recs[:10]:
-                            sim_movie = system.graph.movies[sim_id]
-                            st.markdown(f"""
-                            **Title:** {sim_movie.title}  
-                            **Year:** {sim_movie.year}  
-                            **Rating:** {sim_movie.rating}  
-                            **Director:** {sim_movie.director.capitalize()}  
-                            **Actors:** {', '.join(actor.capitalize() for actor in sim_movie.actors)}  
-                            **Genres:** {', '.join(sim_movie.genres)}  
-                            **Similarity Score:** {score:.2f}
-                            """)
-                            st.markdown("---")  # This adds a horizontal line separator
-                    else:
-                        st.write("No recommendations found.")
+        selected_movie = pick_movie(lambda page: system.db.search_page(title_prefix, page, PAGE_SIZE),
+                                    key=f"title:{title_prefix.lower()}")
+        if selected_movie:
+            show_details(selected_movie)
+            if st.button("Get Recommendations for this movie"):
+                show_recommendations(selected_movie.movie_id)
         else:
             st.write("No movies found with that title prefix.")
 
@@ -61,37 +111,12 @@ elif action == "Search by Genre":
     genres = sorted(system.db.all_genres)
     selected_genre = st.selectbox("Select a genre", genres)
     if selected_genre:
-        movies_in_genre = system.db.genre_tries[selected_genre].search_prefix("")
-        if movies_in_genre:
-            movie_options = [f"{movie.title} ({movie.year})" for movie in movies_in_genre]
-            chosen = st.selectbox("Select a movie", movie_options)
-            selected_movie = next((m for m in movies_in_genre if f"{m.title} ({m.year})" == chosen), None)
-            if selected_movie:
-                st.subheader("Movie Details")
-                st.write(f"**Title:** {selected_movie.title}")
-                st.write(f"**Year:** {selected_movie.year}")
-                st.write(f"**Rating:** {selected_movie.rating}")
-                st.write(f"**Director:** {selected_movie.director}")
-                st.write(f"**Actors:** {', '.join(selected_movie.actors)}")
-                st.write(f"**Genres:** {', '.join(selected_movie.genres)}")
-                if st.button("Get Recommendations for this movie"):
-                    recs = system.graph.get_similar_movies(selected_movie.movie_id)
-                    if recs:
-                        st.subheader("Recommendations")
-                        for sim_id, score in recs[:10]:
-                            sim_movie = system.graph.movies[sim_id]
-                            st.markdown(f"""
-                            **Title:** {sim_movie.title}  
-                            **Year:** {sim_movie.year}  
-                            **Rating:** {sim_movie.rating}  
-                            **Director:** {sim_movie.director.capitalize()}  
-                            **Actors:** {', '.join(actor.capitalize() for actor in sim_movie.actors)}  
-                            **Genres:** {', '.join(sim_movie.genres)}  
-                            **Similarity Score:** {score:.2f}
-                            """)
-                            st.markdown("---") 
-                    else:
-                        st.write("No recommendations found.")
+        selected_movie = pick_movie(lambda page: system.db.genre_page(selected_genre, "", page, PAGE_SIZE),
+                                    key=f"genre:{selected_genre}")
+        if selected_movie:
+            show_details(selected_movie)
+            if st.button("Get Recommendations for this movie"):
+                show_recommendations(selected_movie.movie_id)
         else:
             st.write("No movies found in this genre.")
 
@@ -99,26 +124,10 @@ elif action == "Get Recommendations":
     st.header("Get Recommendations by Movie Title")
     movie_title = st.text_input("Enter the full movie title for recommendations").strip().lower()
     if movie_title:
-        movie = system.graph.get_movie(movie_title)
+        movie = system.db.get_movie(movie_title)
         if movie:
             st.subheader(f"Recommendations for {movie.title}:")
-            recs = system.graph.get_similar_movies(movie.movie_id)
-            if recs:
-                st.subheader("Recommendations")
-                for sim_id, score in recs[:10]:
-                    sim_movie = system.graph.movies[sim_id]
-                    st.markdown(f"""
-                    **Title:** {sim_movie.title}  
-                    **Year:** {sim_movie.year}  
-                    **Rating:** {sim_movie.rating}  
-                    **Director:** {sim_movie.director.capitalize()}  
-                    **Actors:** {', '.join(actor.capitalize() for actor in sim_movie.actors)}  
-                    **Genres:** {', '.join(sim_movie.genres)}  
-                    **Similarity Score:** {score:.2f}
-                    """)
-                    st.markdown("---") 
-            else:
-                st.write("No recommendations found.")
+            show_recommendations(movie.movie_id)
         else:
             st.write("Movie not found in the system.")
 
@@ -127,19 +136,56 @@ elif action == "Search by Preferences":
     preferred_actor = st.text_input("Enter your favorite actor (optional):").strip().lower()
 
     if preferred_director or preferred_actor:
-        movie_scores = []  # Store (score, movie) tuples
-        for movie in system.db.movies.values():
-            score = 0
-            if preferred_director and movie.director == preferred_director:
-                score += 2
-            if preferred_actor and preferred_actor in movie.actors:
-                score += 1
-            
-            if score > 0:
-                movie_scores.append((score, movie))
-        
-        movie_scores.sort(reverse=True, key=lambda x: x[0])  # Sort by priority
+        movie_scores = system.db.search_by_preference(preferred_director, preferred_actor)
         st.subheader("Top Matches Based on Preferences")
-        for score, movie in movie_scores[:10]:  # Show top 10
-            st.write(f"{movie.title} ({movie.year}) - {movie.rating}")
+        st.markdown("  \n".join(f"{movie.title} ({movie.year}) - {movie.rating}"
+                                 for score, movie in movie_scores[:10]))  # Show top 10
+
+elif action == "Explore Clusters":
+    st.header("Explore Clusters of Similar Movies")
+    if not system.graph_ready:
+        st.progress(system.graph_progress(), text="Building the similarity graph...")
+        st.write("Clusters are available once the similarity graph is built.")
+    else:
+        communities = system.communities
+        cluster_id = st.selectbox(
+            "Select a cluster", range(len(communities)),
+            format_func=lambda cid: f"{communities.describe(cid)} ({len(communities.members(cid))} movies)")
+        members = system.explore_cluster(cluster_id)
+        selected_movie = pick_movie(
+            lambda page: (members[(page - 1) * PAGE_SIZE:page * PAGE_SIZE], len(members)),
+            key=f"cluster:{cluster_id}")
+        if selected_movie:
+            show_details(selected_movie)
+            if st.button("Get Recommendations for this movie"):
+                show_recommendations(selected_movie.movie_id)
 
+# Debug panel with call timings, cache counters and optional profiles
+if st.sidebar.checkbox("Show debug stats"):
+    st.header("Debug Stats")
+    if not instrumentation.ENABLED:
+        st.info("Call timings are off. Start the app with MOVIE_METRICS=1 to record them.")
+    stats = instrumentation.registry.snapshot()
+    if stats["timers"]:
+        st.subheader("Timers")
+        st.table([{"function": name, "calls": t["count"], "mean ms": t["mean_seconds"] * 1000,
+                   "p95 ms": t["p95_seconds"] * 1000, "max ms": t["max_seconds"] * 1000}
+                  for name, t in sorted(stats["timers"].items())])
+    if stats["counters"]:
+        st.subheader("Counters")
+        st.json(stats["counters"])
+    st.subheader("Startup")
+    st.json(system.startup_report())
+    st.subheader("Result caches")
+    caches = {"database": system.db.cache.stats()}
+    if system.graph_ready:  # don't trigger the graph build just to show its cache
+        caches["graph"] = system.graph.cache.stats()
+    st.json(caches)
+    if "cprofile" in instrumentation.PROFILE_MODES:
+        with st.expander("cProfile (top 30 by cumulative time)"):
+            st.text(instrumentation.profile_report())
+    if "tracemalloc" in instrumentation.PROFILE_MODES:
+        with st.expander("tracemalloc (top allocations)"):
+            st.text(instrumentation.memory_report())
+    st.download_button("Download Prometheus metrics", instrumentation.registry.to_prometheus(),
+                       file_name="metrics.prom")
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from batch_recommend import main, resolve_queries, run_batch
+from movie_recommender import MovieRecommendationSystem
+
+
+@pytest.fixture
+def csv_file(catalogue_csv):
+    return catalogue_csv(120, seed=7, actor_pool=40, director_pool=12)
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_worker_pool_output_matches_in_process(csv_file, tmp_path):
+    outputs = []
+    for workers in (1, 2):
+        path = str(tmp_path / f"recs_{workers}.jsonl")
+        main(["--all", "-o", path, "-k", "5", "--workers", str(workers), "--chunk-size", "16", "--csv", csv_file])
+        with open(path, "rb") as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
+    assert len(outputs[0].splitlines()) == 120
+
+
+def test_records_match_the_graph(csv_file, tmp_path):
+    system = MovieRecommendationSystem(csv_file)
+    path = str(tmp_path / "recs.jsonl")
+    assert run_batch(system, list(system.db.movies), path, k=4, workers=1, chunk_size=10) == len(system.db.movies)
+    for record in read_jsonl(path):
+        expected = system.graph.get_similar_movies(record["movie_id"])[:4]
+        assert record["title"] == system.db.movies[record["movie_id"]].title
+        assert [(rec["movie_id"], rec["score"]) for rec in record["recommendations"]] == \
+            [(movie_id, round(score, 6)) for movie_id, score in expected]
+
+
+def test_queries_resolve_titles_ids_and_misses(csv_file, tmp_path):
+    system = MovieRecommendationSystem(csv_file)
+    movie = system.db.movies[3]
+    queries = [f"  {movie.title.upper()} ", "5", 9, "no such film", 10_000]
+    assert resolve_queries(system, queries) == [
+        (queries[0], 3), ("5", 5), ("9", 9), ("no such film", None), ("10000", None)]
+    path = str(tmp_path / "recs.jsonl")
+    run_batch(system, queries, path, k=3, workers=1)
+    records = read_jsonl(path)
+    assert [record["movie_id"] for record in records] == [3, 5, 9, None, None]
+    assert records[3]["error"] == "not found" and records[3]["recommendations"] == []
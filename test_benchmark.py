@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from benchmark import compare, keep_faster, main
+
+ARGS = ["--sizes", "60", "--queries", "20", "--no-memory"]
+
+
+def test_catalogue_settings_are_recorded(tmp_path, capsys):
+    path = str(tmp_path / "baseline.json")
+    assert main(ARGS + ["--genre-skew", "1.5", "--actor-skew", "1.2", "--actors-per-movie", "2",
+                        "--save-baseline", path, "-o", str(tmp_path / "run.json")]) == 0
+    with open(path, encoding="utf8") as f:
+        meta = json.load(f)["meta"]
+    assert meta["catalogue"] == {"genre_skew": 1.5, "actor_skew": 1.2, "actors_per_movie": 2}
+    assert main(ARGS + ["--genre-skew", "1.5", "--actor-skew", "1.2", "--actors-per-movie", "2",
+                        "--baseline", path, "--tolerance", "1000", "-o", str(tmp_path / "run.json")]) == 0
+
+
+def test_baseline_with_other_settings_is_refused(tmp_path, capsys):
+    path = str(tmp_path / "baseline.json")
+    main(ARGS + ["--save-baseline", path, "-o", str(tmp_path / "run.json")])
+    with pytest.raises(SystemExit):
+        main(ARGS + ["--actors-per-movie", "2", "--baseline", path])
+    assert "actors_per_movie" in capsys.readouterr().err
+
+
+def test_retimed_rows_only_count_when_faster():
+    def row(seconds):
+        return {"size": 10, "structure": "Trie", "operation": "build", "seconds": seconds,
+                "per_op_us": seconds * 1e6, "peak_bytes": None}
+    baseline = {"results": [row(0.04)]}
+    results = [row(0.08)]
+    assert compare(results, baseline, 0.25)
+    keep_faster(results, [row(0.09)])
+    assert results[0]["seconds"] == 0.08
+    keep_faster(results, [row(0.041)])
+    assert results[0]["seconds"] == 0.041 and not compare(results, baseline, 0.25)
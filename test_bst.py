@@ -0,0 +1,14 @@
+from BST import Movie, MovieBST
+
+
+def test_editing_the_original_leaves_a_copy_unchanged():
+    tree = MovieBST()
+    tree.insert(Movie(1, "Alpha", ["Drama"], year="1990", rating=8.5))
+    tree.insert(Movie(2, "Beta", ["Drama"], year="2000", rating=9.0))
+    copy = tree.copy()
+    assert tree.update_movie("Alpha", genres=["Comedy"], rating=9.9)
+    assert sorted(movie.title for movie in copy.get_movies_by_genre("Drama")) == ["Alpha", "Beta"]
+    assert not copy.get_movies_by_genre("Comedy")
+    assert [(movie.title, movie.rating) for movie in copy.movies_by_rating()] == [("Beta", 9.0), ("Alpha", 8.5)]
+    assert [movie.title for movie in tree.get_movies_by_genre("Drama")] == ["Beta"]
+    assert [movie.rating for movie in tree.movies_by_rating()] == [9.9, 9.0]
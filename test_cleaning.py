@@ -0,0 +1,88 @@
+import csv
+import os
+
+import pytest
+
+from cleaning import CLEAN_COLUMNS, RAW_COLUMNS, SchemaError, clean_csv, clean_row
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_raw(path, rows, columns=RAW_COLUMNS):
+    with open(path, "w", newline="", encoding="utf8") as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def raw_row(title, rating="8.1", genre="Crime, Drama"):
+    return {"Series_Title": title, "Released_Year": "1994", "IMDB_Rating": rating, "Director": " Someone ",
+            "Star1": "A", "Star2": "B", "Star3": "C", "Star4": "D", "Genre": genre}
+
+
+def test_reproduces_the_committed_cleaned_csv(tmp_path):
+    output = str(tmp_path / "cleaned.csv")
+    report = clean_csv(os.path.join(HERE, "imdb_top_1000.csv"), output)
+    assert (report["rows"], report["cleaned"], report["rejected"]) == (1000, 1000, [])
+    assert read(output) == read(os.path.join(HERE, "imdb_top_1000_cleaned.csv"))
+
+
+def test_second_run_over_unchanged_input_is_a_no_op(tmp_path):
+    raw, output = str(tmp_path / "raw.csv"), str(tmp_path / "cleaned.csv")
+    write_raw(raw, [raw_row(f"Film {i}") for i in range(50)])
+    first = clean_csv(raw, output, chunk_size=8)
+    before = read(output)
+    second = clean_csv(raw, output, chunk_size=8)
+    assert not first["unchanged"] and second["unchanged"]
+    assert read(output) == before
+
+
+def test_refresh_recleans_only_changed_rows(tmp_path):
+    raw, output = str(tmp_path / "raw.csv"), str(tmp_path / "cleaned.csv")
+    rows = [raw_row(f"Film {i}") for i in range(20)]
+    write_raw(raw, rows)
+    clean_csv(raw, output)
+    rows[4] = raw_row("Film 4", rating="9")
+    write_raw(raw, rows)
+    report = clean_csv(raw, output)
+    assert (report["cleaned"], report["cached"], report["unchanged"]) == (1, 19, False)
+    forced = clean_csv(raw, str(tmp_path / "fresh.csv"), cache_path=str(tmp_path / "fresh.cache"))
+    assert forced["cleaned"] == 20
+    assert read(output) == read(str(tmp_path / "fresh.csv"))
+
+
+def test_edited_output_is_rewritten(tmp_path):
+    raw, output = str(tmp_path / "raw.csv"), str(tmp_path / "cleaned.csv")
+    write_raw(raw, [raw_row("Film")])
+    clean_csv(raw, output)
+    expected = read(output)
+    with open(output, "a", encoding="utf8") as f:
+        f.write("stray,row\n")
+    report = clean_csv(raw, output)
+    assert not report["unchanged"] and report["cached"] == 1
+    assert read(output) == expected
+
+
+def test_rows_are_normalized_and_bad_rows_rejected(tmp_path):
+    assert clean_row(raw_row(" Heat ", rating="9", genre="Crime")) == [
+        "Heat", "1994", "9.0", "Someone", "A", "B", "C", "D", "Crime", "None", "None"]
+    with pytest.raises(SchemaError):
+        clean_row(raw_row("Heat", rating="n/a"))
+    raw, output = str(tmp_path / "raw.csv"), str(tmp_path / "cleaned.csv")
+    write_raw(raw, [raw_row("Good"), raw_row(""), raw_row("Bad", rating="?")])
+    report = clean_csv(raw, output)
+    assert [line for line, _ in report["rejected"]] == [3, 4]
+    with open(output, newline="", encoding="utf8") as f:
+        assert list(csv.reader(f)) == [CLEAN_COLUMNS, clean_row(raw_row("Good"))]
+
+
+def test_missing_raw_column_raises(tmp_path):
+    raw = str(tmp_path / "raw.csv")
+    write_raw(raw, [], columns=RAW_COLUMNS[:-1])
+    with pytest.raises(SchemaError, match="Genre"):
+        clean_csv(raw, str(tmp_path / "cleaned.csv"))
@@ -0,0 +1,38 @@
+import pytest
+
+from communities import CommunityIndex
+from movie_recommender import MovieRecommendationSystem
+
+
+@pytest.fixture
+def system(catalogue_csv):
+    return MovieRecommendationSystem(catalogue_csv(300, seed=11, actor_pool=80, director_pool=25))
+
+
+def test_every_movie_has_exactly_one_community(system):
+    index = CommunityIndex.build(system.graph.to_csr(), system.db.movies, max_cluster_size=40)
+    members = [movie_id for cluster_id in range(len(index)) for movie_id in index.members(cluster_id)]
+    assert sorted(members) == sorted(system.db.movies)
+    assert all(index.cluster_of(movie_id) is not None for movie_id in system.db.movies)
+    assert max(len(index.members(cluster_id)) for cluster_id in range(len(index))) <= 40
+    assert len(index) > 1
+    assert all(index.describe(cluster_id) for cluster_id in range(len(index)))
+
+
+def test_clustered_recommendations_are_graph_neighbours(system):
+    found = 0
+    for movie_id in system.db.movies:
+        neighbours = dict(system.similar_movies(movie_id))
+        recs = system.recommend_clustered(movie_id, k=10)
+        assert all(neighbours.get(rec_id) == pytest.approx(score) for rec_id, score in recs), movie_id
+        assert [score for _, score in recs] == sorted((score for _, score in recs), reverse=True)
+        found += bool(recs)
+    assert found > len(system.db.movies) // 2
+
+
+def test_communities_follow_the_catalogue_after_an_edit(system):
+    system.communities  # build before the edit
+    movie_id = next(iter(system.db.movies))
+    system.delete_movie(movie_id)
+    members = [m for cluster_id in range(len(system.communities)) for m in system.communities.members(cluster_id)]
+    assert sorted(members) == sorted(system.db.movies)
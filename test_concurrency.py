@@ -0,0 +1,108 @@
+import threading
+
+import pytest
+
+import movie_recommender
+from movie_recommender import Movie, MovieRecommendationSystem, ResultCache
+
+
+@pytest.fixture
+def system(catalogue_csv):
+    return MovieRecommendationSystem(catalogue_csv(200, seed=2))
+
+
+def test_results_computed_across_a_clear_are_not_stored():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            cache.clear()  # an edit lands while the first result is being computed
+        return len(calls)
+
+    assert cache.get_or_compute("key", compute) == 1
+    assert cache.get_or_compute("key", compute) == 2
+    assert cache.get_or_compute("key", compute) == 2
+    assert cache.stats()["size"] == 1
+
+
+def test_inserts_racing_lazy_index_builds_are_indexed_once(system):
+    db = system.db
+    base = max(db.movies) + 1
+    n = 1500
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            db.search_prefix("zz")
+            db._built.discard("title_trie")  # force a rebuild to race with the next insert
+            db.title_trie
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for thread in readers:
+        thread.start()
+    try:
+        for i in range(n):
+            db.insert(Movie(base + i, f"zz film {i}", ["Drama"], "someone", ["an actor"], "2000", 7.0))
+    finally:
+        done.set()
+        for thread in readers:
+            thread.join()
+    expected = list(range(base, base + n))
+    assert sorted(movie.movie_id for movie in db.title_trie.search_prefix("zz")) == expected
+    assert sorted(movie.movie_id for movie in db.search_prefix("zz")) == expected
+    assert sorted(movie.movie_id for movie in db.query(actor="an actor", limit=None)) == expected
+
+
+def test_every_waiter_sees_a_failed_graph_build(system, monkeypatch):
+    release = threading.Event()
+
+    def failing_rows(graph, movies, first, last):
+        release.wait()
+        raise RuntimeError("scoring failed")
+
+    monkeypatch.setattr(movie_recommender, "score_rows", failing_rows)
+    system.start_graph_build()
+    errors = []
+
+    def wait():
+        try:
+            system.graph
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    waiters = [threading.Thread(target=wait) for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    release.set()
+    for thread in waiters:
+        thread.join()
+    assert errors == ["scoring failed"] * 4
+    monkeypatch.undo()
+    assert len(system.graph.adj_list) == len(system.db.movies)  # the next access builds again
+
+
+def test_a_copy_taken_during_a_graph_build_gets_its_own_graph(system, monkeypatch):
+    release = threading.Event()
+    score_rows = movie_recommender.score_rows
+    built = set()
+
+    def slow_rows(graph, movies, first, last):
+        release.wait()
+        built.add(id(graph))
+        score_rows(graph, movies, first, last)
+
+    monkeypatch.setattr(movie_recommender, "score_rows", slow_rows)
+    system.start_graph_build()
+    copy = system.copy()
+    assert copy.graph_progress() == 0.0
+    release.set()
+    movie_id = next(iter(system.db.movies))
+    assert copy.delete_movie(movie_id)  # waits for the build started before the copy
+    assert copy.graph is not system.graph
+    assert movie_id not in copy.graph.adj_list
+    assert all(movie_id not in neighbors for neighbors in copy.graph.adj_list.values())
+    assert len(system.graph.adj_list) == len(system.db.movies)
+    assert any(movie_id in neighbors for neighbors in system.graph.adj_list.values())
+    assert len(built) == 1  # the copy did not start a build of its own
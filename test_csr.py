@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+import movie_recommender
+from movie_recommender import CSRGraph
+
+
+@pytest.fixture
+def csr():
+    # A dense cluster, a sparse chain and movies without edges, so the numpy
+    # fallback takes both its expanded and its gathered blocks
+    rng = np.random.default_rng(3)
+    adj_list = {movie_id: {} for movie_id in range(200)}
+    for i in range(40):
+        for j in range(i + 1, 40):
+            adj_list[i][j] = adj_list[j][i] = float(rng.random())
+    for i in range(40, 190):
+        adj_list[i][i + 1] = adj_list[i + 1][i] = float(rng.random())
+    return CSRGraph(adj_list)
+
+
+def to_dense(csr):
+    matrix = np.zeros((len(csr), len(csr)))
+    rows = np.repeat(np.arange(len(csr)), np.diff(csr.indptr))
+    matrix[rows, csr.indices] = csr.data
+    return matrix
+
+
+@pytest.mark.parametrize("max_block", [1 << 22, 2000, 1])
+def test_numpy_fallback_matches_dense_product(csr, monkeypatch, max_block):
+    monkeypatch.setattr(movie_recommender, "_sparse", lambda: None)
+    dense = np.random.default_rng(4).random((len(csr), 5))
+    np.testing.assert_allclose(csr.matmat(dense, max_block), to_dense(csr) @ dense)
+
+
+def test_scipy_path_matches_numpy_fallback(csr, monkeypatch):
+    pytest.importorskip("scipy.sparse")
+    dense = np.random.default_rng(5).random((len(csr), 5))
+    with_scipy = csr.matmat(dense)
+    monkeypatch.setattr(movie_recommender, "_sparse", lambda: None)
+    np.testing.assert_allclose(csr.matmat(dense), with_scipy)
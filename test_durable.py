@@ -0,0 +1,108 @@
+import os
+import pickle
+
+import pytest
+
+from durable import DurableCatalogue, read_log
+from movie_recommender import MovieRecommendationSystem
+
+
+@pytest.fixture
+def csv_file(catalogue_csv):
+    return catalogue_csv(80, seed=3, actor_pool=30, director_pool=10)
+
+
+EDITS = [
+    ("update_movie", (4,), {"director": "Director 1"}),
+    ("graph.update_similarity", (1, 2), {"score": 0.9}),
+    ("delete_movie", (7,), {}),
+    ("update_movie", (10,), {"actors": ["Actor 0", "Actor 1"]}),
+    ("graph.delete_similarity", (3, 5), {}),
+]
+
+
+def apply_directly(csv_file):
+    system = MovieRecommendationSystem(csv_file)
+    for method, args, kwargs in EDITS:
+        target = system.graph if method.startswith("graph.") else system
+        getattr(target, method.split(".")[-1])(*args, **kwargs)
+    return system
+
+
+def state(system):
+    return ({movie_id: (movie.title, movie.director, sorted(movie.actors))
+             for movie_id, movie in system.db.movies.items()},
+            {movie_id: sorted(system.similar_movies(movie_id)) for movie_id in system.db.movies})
+
+
+def test_wal_append_and_replay(tmp_path, csv_file):
+    directory = str(tmp_path / "state")
+    with DurableCatalogue(directory, lambda: MovieRecommendationSystem(csv_file), checkpoint_every=0) as catalogue:
+        assert catalogue.recovery["source"] == "factory"
+        for method, args, kwargs in EDITS:
+            catalogue.apply(method, *args, **kwargs)
+    records, _ = read_log(os.path.join(directory, "wal.log"))
+    assert [(method, args, kwargs) for _, method, args, kwargs in records] == EDITS
+
+    with DurableCatalogue(directory, lambda: pytest.fail("factory called on restart")) as restored:
+        assert restored.recovery["source"] == "checkpoint"
+        assert restored.recovery["replayed"] == len(EDITS)
+        assert restored.recovery["errors"] == []
+        assert state(restored.value) == state(apply_directly(csv_file))
+
+
+def test_factory_checkpoint_includes_graph(tmp_path, csv_file):
+    directory = str(tmp_path / "state")
+    DurableCatalogue(directory, lambda: MovieRecommendationSystem(csv_file)).close()
+    with open(os.path.join(directory, "checkpoint.pkl"), "rb") as f:
+        seq, system = pickle.load(f)
+    assert seq == 0
+    assert system._graph is not None  # so replaying graph edits never rebuilds it
+    assert system.db._built
+
+
+def test_checkpoint_truncates_log(tmp_path, csv_file):
+    directory = str(tmp_path / "state")
+    with DurableCatalogue(directory, lambda: MovieRecommendationSystem(csv_file), checkpoint_every=2) as catalogue:
+        for method, args, kwargs in EDITS:
+            catalogue.apply(method, *args, **kwargs)
+    records, _ = read_log(os.path.join(directory, "wal.log"))
+    assert [seq for seq, *_ in records] == [5]
+
+    with DurableCatalogue(directory, None) as restored:
+        assert restored.recovery["replayed"] == 1
+        assert restored.seq == 5
+        assert state(restored.value) == state(apply_directly(csv_file))
+
+
+def test_torn_tail_is_dropped(tmp_path, csv_file):
+    directory = str(tmp_path / "state")
+    with DurableCatalogue(directory, lambda: MovieRecommendationSystem(csv_file), checkpoint_every=0) as catalogue:
+        for method, args, kwargs in EDITS[:2]:
+            catalogue.apply(method, *args, **kwargs)
+    with open(os.path.join(directory, "wal.log"), "ab") as f:
+        f.write(b"\x40\x00\x00\x00partial record")
+
+    with DurableCatalogue(directory, None, checkpoint_every=0) as restored:
+        assert restored.recovery["replayed"] == 2
+        restored.apply(*EDITS[2][:2])
+    records, good_end = read_log(os.path.join(directory, "wal.log"))
+    assert [seq for seq, *_ in records] == [1, 2, 3]
+    assert good_end == os.path.getsize(os.path.join(directory, "wal.log"))
+
+
+def test_replay_errors_are_recorded(tmp_path, csv_file):
+    directory = str(tmp_path / "state")
+    with DurableCatalogue(directory, lambda: MovieRecommendationSystem(csv_file), checkpoint_every=0) as catalogue:
+        catalogue.apply("update_movie", 4, director="Director 2")
+        with pytest.raises(TypeError):
+            catalogue.apply("graph.update_similarity", 1)
+        catalogue.apply("delete_movie", 9)
+
+    with DurableCatalogue(directory, None) as restored:
+        assert restored.recovery["replayed"] == 3
+        [(seq, method, error)] = restored.recovery["errors"]
+        assert (seq, method) == (2, "graph.update_similarity")
+        assert error.startswith("TypeError")
+        assert 9 not in restored.value.db.movies
+        assert restored.value.db.movies[4].director == "director 2"
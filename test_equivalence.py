@@ -0,0 +1,27 @@
+import pytest
+
+from equivalence_harness import (BACKENDS, check_catalogue_views, check_pair_cache, check_sparsified,
+                                 run_seed)
+
+SEEDS = range(8)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_operations_match_reference(seed):
+    failures = run_seed(seed, size=80, n_ops=300, backend_names=list(BACKENDS), timings={})
+    assert not failures, "seed={} step={} backend={}: {}{}\n  expected: {!r}\n  got:      {!r}".format(*failures[0])
+
+
+@pytest.mark.parametrize("seed", SEEDS[:4])
+def test_sparsified_graph_matches_reference(seed):
+    assert check_sparsified(seed, size=80) == []
+
+
+@pytest.mark.parametrize("seed", SEEDS[:4])
+def test_catalogue_views_match_reference(seed):
+    assert check_catalogue_views(seed, size=80) == []
+
+
+@pytest.mark.parametrize("seed", SEEDS[:4])
+def test_pair_cache_rebuild_matches_full_build(seed):
+    assert check_pair_cache(seed, size=80) == []
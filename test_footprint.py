@@ -0,0 +1,53 @@
+import pytest
+
+from footprint import deep_sizeof, format_footprint
+from movie_recommender import MovieRecommendationSystem
+
+STRUCTURES = ["movies", "title_trie", "genre_tries", "catalogue_bst", "query_index", "database_cache",
+              "graph.adj_list", "graph.components", "graph.postings", "graph.policy_top", "graph.movies",
+              "graph.csr", "graph.cache", "communities", "random_walk"]
+
+
+@pytest.fixture
+def system(catalogue_csv):
+    return MovieRecommendationSystem(catalogue_csv(150, seed=4))
+
+
+def check_totals(report):
+    assert set(report) == {"movies", "edges", "structures", "total_bytes", "not_built"}
+    assert sorted([*report["structures"], *report["not_built"]]) == sorted(STRUCTURES)
+    assert report["total_bytes"] == sum(part["bytes"] for part in report["structures"].values())
+    for part in report["structures"].values():
+        assert part["bytes"] > 0
+        assert part["per_movie"] == part["bytes"] / report["movies"]
+
+
+def test_unbuilt_structures_are_listed_not_counted(system):
+    report = system.memory_report()
+    check_totals(report)
+    assert report["movies"] == 150 and report["edges"] is None
+    assert set(report["structures"]) == {"movies", "database_cache"}
+    assert set(report["not_built"]) == set(STRUCTURES) - {"movies", "database_cache"}
+
+
+def test_every_built_structure_is_counted(system):
+    system.db.build_indexes()
+    system.db.query(limit=1)
+    system.graph.to_csr()
+    system.recommend_random_walk([[0, 1]], k=3)
+    system.communities
+    report = system.memory_report()
+    check_totals(report)
+    assert sorted(report["structures"]) == sorted(STRUCTURES)
+    assert report["edges"] == sum(len(row) for row in system.graph.adj_list.values()) // 2 > 0
+    for part in report["structures"].values():
+        assert part["per_edge"] == part["bytes"] / report["edges"]
+    assert "total" in format_footprint(report)
+
+
+def test_shared_objects_are_counted_once():
+    shared = ["x" * 100]
+    seen = set()
+    first = deep_sizeof({"a": shared}, seen)
+    assert deep_sizeof({"b": shared}, seen) < first
+    assert deep_sizeof(shared, seen) == 0
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+import instrumentation
+from instrumentation import Histogram, MetricsRegistry, instrumented
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Instrumentation switched on, recording into a fresh registry."""
+    fresh = MetricsRegistry()
+    monkeypatch.setattr(instrumentation, "ENABLED", True)
+    monkeypatch.setattr(instrumentation, "registry", fresh)
+    return fresh
+
+
+def test_histogram_buckets_and_percentiles():
+    h = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.005, 0.05, 0.5, 3.0):
+        h.observe(value)
+    assert h.counts == [2, 1, 1, 1]
+    assert (h.count, h.max) == (5, 3.0)
+    assert h.sum == pytest.approx(3.56)
+    assert h.percentile(0.4) == 0.01
+    assert h.percentile(0.6) == 0.1
+    assert h.percentile(1.0) == 3.0  # the overflow bucket reports the observed max
+    assert Histogram().percentile(0.5) == 0.0
+
+
+def test_disabled_decorator_returns_the_function(monkeypatch):
+    monkeypatch.setattr(instrumentation, "ENABLED", False)
+
+    def work():
+        return 1
+    assert instrumented()(work) is work
+
+
+def test_instrumented_records_calls_and_failures(registry):
+    @instrumented("work")
+    def work(fail=False):
+        if fail:
+            raise RuntimeError("boom")
+        return "done"
+
+    assert work() == "done"
+    with pytest.raises(RuntimeError):
+        work(fail=True)
+    timer = registry.snapshot()["timers"]["work"]
+    assert timer["count"] == 2
+    assert timer["max_seconds"] >= timer["mean_seconds"] > 0
+    assert work.__name__ == "work"
+
+
+def test_increment_is_safe_across_threads(registry):
+    def bump():
+        for _ in range(1000):
+            instrumentation.increment("hits")
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.snapshot()["counters"] == {"hits": 8000}
+
+
+def test_prometheus_buckets_are_cumulative(registry):
+    for seconds in (0.00005, 0.002, 0.002, 20.0):
+        registry.observe("query", seconds)
+    registry.increment("cache_miss", 3)
+    text = registry.to_prometheus()
+    assert 'movie_call_seconds_bucket{function="query",le="0.0001"} 1' in text
+    assert 'movie_call_seconds_bucket{function="query",le="0.005"} 3' in text
+    assert 'movie_call_seconds_bucket{function="query",le="10.0"} 3' in text
+    assert 'movie_call_seconds_bucket{function="query",le="+Inf"} 4' in text
+    assert 'movie_call_seconds_count{function="query"} 4' in text
+    assert 'movie_events_total{name="cache_miss"} 3' in text
+    registry.reset()
+    assert registry.snapshot() == {"counters": {}, "timers": {}}
@@ -0,0 +1,110 @@
+import asyncio
+import http.client
+import json
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+import recommendation_server
+from movie_recommender import MovieRecommendationSystem
+from recommendation_server import RecommendationServer
+
+
+@pytest.fixture(scope="module")
+def server(catalogue_csv):
+    system = MovieRecommendationSystem(catalogue_csv(80, seed=5, actor_pool=30, director_pool=10))
+    recommendation_server._system = system  # what the offloaded functions read
+    executor = ThreadPoolExecutor(max_workers=2)
+    app = RecommendationServer(system, executor)
+    loop = asyncio.new_event_loop()
+    srv = loop.run_until_complete(asyncio.start_server(app.serve_connection, "127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield system, srv.sockets[0].getsockname()[1]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    srv.close()
+    loop.run_until_complete(srv.wait_closed())
+    loop.close()
+    executor.shutdown()
+    recommendation_server._system = None
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def raw_request(port, data):
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+        sock.sendall(data)
+        return sock.recv(4096).split(b"\r\n", 1)[0]
+
+
+def test_health_reports_thread_pool_caches(server):
+    system, port = server
+    status, payload = request(port, "GET", "/health")
+    assert status == 200
+    assert payload["status"] == "ok" and payload["movies"] == len(system.db.movies)
+    assert set(payload["cache"]) == {"db", "graph"}
+
+
+def test_health_leaves_out_caches_with_a_process_pool(server):
+    system, _ = server
+    executor = ProcessPoolExecutor(max_workers=1)  # no worker starts until a task is submitted
+    try:
+        payload = asyncio.run(RecommendationServer(system, executor).handle("GET", "/health", {}, b""))
+    finally:
+        executor.shutdown()
+    assert payload == {"status": "ok", "movies": len(system.db.movies)}
+
+
+def test_search_pages_prefix_matches(server):
+    system, port = server
+    expected = [movie.movie_id for movie in system.db.search_prefix("a")]
+    status, payload = request(port, "GET", "/search?prefix=a&page_size=5")
+    assert status == 200
+    assert payload["total"] == len(expected)
+    assert [item["movie_id"] for item in payload["items"]] == expected[:5]
+
+
+def test_weighted_recommendations_match_graph(server):
+    system, port = server
+    movie_id = next(iter(system.db.movies))
+    weights = {"genre": 1.0, "actors": 0.0, "director": 0.0}
+    query = "&".join(f"{name}={value}" for name, value in weights.items())
+    status, payload = request(port, "GET", f"/recommendations?movie_id={movie_id}&{query}&page_size=10")
+    assert status == 200
+    expected = system.graph.get_similar_movies(movie_id, weights)
+    assert expected, "the movie should have neighbours"
+    assert payload["movie"]["movie_id"] == movie_id
+    assert payload["total"] == len(expected)
+    assert [(item["movie_id"], item["score"]) for item in payload["items"]] == [tuple(r) for r in expected[:10]]
+
+
+@pytest.mark.parametrize("path", ["/recommendations", "/recommendations?movie_id=x",
+                                  "/search?page=0", "/recommendations?movie_id=1&genre=heavy"])
+def test_bad_requests_get_400(server, path):
+    _, port = server
+    status, payload = request(port, "GET", path)
+    assert status == 400 and payload["error"]
+
+
+def test_malformed_request_line_gets_400(server):
+    _, port = server
+    assert raw_request(port, b"NONSENSE\r\n\r\n") == b"HTTP/1.1 400 Bad Request"
+
+
+def test_overlong_lines_get_4xx(server):
+    _, port = server
+    long = b"x" * (1 << 17)
+    assert raw_request(port, b"GET /" + long + b" HTTP/1.1\r\n\r\n") == b"HTTP/1.1 400 Bad Request"
+    assert (raw_request(port, b"GET /health HTTP/1.1\r\nX-Long: " + long + b"\r\n\r\n")
+            == b"HTTP/1.1 431 Request Header Fields Too Large")
@@ -1,6 +1,5 @@
 # movie_app.py
-from tree import Movie, MovieBST, load_from_dataframe
-import pandas as pd
+from BST import Movie, MovieBST, load_from_dataframe
 from collections import defaultdict
 
 def greetings():
@@ -8,6 +7,7 @@ def greetings():
     print(welcome)
     
     
+    import pandas as pd
     df = pd.read_csv("imdb_top_1000_cleaned.csv")
     movie_bst = load_from_dataframe(df)
     
@@ -72,25 +72,20 @@ def genre_search(genres_list: list, movie_bst: MovieBST):
     
     chosen_genre = genres_list[choice_num-1]
     print(f"\nThese are the films we have under {chosen_genre.title()}:")
-    movies = movie_bst.get_movies_by_genre(chosen_genre)
-    movies.sort(key=lambda m: m.title) 
+    movies = movie_bst.titles_with_prefix("", chosen_genre)  # already in title order
     for idx, movie in enumerate(movies):
         print(f"{idx+1}. {movie.title}")
     
     return chosen_genre
 
 def suggest_genre(genre: str, movie_bst: MovieBST):
-    movies_in_genre = movie_bst.get_movies_by_genre(genre)
-    titles = [movie.title for movie in movies_in_genre]
-    
     while True:
         print("\nType the beginning of the title from a movie you want information about:")
         user_input = input().strip().lower()
-        matches = [title for title in titles if title.lower().startswith(user_input)]
+        matches = [movie.title for movie in movie_bst.titles_with_prefix(user_input, genre)]
         
         if matches:
             print(f"\nFound {len(matches)} matches!")
-            matches.sort() 
             for idx, title in enumerate(matches):
                 print(f"{idx+1}. {title}")
             return matches
@@ -98,17 +93,13 @@ def suggest_genre(genre: str, movie_bst: MovieBST):
         print(f"Could not find any films starting with '{user_input}'. Please try again.")
 
 def general_search(movie_bst: MovieBST):
-    all_movies = movie_bst.get_all_movies()
-    titles = [movie.title for movie in all_movies]
-    
     while True:
         print("\nType the beginning of the title from a movie you want information about:")
         user_input = input().strip().lower()
-        matches = [title for title in titles if title.lower().startswith(user_input)]
+        matches = [movie.title for movie in movie_bst.titles_with_prefix(user_input)]
         
         if matches:
             print(f"\nFound {len(matches)} matches!")
-            matches.sort() 
             for idx, title in enumerate(matches):
                 print(f"{idx+1}. {title}")
             return matches
@@ -126,9 +117,9 @@ def get_more_information(matches_lst: list[str], movie_bst: MovieBST):
             choice_num = int(user_choice)
             if 1 <= choice_num <= len(matches_lst):
                 chosen_title = matches_lst[choice_num-1]
-                movie = movie_bst.search(chosen_title)
-                if movie:
-                    return movie
+                node = movie_bst.search(chosen_title)
+                if node:
+                    return node.movie
                 print("Movie not found in the database. This shouldn't happen if chosen from matches.")
             else:
                 print(f"Please enter a number between 1 and {len(matches_lst)}")